@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import importlib
+import threading
+from contextlib import contextmanager
+
+# Arranque rápido de los workers.
+# Pandas, matplotlib y seaborn solo se importan la primera vez que se usa
+# un endpoint /pandas/* o /seaborn/* (o en segundo plano tras el arranque si
+# PRECALENTAR_MODULOS=1). Se registra el tiempo de importación de cada módulo
+# y el tiempo total de arranque para GET /startup.
+
+_inicio = time.perf_counter()
+
+# Importa en segundo plano los módulos diferidos al terminar el arranque
+PRECALENTAR_MODULOS = os.getenv("PRECALENTAR_MODULOS", "0").lower() in ("1", "true", "si", "yes")
+
+# Módulos de análisis y gráficas que se cargan bajo demanda
+MODULOS_DIFERIDOS = ("pandas_consultas", "seaborn_graficas", "formato", "carga_dataframes")
+
+_importaciones = {}
+_lock = threading.Lock()
+_estado = {"startup_seconds": None, "prewarm": "desactivado"}
+
+
+def _registrar(nombre, segundos, momento):
+    with _lock:
+        _importaciones.setdefault(nombre, {"seconds": round(segundos, 4), "phase": momento})
+
+
+@contextmanager
+def importando(nombre):
+    """Mide las importaciones del bloque durante el arranque del módulo principal"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(nombre, time.perf_counter() - inicio, "arranque")
+
+
+def cargar(nombre, momento="primer_uso"):
+    """
+    Importa un módulo diferido y registra cuánto tardó la primera vez.
+    Las siguientes llamadas devuelven el módulo ya cargado.
+    """
+    # import_module espera si otro hilo (el precalentamiento) está cargando
+    # el mismo módulo, así que nunca se devuelve un módulo a medio inicializar
+    cargado = nombre in sys.modules
+    inicio = time.perf_counter()
+    modulo = importlib.import_module(nombre)
+    if not cargado:
+        _registrar(nombre, time.perf_counter() - inicio, momento)
+    return modulo
+
+
+def arranque_completado():
+    """Marca el fin del arranque (llamar al terminar el evento startup)"""
+    _estado["startup_seconds"] = round(time.perf_counter() - _inicio, 4)
+
+
+def _precalentar():
+    try:
+        for nombre in MODULOS_DIFERIDOS:
+            cargar(nombre, "precalentamiento")
+        _estado["prewarm"] = "completado"
+        print("✅ Módulos de análisis y gráficas precargados")
+    except Exception as e:
+        _estado["prewarm"] = f"error: {e}"
+        print(f"❌ Error al precargar módulos: {str(e)}")
+
+
+def precalentar():
+    """Lanza la carga de los módulos diferidos en un hilo en segundo plano"""
+    _estado["prewarm"] = "en_curso"
+    threading.Thread(target=_precalentar, name="precalentar-modulos", daemon=True).start()
+
+
+def informe_arranque():
+    """Tiempo de arranque y tiempo de importación de cada módulo"""
+    with _lock:
+        modulos = {nombre: dict(datos) for nombre, datos in _importaciones.items()}
+    pesados = ("pandas", "matplotlib", "seaborn")
+    return {
+        "startup_seconds": _estado["startup_seconds"],
+        "prewarm": _estado["prewarm"],
+        "modules": modulos,
+        "loaded": {nombre: nombre in sys.modules for nombre in pesados + MODULOS_DIFERIDOS},
+    }
@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import platform
+import argparse
+import datetime
+import threading
+import statistics
+
+# Benchmark de los endpoints de la API contra una copia local en SQLite de
+# los volcados de sql/. La aplicación se ejecuta en el mismo proceso a través
+# de su interfaz ASGI, sin servidor ni MySQL.
+#
+# Uso:
+#   python benchmark.py --iteraciones 50 --salida bench/actual.json
+#   python benchmark.py --comparar bench/anterior.json
+#   python benchmark.py --sin-cache    (mide las consultas, no las cachés)
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+BASE_SQLITE = os.path.join(DIRECTORIO, "bench", "video_games.db")
+
+# Valores usados para los parámetros de ruta de cada endpoint
+PARAMETROS_RUTA = {
+    "table_name": ["game", "region_sales"],
+    "game_id": ["1"],
+    "year": ["2006", "all"],
+    "numero": ["10"],
+    "top": ["10"],
+    "region": ["Europe"],
+    "nombre": ["ventas_por_genero"],
+}
+
+# Parámetros de consulta obligatorios de algunos endpoints
+PARAMETROS_CONSULTA = {
+    "/games/complete": "?ids=1,2,3,4,5,6,7,8,9,10",
+    "/games/search": "?q=mario",
+}
+
+# Variables que desactivan las cachés de respuestas, gráficas y consultas en
+# disco; deben estar definidas antes de importar main
+CACHES_DESACTIVADAS = {
+    "CACHE_DISCO_ACTIVA": "0",
+    "CACHE_RESPUESTAS_TTL": "0",
+    "CACHE_GRAFICAS_MB": "0",
+}
+
+# Endpoints que no se miden (modifican datos o no devuelven resultados de consultas)
+EXCLUIDOS = {"/openapi.json", "/docs", "/docs/oauth2-redirect", "/redoc"}
+
+
+def preparar_base_sqlite(ruta=BASE_SQLITE, recrear=False):
+    """Carga los volcados de sql/ en un archivo SQLite si todavía no existe"""
+    from sqlalchemy import create_engine
+    from cargador_sql import cargar_archivo_sql, adaptar_sqlite
+
+    if os.path.exists(ruta) and not recrear:
+        return ruta
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+    engine = create_engine(f"sqlite:///{ruta}")
+    with engine.connect() as conn:
+        for archivo in sorted(glob.glob(os.path.join(DIRECTORIO, "sql", "*.sql"))):
+            resultado = cargar_archivo_sql(conn, archivo, adaptar=adaptar_sqlite, progreso=None)
+            print(f"✅ {os.path.basename(archivo)}: {resultado['rows']} filas en {resultado['seconds']} s")
+    engine.dispose()
+    return ruta
+
+
+def _rss_actual():
+    """Memoria residente actual del proceso en bytes"""
+    try:
+        with open("/proc/self/status") as status:
+            for linea in status:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss es el pico del proceso (KB en Linux, bytes en macOS)
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo if sys.platform == "darwin" else maximo * 1024
+
+
+class MedidorMemoria:
+    """Muestrea la RSS en un hilo para obtener el pico durante una medición"""
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def __enter__(self):
+        self.pico = _rss_actual()
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, _rss_actual())
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+        self.pico = max(self.pico, _rss_actual())
+
+
+def listar_endpoints(app, filtro=None):
+    """Obtiene las rutas GET de la aplicación con sus parámetros rellenados"""
+    from fastapi.routing import APIRoute
+
+    urls = []
+    for ruta in app.routes:
+        if not isinstance(ruta, APIRoute) or "GET" not in ruta.methods or ruta.path in EXCLUIDOS:
+            continue
+
+        variantes = [ruta.path]
+        for nombre in re.findall(r"{(\w+)}", ruta.path):
+            valores = PARAMETROS_RUTA.get(nombre, ["1"])
+            variantes = [v.replace("{" + nombre + "}", valor) for v in variantes for valor in valores]
+
+        for url in variantes:
+            url += PARAMETROS_CONSULTA.get(ruta.path, "")
+            if filtro is None or re.search(filtro, url):
+                urls.append(url)
+    return urls
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    indice = (len(ordenados) - 1) * p / 100
+    inferior = int(indice)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (indice - inferior)
+
+
+def medir_endpoint(cliente, url, iteraciones, calentamiento):
+    """Mide la latencia de un endpoint con peticiones secuenciales"""
+    for _ in range(calentamiento):
+        cliente.get(url)
+
+    latencias = []
+    bytes_respuesta = 0
+    estados = {}
+    with MedidorMemoria() as memoria:
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            t0 = time.perf_counter()
+            respuesta = cliente.get(url)
+            latencias.append((time.perf_counter() - t0) * 1000)
+            bytes_respuesta = len(respuesta.content)
+            estados[respuesta.status_code] = estados.get(respuesta.status_code, 0) + 1
+        total = time.perf_counter() - inicio
+
+    return {
+        "url": url,
+        "requests": iteraciones,
+        "status": estados,
+        "bytes": bytes_respuesta,
+        "p50_ms": round(_percentil(latencias, 50), 3),
+        "p95_ms": round(_percentil(latencias, 95), 3),
+        "p99_ms": round(_percentil(latencias, 99), 3),
+        "mean_ms": round(statistics.fmean(latencias), 3),
+        "throughput_rps": round(iteraciones / total, 2) if total else 0.0,
+        "peak_rss_mb": round(memoria.pico / (1024 * 1024), 2),
+    }
+
+
+def desactivar_caches():
+    """Configura las cachés para que cada petición repita la consulta"""
+    os.environ.update(CACHES_DESACTIVADAS)
+    # Los TTL por ruta (CACHE_TTL_<FUNCION>) tienen prioridad sobre CACHE_RESPUESTAS_TTL
+    for variable in [v for v in os.environ if v.startswith("CACHE_TTL_")]:
+        del os.environ[variable]
+
+
+def ejecutar_benchmark(iteraciones=20, calentamiento=2, filtro=None, base=BASE_SQLITE, recrear=False, sin_cache=False):
+    """Prepara la base SQLite, arranca la app en proceso y mide cada endpoint"""
+    ruta = preparar_base_sqlite(base, recrear)
+    os.environ["DATABASE_URL"] = f"sqlite:///{ruta}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    if sin_cache:
+        desactivar_caches()
+
+    from fastapi.testclient import TestClient
+    import main
+
+    resultados = []
+    with TestClient(main.app) as cliente:
+        for url in listar_endpoints(main.app, filtro):
+            resultado = medir_endpoint(cliente, url, iteraciones, calentamiento)
+            resultados.append(resultado)
+            print(
+                f"{url:<55} p50 {resultado['p50_ms']:>9.2f} ms  p95 {resultado['p95_ms']:>9.2f} ms  "
+                f"p99 {resultado['p99_ms']:>9.2f} ms  {resultado['throughput_rps']:>8.1f} req/s  "
+                f"RSS {resultado['peak_rss_mb']:>7.1f} MB"
+            )
+
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iteraciones,
+        "warmup": calentamiento,
+        "caches": not sin_cache,
+        "results": resultados,
+    }
+
+
+def comparar(actual, anterior):
+    """Muestra la variación de p50/p95 respecto a una ejecución anterior"""
+    previos = {r["url"]: r for r in anterior["results"]}
+    print(f"\n{'Endpoint':<55} {'p50 antes':>10} {'p50 ahora':>10} {'Δ p50':>8} {'Δ p95':>8}")
+    for resultado in actual["results"]:
+        previo = previos.get(resultado["url"])
+        if previo is None:
+            continue
+        delta50 = (resultado["p50_ms"] - previo["p50_ms"]) / previo["p50_ms"] * 100 if previo["p50_ms"] else 0.0
+        delta95 = (resultado["p95_ms"] - previo["p95_ms"]) / previo["p95_ms"] * 100 if previo["p95_ms"] else 0.0
+        print(
+            f"{resultado['url']:<55} {previo['p50_ms']:>10.2f} {resultado['p50_ms']:>10.2f} "
+            f"{delta50:>+7.1f}% {delta95:>+7.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de los endpoints de la API sobre SQLite")
+    parser.add_argument("--iteraciones", type=int, default=20, help="peticiones medidas por endpoint")
+    parser.add_argument("--calentamiento", type=int, default=2, help="peticiones previas sin medir")
+    parser.add_argument("--filtro", help="expresión regular para seleccionar endpoints")
+    parser.add_argument("--base", default=BASE_SQLITE, help="archivo SQLite con los datos")
+    parser.add_argument("--recrear", action="store_true", help="vuelve a cargar los volcados en SQLite")
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--sin-cache", action="store_true", help="desactiva las cachés de respuestas, gráficas y disco")
+    args = parser.parse_args()
+
+    informe = ejecutar_benchmark(args.iteraciones, args.calentamiento, args.filtro, args.base, args.recrear, args.sin_cache)
+
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            comparar(informe, json.load(archivo))
@@ -0,0 +1,287 @@
+import bisect
+import threading
+import unicodedata
+from collections import Counter
+from sqlalchemy import text
+
+from conexion import get_engine
+from version_datos import al_invalidar
+
+# Índice en memoria para buscar juegos por nombre.
+# Los juegos se numeran por ventas totales descendentes, de modo que ordenar
+# posiciones equivale a ordenar por ventas. Hay dos estructuras:
+#   - una lista ordenada de palabras con sus posiciones (equivalente a un
+#     trie: las palabras con un prefijo son un rango contiguo que se
+#     encuentra con bisect), para el autocompletado; los prefijos cortos,
+#     que abarcan miles de palabras, guardan sus mejores resultados;
+#   - índices invertidos de trigramas y bigramas de cada palabra, para las
+#     búsquedas por subcadena y aproximadas (con erratas).
+# Se construye al arrancar y se reconstruye cuando se invalidan los datos.
+
+engine = get_engine()
+
+MODOS_BUSQUEDA = ("auto", "prefix", "substring", "fuzzy")
+
+# Proporción mínima de trigramas de la consulta presentes en el nombre
+SIMILITUD_MINIMA = 0.4
+# Resultados máximos por búsqueda
+MAX_RESULTADOS = 100
+# Prefijos de hasta este largo tienen sus mejores resultados precalculados
+LARGO_PREFIJO_PRECALCULADO = 3
+
+_indice = None
+_lock = threading.Lock()
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con cualquier signo convertido en un espacio"""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+
+def _ngramas_palabra(palabra, n, inicio=True, fin=True):
+    """n-gramas de una palabra; los espacios marcan el principio y el final"""
+    palabra = (" " if inicio else "") + palabra + (" " if fin else "")
+    return {palabra[i:i + n] for i in range(len(palabra) - n + 1)}
+
+
+def _ngramas(palabras, n=3, abierto=False):
+    """
+    n-gramas de una lista de palabras. Con abierto=True la primera palabra
+    puede empezar y la última terminar a mitad de una palabra del nombre
+    (búsqueda por subcadena).
+    """
+    ngramas = set()
+    for i, palabra in enumerate(palabras):
+        inicio = not abierto or i > 0
+        fin = not abierto or i < len(palabras) - 1
+        ngramas |= _ngramas_palabra(palabra, n, inicio, fin)
+    return ngramas
+
+
+def _mejores_por_prefijo(por_palabra, primera_palabra):
+    """
+    Nodos del trie de palabras: para cada prefijo, las MAX_RESULTADOS mejores
+    posiciones con alguna palabra que empieza por él y las que además
+    empiezan el nombre. Así el autocompletado de prefijos cortos no tiene
+    que unir miles de listas en cada petición.
+    """
+    todos = {}
+    iniciales = {}
+    for palabra, posiciones in por_palabra.items():
+        for largo in range(1, min(len(palabra), LARGO_PREFIJO_PRECALCULADO) + 1):
+            todos.setdefault(palabra[:largo], set()).update(posiciones)
+    for posicion, palabra in enumerate(primera_palabra):
+        for largo in range(1, min(len(palabra), LARGO_PREFIJO_PRECALCULADO) + 1):
+            iniciales.setdefault(palabra[:largo], []).append(posicion)
+    return {
+        prefijo: (iniciales.get(prefijo, [])[:MAX_RESULTADOS], sorted(posiciones)[:MAX_RESULTADOS])
+        for prefijo, posiciones in todos.items()
+    }
+
+
+def _construir_indice():
+    """Lee los juegos con sus ventas totales y construye las estructuras de búsqueda"""
+    query = text("""
+    SELECT g.id,
+           g.game_name,
+           COALESCE(gen.genre_name, 'Desconocido') AS genre,
+           COALESCE(SUM(rs.num_sales), 0) AS total_sales
+    FROM game g
+    LEFT JOIN genre gen ON g.genre_id = gen.id
+    LEFT JOIN game_publisher gp ON g.id = gp.game_id
+    LEFT JOIN game_platform gpl ON gp.id = gpl.game_publisher_id
+    LEFT JOIN region_sales rs ON gpl.id = rs.game_platform_id
+    GROUP BY g.id, g.game_name, gen.genre_name
+    """)
+    with engine.connect() as conn:
+        filas = conn.execute(query).all()
+
+    # Posición 0 = juego con más ventas
+    filas.sort(key=lambda fila: (-float(fila[3]), fila[1] or ""))
+    juegos = [
+        {"id": fila[0], "game_name": fila[1], "genre": fila[2], "total_sales": round(float(fila[3]), 2)}
+        for fila in filas
+    ]
+    normalizados = [normalizar(juego["game_name"]) for juego in juegos]
+
+    por_palabra = {}
+    trigramas = {}
+    bigramas = {}
+    primera_palabra = []
+    for posicion, nombre in enumerate(normalizados):
+        palabras = nombre.split()
+        primera_palabra.append(palabras[0] if palabras else "")
+        for palabra in set(palabras):
+            por_palabra.setdefault(palabra, []).append(posicion)
+        for trigrama in _ngramas(palabras, 3):
+            trigramas.setdefault(trigrama, []).append(posicion)
+        for bigrama in _ngramas(palabras, 2):
+            bigramas.setdefault(bigrama, []).append(posicion)
+
+    palabras = sorted(por_palabra)
+    return {
+        "juegos": juegos,
+        "normalizados": normalizados,
+        "palabras": palabras,
+        "posiciones": [por_palabra[palabra] for palabra in palabras],
+        "prefijos": _mejores_por_prefijo(por_palabra, primera_palabra),
+        "trigramas": trigramas,
+        "bigramas": bigramas,
+    }
+
+
+def recargar_indice():
+    """Reconstruye el índice; las búsquedas en curso usan el anterior hasta terminar"""
+    global _indice
+    nuevo = _construir_indice()
+    with _lock:
+        _indice = nuevo
+    return {"juegos": len(nuevo["juegos"]), "palabras": len(nuevo["palabras"]), "trigramas": len(nuevo["trigramas"])}
+
+
+def indice_cargado():
+    return _indice is not None
+
+
+def obtener_indice():
+    """Devuelve el índice actual, construyéndolo en el primer uso"""
+    global _indice
+    if _indice is None:
+        with _lock:
+            if _indice is None:
+                _indice = _construir_indice()
+    return _indice
+
+
+def _con_prefijo(indice, prefijo):
+    """Posiciones de los juegos con alguna palabra que empieza por prefijo"""
+    palabras = indice["palabras"]
+    encontradas = set()
+    i = bisect.bisect_left(palabras, prefijo)
+    while i < len(palabras) and palabras[i].startswith(prefijo):
+        encontradas.update(indice["posiciones"][i])
+        i += 1
+    return encontradas
+
+
+def _tiene_prefijos(nombre, prefijos):
+    palabras = nombre.split()
+    return all(any(palabra.startswith(prefijo) for palabra in palabras) for prefijo in prefijos)
+
+
+def _buscar_prefijo(indice, consulta):
+    """
+    Autocompletado: cada palabra de la consulta debe ser el principio de
+    alguna palabra del nombre. Primero los nombres que empiezan por la
+    consulta y después el resto, cada grupo por ventas.
+    """
+    tokens = consulta.split()
+    normalizados = indice["normalizados"]
+    if len(tokens) == 1 and consulta in indice["prefijos"]:
+        iniciales, todos = indice["prefijos"][consulta]
+        return iniciales + [p for p in todos if not normalizados[p].startswith(consulta)]
+
+    # Se parte de la palabra más larga (la más selectiva) y se comprueban las demás
+    tokens.sort(key=len, reverse=True)
+    candidatos = _con_prefijo(indice, tokens[0])
+    posiciones = [p for p in candidatos if _tiene_prefijos(normalizados[p], tokens[1:])]
+    return sorted(posiciones, key=lambda p: (not normalizados[p].startswith(consulta), p))
+
+
+def _candidatos(indice, ngramas, clave):
+    """Posiciones que contienen todos los n-gramas"""
+    listas = sorted((indice[clave].get(ngrama, ()) for ngrama in ngramas), key=len)
+    if not listas or not listas[0]:
+        return set()
+    return set(listas[0]).intersection(*listas[1:])
+
+
+def _buscar_subcadena(indice, consulta):
+    """Nombres que contienen la consulta en cualquier posición, por ventas"""
+    normalizados = indice["normalizados"]
+    palabras = consulta.split()
+    trigramas = _ngramas(palabras, 3, abierto=True)
+    bigramas = _ngramas(palabras, 2, abierto=True)
+    if trigramas:
+        candidatos = _candidatos(indice, trigramas, "trigramas")
+    elif bigramas:
+        candidatos = _candidatos(indice, bigramas, "bigramas")
+    else:
+        # Un solo carácter: se recorren todos los nombres
+        candidatos = range(len(normalizados))
+    return sorted(p for p in candidatos if consulta in normalizados[p])
+
+
+def _buscar_aproximada(indice, consulta):
+    """
+    Búsqueda tolerante a erratas: puntúa cada nombre por la proporción de
+    trigramas de la consulta que contiene y ordena por puntuación y ventas.
+    """
+    trigramas = _ngramas(consulta.split(), 3)
+    if not trigramas:
+        return []
+    conteos = Counter()
+    for trigrama in trigramas:
+        conteos.update(indice["trigramas"].get(trigrama, ()))
+    minimo = SIMILITUD_MINIMA * len(trigramas)
+    puntuados = [
+        (round(comunes / len(trigramas), 1), posicion)
+        for posicion, comunes in conteos.items()
+        if comunes >= minimo
+    ]
+    puntuados.sort(key=lambda item: (-item[0], item[1]))
+    return [posicion for _, posicion in puntuados]
+
+
+_BUSQUEDAS = {
+    "prefix": _buscar_prefijo,
+    "substring": _buscar_subcadena,
+    "fuzzy": _buscar_aproximada,
+}
+
+
+def buscar_juegos(texto, limit=10, modo="auto"):
+    """
+    Busca juegos por nombre.
+
+    Args:
+        texto: texto a buscar
+        limit: número máximo de resultados (como mucho MAX_RESULTADOS)
+        modo: prefix, substring, fuzzy o auto (prefijo, luego subcadena y
+              por último aproximada hasta completar limit)
+
+    Returns:
+        Lista de juegos con id, game_name, genre, total_sales y match
+
+    Raises:
+        ValueError: si el modo no existe o el texto no tiene letras ni números
+    """
+    if modo not in MODOS_BUSQUEDA:
+        raise ValueError(f"Modo '{modo}' no soportado. Opciones: {', '.join(MODOS_BUSQUEDA)}")
+    limit = min(limit, MAX_RESULTADOS)
+    consulta = normalizar(texto)
+    if not consulta:
+        raise ValueError("La búsqueda debe contener letras o números")
+
+    indice = obtener_indice()
+    modos = ("prefix", "substring", "fuzzy") if modo == "auto" else (modo,)
+    vistos = set()
+    resultados = []
+    for actual in modos:
+        for posicion in _BUSQUEDAS[actual](indice, consulta):
+            if posicion in vistos:
+                continue
+            vistos.add(posicion)
+            resultados.append(dict(indice["juegos"][posicion], match=actual))
+            if len(resultados) >= limit:
+                return resultados
+    return resultados
+
+
+@al_invalidar
+def _recargar_si_cargado():
+    """Reconstruye el índice cuando se invalidan los datos, si ya estaba en uso"""
+    if _indice is not None:
+        recargar_indice()
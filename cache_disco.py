@@ -0,0 +1,342 @@
+import os
+import re
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import datetime
+import threading
+from decimal import Decimal
+
+from conexion import configuracion_pool
+from metricas import medir
+from version_datos import al_invalidar
+
+# Caché de resultados de consultas en disco, compartida por los workers.
+# Cada worker de uvicorn tiene sus propias cachés en memoria. Esta caché
+# guarda en un archivo SQLite local los resultados de las consultas
+# analíticas que lo piden (execute_query_rows* con compartir=True, usado en
+# /stats/*) y de los DataFrames de leer_dataframe, así que un worker recién
+# arrancado (o uno nuevo al escalar) reutiliza lo que ya calcularon los demás.
+# Las consultas puntuales (/games/{id}, /games/complete, tablas) no pasan por
+# ella: un cambio hecho fuera de la API se vería solo al caducar la entrada.
+#
+# La clave es un hash del SQL normalizado (espacios colapsados), los
+# parámetros, el tipo de resultado y la base de datos. Cada entrada lleva la
+# versión de datos compartida, guardada en el mismo archivo; invalidar_datos()
+# en cualquier worker la incrementa y descarta las entradas anteriores para
+# todos. Las escrituras son transacciones de SQLite (atómicas aunque el
+# proceso muera a mitad) y, al superar CACHE_DISCO_MB, se expulsan las
+# entradas usadas hace más tiempo.
+#
+# Los valores no se guardan con pickle: las filas van en JSON (con marcas
+# para DECIMAL, fechas y bytes) y los DataFrames en formato Arrow IPC, así
+# que un archivo manipulado nunca ejecuta código al leerlo. Además el
+# archivo vive en un directorio privado (modo 0700) y solo se abre si
+# pertenece al usuario del proceso.
+
+CACHE_DISCO_ACTIVA = os.getenv("CACHE_DISCO_ACTIVA", "1").lower() in ("1", "true", "si", "yes")
+CACHE_DISCO_RUTA = os.getenv("CACHE_DISCO_RUTA", os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "video_games_api",
+    "cache_consultas.sqlite",
+))
+# Tamaño máximo de los resultados guardados (MB)
+CACHE_DISCO_MB = float(os.getenv("CACHE_DISCO_MB", "256"))
+# Segundos de validez de una entrada (0 = sin caducidad)
+CACHE_DISCO_TTL = float(os.getenv("CACHE_DISCO_TTL", "3600"))
+# Al expulsar se libera hasta dejar esta proporción del máximo
+PROPORCION_TRAS_EXPULSAR = 0.9
+# Segundos mínimos entre actualizaciones de la fecha de uso de una entrada
+INTERVALO_USO = 60
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    clave TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    creado REAL NOT NULL,
+    usado REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    valor BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resultados_usado ON resultados (usado);
+CREATE TABLE IF NOT EXISTS estado (
+    nombre TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO estado (nombre, valor) VALUES ('version', 0);
+"""
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+_desactivada = None
+
+
+def _contar(nombre, cantidad=1):
+    with _stats_lock:
+        _stats[nombre] += cantidad
+
+
+def _comprobar_ruta(ruta):
+    """
+    Crea el directorio de la caché con modo 0700 y comprueba que el
+    directorio y los archivos existentes son del usuario del proceso y que
+    nadie más puede escribir en el directorio.
+
+    Raises:
+        PermissionError: si otro usuario podría haber creado o modificado la caché
+    """
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    usuario = os.geteuid()
+    info = os.stat(directorio)
+    if info.st_uid != usuario or info.st_mode & 0o022:
+        raise PermissionError(f"el directorio {directorio} no es privado del usuario del proceso")
+    for archivo in (ruta, ruta + "-wal", ruta + "-shm"):
+        try:
+            info = os.lstat(archivo)
+        except FileNotFoundError:
+            continue
+        if info.st_uid != usuario or not os.path.isfile(archivo) or os.path.islink(archivo):
+            raise PermissionError(f"el archivo {archivo} no pertenece al usuario del proceso")
+
+
+def _etiquetar(valor):
+    """Tipos de las filas que JSON no conoce, con una marca para recuperarlos al leer"""
+    if isinstance(valor, Decimal):
+        return {"$t": "decimal", "v": str(valor)}
+    if isinstance(valor, datetime.datetime):
+        return {"$t": "datetime", "v": valor.isoformat()}
+    if isinstance(valor, datetime.date):
+        return {"$t": "date", "v": valor.isoformat()}
+    if isinstance(valor, datetime.time):
+        return {"$t": "time", "v": valor.isoformat()}
+    if isinstance(valor, datetime.timedelta):
+        return {"$t": "timedelta", "v": valor.total_seconds()}
+    if isinstance(valor, bytes):
+        return {"$t": "bytes", "v": base64.b64encode(valor).decode("ascii")}
+    raise TypeError(f"Tipo no admitido en la caché en disco: {type(valor).__name__}")
+
+
+_TIPOS_ETIQUETADOS = {
+    "decimal": Decimal,
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "timedelta": lambda v: datetime.timedelta(seconds=v),
+    "bytes": base64.b64decode,
+}
+
+
+def _desetiquetar(objeto):
+    # Los valores de las filas nunca son objetos JSON, solo las marcas de tipo
+    return _TIPOS_ETIQUETADOS[objeto["$t"]](objeto["v"])
+
+
+def _serializar(valor):
+    """
+    (columnas, filas) a JSON (prefijo b"F") y DataFrames a Arrow IPC (b"A").
+    Arrow guarda los dtypes de pandas (categorías, float32, enteros pequeños).
+    """
+    if isinstance(valor, tuple):
+        columnas, filas = valor
+        return b"F" + json.dumps([columnas, [list(fila) for fila in filas]], default=_etiquetar,
+                                 ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    import pyarrow as pa
+    tabla = pa.Table.from_pandas(valor, preserve_index=False)
+    # Arrow no distingue string[pyarrow] de string[python] al volver a pandas
+    tipos = json.dumps({
+        str(columna): f"string[{tipo.storage}]"
+        for columna, tipo in valor.dtypes.items() if getattr(tipo, "name", None) == "string"
+    })
+    tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), b"tipos": tipos.encode("utf-8")})
+    salida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return b"A" + salida.getvalue().to_pybytes()
+
+
+def _deserializar(datos):
+    formato, cuerpo = datos[:1], datos[1:]
+    if formato == b"F":
+        columnas, filas = json.loads(cuerpo, object_hook=_desetiquetar)
+        return columnas, [tuple(fila) for fila in filas]
+    if formato == b"A":
+        import pyarrow as pa
+        tabla = pa.ipc.open_stream(cuerpo).read_all()
+        df = tabla.to_pandas()
+        for columna, tipo in json.loads(tabla.schema.metadata[b"tipos"]).items():
+            df[columna] = df[columna].astype(tipo)
+        return df
+    raise ValueError("formato de entrada desconocido en la caché en disco")
+
+
+def _conexion():
+    """Conexión a la caché propia de cada hilo (sqlite3 no comparte conexiones entre hilos)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        _comprobar_ruta(CACHE_DISCO_RUTA)
+        conn = sqlite3.connect(CACHE_DISCO_RUTA, timeout=5, isolation_level=None)
+        # WAL: los lectores no esperan a los escritores de otros procesos
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_ESQUEMA)
+        _local.conn = conn
+    return conn
+
+
+def activa():
+    return CACHE_DISCO_ACTIVA and _desactivada is None
+
+
+def _fallo(e):
+    """Un error de la caché nunca hace fallar la consulta; tras un error al abrirla se desactiva"""
+    global _desactivada
+    _contar("errors")
+    if getattr(_local, "conn", None) is None:
+        _desactivada = str(e)
+        print(f"❌ Caché de consultas en disco desactivada: {str(e)}")
+
+
+def normalizar_sql(query_text):
+    """SQL con los espacios, saltos de línea y sangrías colapsados"""
+    return re.sub(r"\s+", " ", str(query_text)).strip()
+
+
+def clave(tipo, query_text, params=None, extra=None):
+    """Hash de la consulta normalizada, sus parámetros, el tipo de resultado y la base de datos"""
+    partes = {
+        "tipo": tipo,
+        "sql": normalizar_sql(query_text),
+        "params": sorted((str(nombre), repr(valor)) for nombre, valor in (params or {}).items()),
+        "extra": repr(extra),
+        "db": configuracion_pool()["url"],
+    }
+    return hashlib.sha256(json.dumps(partes, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _version(conn):
+    return conn.execute("SELECT valor FROM estado WHERE nombre = 'version'").fetchone()[0]
+
+
+def obtener(clave_resultado, nombre="consulta"):
+    """Devuelve el resultado guardado o None si no existe, es de otra versión o caducó"""
+    if not activa():
+        return None
+    try:
+        with medir("cache_disco", nombre):
+            conn = _conexion()
+            fila = conn.execute(
+                "SELECT r.valor, r.creado, r.usado FROM resultados r JOIN estado e ON e.nombre = 'version' "
+                "WHERE r.clave = ? AND r.version = e.valor",
+                (clave_resultado,),
+            ).fetchone()
+            ahora = time.time()
+            if fila is None or (CACHE_DISCO_TTL > 0 and ahora - fila[1] > CACHE_DISCO_TTL):
+                _contar("misses")
+                return None
+            # La fecha de uso (para expulsar) se actualiza como mucho una vez por
+            # minuto, para que los aciertos no compitan por el bloqueo de escritura
+            if ahora - fila[2] > INTERVALO_USO:
+                conn.execute("UPDATE resultados SET usado = ? WHERE clave = ?", (ahora, clave_resultado))
+            valor = _deserializar(fila[0])
+        _contar("hits")
+        return valor
+    except Exception as e:
+        _fallo(e)
+        return None
+
+
+def guardar(clave_resultado, valor, nombre="consulta"):
+    """Guarda un resultado con la versión de datos actual y expulsa entradas si hace falta"""
+    if not activa():
+        return
+    try:
+        with medir("cache_disco", nombre):
+            datos = _serializar(valor)
+            maximo = int(CACHE_DISCO_MB * 1024 * 1024)
+            # Un resultado mayor que todo el presupuesto no se guarda
+            if len(datos) > maximo:
+                return
+            conn = _conexion()
+            ahora = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO resultados (clave, version, creado, usado, bytes, valor) "
+                    "VALUES (?, (SELECT valor FROM estado WHERE nombre = 'version'), ?, ?, ?, ?)",
+                    (clave_resultado, ahora, ahora, len(datos), datos),
+                )
+                expulsadas = _expulsar(conn, maximo)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        _contar("writes")
+        _contar("evictions", expulsadas)
+    except Exception as e:
+        _fallo(e)
+
+
+def _expulsar(conn, maximo):
+    """Borra las entradas menos usadas hasta bajar de PROPORCION_TRAS_EXPULSAR del máximo"""
+    total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM resultados").fetchone()[0]
+    if total <= maximo:
+        return 0
+    objetivo = maximo * PROPORCION_TRAS_EXPULSAR
+    expulsadas = 0
+    for clave_resultado, tam in conn.execute("SELECT clave, bytes FROM resultados ORDER BY usado").fetchall():
+        if total <= objetivo:
+            break
+        conn.execute("DELETE FROM resultados WHERE clave = ?", (clave_resultado,))
+        total -= tam
+        expulsadas += 1
+    return expulsadas
+
+
+def invalidar_cache_disco():
+    """Nueva versión de datos compartida: descarta los resultados de todos los workers"""
+    if not activa():
+        return
+    try:
+        conn = _conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE estado SET valor = valor + 1 WHERE nombre = 'version'")
+            conn.execute("DELETE FROM resultados WHERE version < (SELECT valor FROM estado WHERE nombre = 'version')")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except Exception as e:
+        _fallo(e)
+
+
+def estadisticas():
+    """Entradas, bytes, versión compartida y aciertos de este worker"""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    stats.update({
+        "enabled": activa(),
+        "path": CACHE_DISCO_RUTA,
+        "max_bytes": int(CACHE_DISCO_MB * 1024 * 1024),
+        "ttl_seconds": CACHE_DISCO_TTL,
+        "hit_ratio": round(stats["hits"] / total, 4) if total else 0.0,
+    })
+    if _desactivada is not None:
+        stats["disabled_reason"] = _desactivada
+    if activa():
+        try:
+            conn = _conexion()
+            entradas, tam = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM resultados").fetchone()
+            stats.update({"entries": entradas, "bytes": tam, "data_version": _version(conn)})
+        except Exception as e:
+            _fallo(e)
+    return stats
+
+
+# Una recarga de los datos en este worker invalida la caché de todos
+al_invalidar(invalidar_cache_disco)
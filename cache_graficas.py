@@ -0,0 +1,99 @@
+import os
+import threading
+import functools
+from collections import OrderedDict
+from fastapi import Response
+
+from version_datos import version_actual, al_invalidar
+from compresion import CuerpoPrecomprimido, RespuestaPrecomprimida
+
+# Memoria máxima para las imágenes en caché (MB)
+CACHE_GRAFICAS_MB = float(os.getenv("CACHE_GRAFICAS_MB", "64"))
+
+
+class CacheGraficas:
+    """Caché LRU de imágenes PNG limitada por tamaño total en bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            contenido = self._entradas.get(clave)
+            if contenido is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return contenido
+
+    def guardar(self, clave, contenido):
+        # Una imagen mayor que todo el presupuesto no se guarda
+        if len(contenido) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes_usados -= len(anterior)
+            self._entradas[clave] = contenido
+            self.bytes_usados += len(contenido)
+            while self.bytes_usados > self.max_bytes:
+                _, expulsado = self._entradas.popitem(last=False)
+                self.bytes_usados -= len(expulsado)
+                self.evictions += 1
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes_usados = 0
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entradas),
+                "bytes": self.bytes_usados,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+cache = CacheGraficas(int(CACHE_GRAFICAS_MB * 1024 * 1024))
+
+# Los datos recargados dejan obsoletas todas las imágenes
+al_invalidar(cache.invalidar)
+
+
+def respuesta_grafica(contenido):
+    """PNG (bytes) o especificación/datos JSON ya comprimidos (CuerpoPrecomprimido)"""
+    if isinstance(contenido, CuerpoPrecomprimido):
+        return RespuestaPrecomprimida(contenido)
+    return Response(content=contenido, media_type="image/png")
+
+
+def cachear_grafica(func):
+    """
+    Decorador para las funciones de seaborn_graficas.py: devuelve el PNG
+    (o el JSON de ?format=vega|data) guardado si existe y solo ejecuta la
+    consulta y el render en un fallo. La clave incluye la función, sus
+    parámetros y la versión de los datos.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        clave = (func.__name__, args, tuple(sorted(kwargs.items())), version_actual())
+        contenido = cache.obtener(clave)
+        if contenido is None:
+            respuesta = func(*args, **kwargs)
+            contenido = respuesta.cuerpo if isinstance(respuesta, RespuestaPrecomprimida) else respuesta.body
+            cache.guardar(clave, contenido)
+        return respuesta_grafica(contenido)
+    return wrapper
@@ -0,0 +1,160 @@
+import os
+import time
+import asyncio
+import threading
+import functools
+from collections import OrderedDict
+from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+
+from version_datos import version_actual, al_invalidar
+from serializacion import dumps
+from compresion import CuerpoPrecomprimido, RespuestaPrecomprimida
+
+# Caché de respuestas JSON para los endpoints de estadísticas pesados.
+# Cada entrada caduca a los TTL segundos de su ruta y el total se limita en
+# bytes. Las peticiones idénticas que llegan mientras se calcula una
+# respuesta esperan ese mismo cálculo en lugar de lanzar otra consulta.
+# Cada entrada guarda también sus versiones gzip y brotli, de modo que los
+# aciertos no vuelven a pagar la compresión.
+
+# Memoria máxima para las respuestas en caché (MB)
+CACHE_RESPUESTAS_MB = float(os.getenv("CACHE_RESPUESTAS_MB", "32"))
+# TTL por defecto (segundos); cada ruta puede usar CACHE_TTL_<FUNCION>
+CACHE_RESPUESTAS_TTL = float(os.getenv("CACHE_RESPUESTAS_TTL", "300"))
+
+
+class CacheRespuestas:
+    """Caché LRU con caducidad por entrada y coalescencia de peticiones en curso"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            contenido, caduca = entrada
+            if time.monotonic() >= caduca:
+                del self._entradas[clave]
+                self.bytes_usados -= len(contenido)
+                self.expired += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return contenido
+
+    def guardar(self, clave, contenido, ttl):
+        # Una respuesta mayor que todo el presupuesto no se guarda, ni
+        # tampoco con TTL 0 (caché desactivada)
+        if ttl <= 0 or len(contenido) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes_usados -= len(anterior[0])
+            self._entradas[clave] = (contenido, time.monotonic() + ttl)
+            self.bytes_usados += len(contenido)
+            while self.bytes_usados > self.max_bytes:
+                _, (expulsado, _) = self._entradas.popitem(last=False)
+                self.bytes_usados -= len(expulsado)
+                self.evictions += 1
+
+    async def obtener_o_calcular(self, clave, calcular, ttl):
+        """
+        Devuelve la respuesta guardada o la calcula con la corrutina calcular().
+        Si ya hay un cálculo en curso para la misma clave, se espera a ese.
+        """
+        contenido = self.obtener(clave)
+        if contenido is not None:
+            return contenido
+
+        tarea = self._en_curso.get(clave)
+        if tarea is not None:
+            with self._lock:
+                self.coalesced += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            # El cálculo va en su propia tarea: si el cliente que lo inició se
+            # desconecta, las demás peticiones siguen esperando el resultado
+            tarea = asyncio.ensure_future(calcular())
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(functools.partial(self._terminar, clave, ttl))
+
+        return await asyncio.shield(tarea)
+
+    def _terminar(self, clave, ttl, tarea):
+        self._en_curso.pop(clave, None)
+        if tarea.cancelled():
+            return
+        # Los errores (404, 500...) llegan a quienes esperan y no se guardan
+        if tarea.exception() is None:
+            self.guardar(clave, tarea.result(), ttl)
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes_usados = 0
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entradas),
+                "in_flight": len(self._en_curso),
+                "bytes": self.bytes_usados,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": round((self.hits + self.coalesced) / total, 4) if total else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+cache = CacheRespuestas(int(CACHE_RESPUESTAS_MB * 1024 * 1024))
+
+# Los datos recargados dejan obsoletas todas las respuestas
+al_invalidar(cache.invalidar)
+
+
+def cachear_respuesta(ttl=None):
+    """
+    Decorador para endpoints asíncronos que devuelven un dict o una
+    respuesta JSON: guarda el JSON ya serializado y comprimido durante ttl segundos (o
+    CACHE_TTL_<FUNCION> si está definida). La clave incluye la función,
+    sus parámetros y la versión de los datos.
+    """
+    def decorador(func):
+        variable = f"CACHE_TTL_{func.__name__.upper()}"
+        duracion = float(os.getenv(variable, ttl if ttl is not None else CACHE_RESPUESTAS_TTL))
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            clave = (func.__name__, args, tuple(sorted(kwargs.items())), version_actual())
+
+            async def calcular():
+                resultado = await func(*args, **kwargs)
+                if isinstance(resultado, Response):
+                    contenido = resultado.body
+                else:
+                    contenido = dumps(resultado)
+                # La compresión se hace fuera del bucle de eventos
+                return await run_in_threadpool(CuerpoPrecomprimido, contenido)
+
+            cuerpo = await cache.obtener_o_calcular(clave, calcular, duracion)
+            return RespuestaPrecomprimida(cuerpo, media_type="application/json")
+        return wrapper
+    return decorador
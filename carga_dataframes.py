@@ -0,0 +1,148 @@
+import os
+import threading
+from decimal import Decimal
+import pandas as pd
+from sqlalchemy import text
+
+from replicas import conectar_lectura
+from metricas import medir
+import cache_disco
+
+# Carga de resultados SQL en DataFrames con tipos compactos.
+# pd.read_sql deja los textos como objetos str de Python y los DECIMAL de
+# MySQL como objetos Decimal. Aquí los textos repetidos pasan a categorías
+# (códigos enteros), el resto de textos a cadenas de Arrow, los números a
+# float32 y los enteros al tipo más pequeño que los contiene. Cada consulta
+# guarda un informe con la memoria antes y después de la conversión.
+
+DATAFRAMES_OPTIMIZADOS = os.getenv("DATAFRAMES_OPTIMIZADOS", "1").lower() in ("1", "true", "si", "yes")
+
+# Proporción máxima de valores distintos para usar una categoría
+UMBRAL_CATEGORIA = float(os.getenv("UMBRAL_CATEGORIA", "0.5"))
+
+try:
+    import pyarrow  # noqa: F401
+    TIPO_TEXTO = "string[pyarrow]"
+except ImportError:
+    TIPO_TEXTO = None
+
+_informes = {}
+_informes_lock = threading.Lock()
+
+
+def _primer_valor(serie):
+    indice = serie.first_valid_index()
+    return None if indice is None else serie[indice]
+
+
+def _categoria(serie):
+    """Categoría con el orden de aparición, para no alterar el orden de las gráficas"""
+    categorias = pd.unique(serie.dropna())
+    return serie.astype(pd.CategoricalDtype(categories=categorias))
+
+
+def optimizar_tipos(df, tipos=None):
+    """
+    Convierte las columnas de un DataFrame a tipos compactos.
+
+    Args:
+        df: DataFrame devuelto por read_sql
+        tipos: dict opcional columna -> dtype que sustituye a la conversión automática
+    """
+    tipos = tipos or {}
+    for columna in df.columns:
+        serie = df[columna]
+        if columna in tipos:
+            df[columna] = serie.astype(tipos[columna])
+        elif serie.dtype == object:
+            valor = _primer_valor(serie)
+            if isinstance(valor, Decimal):
+                df[columna] = pd.to_numeric(serie, errors="coerce").astype("float32")
+            elif isinstance(valor, str):
+                if serie.nunique() <= len(serie) * UMBRAL_CATEGORIA:
+                    df[columna] = _categoria(serie)
+                elif TIPO_TEXTO:
+                    df[columna] = serie.astype(TIPO_TEXTO)
+        elif pd.api.types.is_float_dtype(serie):
+            df[columna] = serie.astype("float32")
+        elif pd.api.types.is_integer_dtype(serie):
+            df[columna] = pd.to_numeric(serie, downcast="integer")
+    return df
+
+
+def _registrar(nombre, filas, antes, despues, df):
+    with _informes_lock:
+        informe = _informes.setdefault(nombre, {"calls": 0})
+        informe.update({
+            "calls": informe["calls"] + 1,
+            "rows": filas,
+            "bytes_before": int(antes),
+            "bytes_after": int(despues),
+            "saved_ratio": round(float(1 - despues / antes), 4) if antes else 0.0,
+            "dtypes": {str(columna): str(tipo) for columna, tipo in df.dtypes.items()},
+        })
+
+
+def _convertir(df, nombre, tipos, optimizar):
+    if not optimizar:
+        return df
+    with medir("tipos", nombre):
+        antes = df.memory_usage(deep=True).sum()
+        df = optimizar_tipos(df, tipos)
+        despues = df.memory_usage(deep=True).sum()
+    _registrar(nombre, len(df), antes, despues, df)
+    return df
+
+
+def _consulta(query):
+    return text(query) if isinstance(query, str) else query
+
+
+def leer_dataframe(query, params=None, nombre="dataframe", tipos=None, optimizar=None):
+    """
+    Ejecuta una consulta y devuelve un DataFrame con tipos compactos.
+
+    Args:
+        query: SQL como texto o TextClause
+        params: parámetros de la consulta
+        nombre: nombre de la consulta en las métricas y en el informe de memoria
+        tipos: dtypes explícitos por columna
+        optimizar: None usa DATAFRAMES_OPTIMIZADOS
+
+    El DataFrame ya convertido se guarda en la caché en disco compartida por
+    los workers (ver cache_disco.py).
+    """
+    optimizar = DATAFRAMES_OPTIMIZADOS if optimizar is None else optimizar
+    clave = cache_disco.clave("dataframe", query, params, (tipos, optimizar))
+    cacheado = cache_disco.obtener(clave, nombre)
+    if cacheado is not None:
+        return cacheado
+    with medir("pool", nombre):
+        conn = conectar_lectura()
+    try:
+        # read_sql ejecuta la consulta y construye el DataFrame en un solo paso
+        with medir("sql", nombre):
+            df = pd.read_sql(_consulta(query), conn, params=params or {})
+    finally:
+        conn.close()
+    df = _convertir(df, nombre, tipos, optimizar)
+    cache_disco.guardar(clave, df, nombre)
+    return df
+
+
+def iterar_dataframe(query, params=None, nombre="dataframe", tipos=None, optimizar=None, chunksize=10000):
+    """
+    Igual que leer_dataframe, pero genera DataFrames de chunksize filas
+    leídos con un cursor del lado del servidor, para resultados grandes.
+    """
+    optimizar = DATAFRAMES_OPTIMIZADOS if optimizar is None else optimizar
+    with conectar_lectura() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        for trozo in pd.read_sql(_consulta(query), conn, params=params or {}, chunksize=chunksize):
+            yield _convertir(trozo, nombre, tipos, optimizar)
+
+
+def informe_memoria():
+    """Memoria usada por el último DataFrame de cada consulta, antes y después de optimizar"""
+    with _informes_lock:
+        return {nombre: dict(informe) for nombre, informe in _informes.items()}
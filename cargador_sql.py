@@ -0,0 +1,300 @@
+import re
+import sys
+import time
+
+# Cargador de volcados SQL por streaming. El archivo se lee por bloques y se
+# separa en sentencias respetando cadenas entre comillas, escapes y
+# comentarios, así que un ';' dentro de un nombre no corta la sentencia.
+# Los INSERT ... VALUES se reparten en lotes de filas de tamaño configurable
+# sin tener que cargar la sentencia completa en memoria.
+
+TAM_BLOQUE = 1 << 16
+TAM_LOTE = 1000
+
+# Caracteres que cambian el estado del analizador fuera de una cadena
+_ESPECIALES = re.compile(r"[;'\"`()#]|--|/\*")
+_FIN_CADENA = {
+    "'": re.compile(r"[\\']"),
+    '"': re.compile(r'[\\"]'),
+    "`": re.compile(r"`"),
+}
+_FIN_LINEA = re.compile(r"\n")
+_FIN_BLOQUE = re.compile(r"\*/")
+_CABECERA_INSERT = re.compile(r"^\s*(INSERT|REPLACE)\b.*\bVALUES\s*$", re.IGNORECASE | re.DOTALL)
+
+
+def iterar_sentencias(archivo, tam_bloque=TAM_BLOQUE):
+    """
+    Recorre un archivo SQL sin cargarlo entero en memoria.
+
+    Genera tuplas con uno de estos formatos:
+        ("sentencia", texto)        sentencia completa sin el ';' final
+        ("fila", cabecera, tupla)   una fila "(...)" de un INSERT ... VALUES
+        ("fin_insert", cabecera)    fin de un INSERT ... VALUES
+    """
+    buffer = ""
+    pos = 0              # posición de análisis
+    inicio = 0           # inicio de la sentencia (o de la fila) en curso
+    estado = None        # None, comilla abierta, "--" o "/*"
+    profundidad = 0      # paréntesis abiertos fuera de cadenas
+    cabecera = None      # cabecera del INSERT ... VALUES en curso
+    codigo = False       # la sentencia contiene algo más que comentarios
+    fin_archivo = False
+
+    while True:
+        if estado is None:
+            patron = _ESPECIALES
+        elif estado == "--":
+            patron = _FIN_LINEA
+        elif estado == "/*":
+            patron = _FIN_BLOQUE
+        else:
+            patron = _FIN_CADENA[estado]
+
+        m = patron.search(buffer, pos)
+
+        # Se necesita un carácter más de contexto para decidir ('--', '/*',
+        # comillas dobladas y barras invertidas al final del bloque)
+        if not fin_archivo and (m is None or m.end() >= len(buffer)):
+            bloque = archivo.read(tam_bloque)
+            if not bloque:
+                fin_archivo = True
+            buffer = buffer[inicio:] + bloque
+            pos -= inicio
+            inicio = 0
+            continue
+
+        if m is None:
+            if estado is None and buffer[pos:].strip():
+                codigo = True
+            break
+
+        token = m.group()
+
+        if estado is None:
+            if buffer[pos:m.start()].strip():
+                codigo = True
+
+            if token == ";":
+                if cabecera is not None:
+                    if buffer[inicio:m.start()].strip(" \t\r\n,"):
+                        raise ValueError("Cláusulas después de VALUES no soportadas en la carga por lotes")
+                    yield ("fin_insert", cabecera)
+                elif codigo:
+                    yield ("sentencia", buffer[inicio:m.start()].strip())
+                pos = inicio = m.end()
+                profundidad = 0
+                cabecera = None
+                codigo = False
+            elif token in ("'", '"', "`"):
+                estado = token
+                codigo = True
+                pos = m.end()
+            elif token == "(":
+                if profundidad == 0:
+                    if cabecera is None and _CABECERA_INSERT.match(buffer[inicio:m.start()]):
+                        cabecera = buffer[inicio:m.start()].strip()
+                    if cabecera is not None:
+                        # Comienza una nueva fila de VALUES
+                        inicio = m.start()
+                profundidad += 1
+                codigo = True
+                pos = m.end()
+            elif token == ")":
+                profundidad -= 1
+                pos = m.end()
+                if profundidad == 0 and cabecera is not None:
+                    yield ("fila", cabecera, buffer[inicio:pos])
+                    inicio = pos
+            elif token == "--":
+                # En MySQL '--' solo abre un comentario si va seguido de un espacio
+                if m.end() >= len(buffer) or buffer[m.end()] in " \t\r\n":
+                    estado = "--"
+                pos = m.end()
+            elif token == "#":
+                estado = "--"
+                pos = m.end()
+            else:
+                estado = "/*"
+                pos = m.end()
+
+        elif estado in ("--", "/*"):
+            estado = None
+            pos = m.end()
+            if not codigo and cabecera is None:
+                # Los comentarios previos a la sentencia no forman parte de ella
+                inicio = pos
+
+        elif token == "\\":
+            # Barra invertida: se salta el carácter escapado
+            pos = m.end() + 1
+
+        elif estado != "`" and buffer[m.end():m.end() + 1] == estado:
+            # Comilla doblada ('') dentro de la cadena
+            pos = m.end() + 1
+
+        else:
+            estado = None
+            pos = m.end()
+
+    if estado in ("'", '"', "`"):
+        raise ValueError("Cadena sin cerrar al final del archivo")
+    if cabecera is not None:
+        yield ("fin_insert", cabecera)
+    elif codigo:
+        yield ("sentencia", buffer[inicio:].strip())
+
+
+# Sentencias de los volcados que solo tienen sentido en MySQL
+_SOLO_MYSQL = re.compile(r"^\s*(DROP DATABASE|CREATE DATABASE|USE|COMMIT|SET|LOCK TABLES|UNLOCK TABLES)\b", re.IGNORECASE)
+_LITERAL_MYSQL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_ESCAPES_MYSQL = {"\\'": "''", '\\"': '"', "\\\\": "\\", "\\n": "\n", "\\r": "\r", "\\t": "\t", "\\0": "\0"}
+
+
+def _literal_sqlite(m):
+    return re.sub(r"\\.", lambda e: _ESCAPES_MYSQL.get(e.group(), e.group()[1]), m.group())
+
+
+def adaptar_sqlite(sql):
+    """
+    Adapta una sentencia de los volcados de MySQL a SQLite: quita el esquema
+    video_games., AUTO_INCREMENT y las sentencias propias de MySQL, y
+    convierte los escapes con barra invertida de las cadenas.
+    """
+    if _SOLO_MYSQL.match(sql):
+        return None
+    sql = re.sub(r"\bvideo_games\.", "", sql)
+    sql = re.sub(r"\s+AUTO_INCREMENT\b", "", sql, flags=re.IGNORECASE)
+    if "\\" in sql:
+        sql = _LITERAL_MYSQL.sub(_literal_sqlite, sql)
+    return sql
+
+
+def _sentencias_previas(dialecto, desactivar_fk):
+    if not desactivar_fk:
+        return [], []
+    if dialecto == "mysql":
+        return (
+            ["SET FOREIGN_KEY_CHECKS = 0", "SET UNIQUE_CHECKS = 0"],
+            ["SET UNIQUE_CHECKS = 1", "SET FOREIGN_KEY_CHECKS = 1"],
+        )
+    if dialecto == "sqlite":
+        return ["PRAGMA foreign_keys = OFF"], ["PRAGMA foreign_keys = ON"]
+    return [], []
+
+
+def informe_progreso(archivo, filas, segundos):
+    """Muestra el avance de la carga en la consola"""
+    velocidad = filas / segundos if segundos else 0
+    print(f"⏳ {archivo}: {filas} filas ({velocidad:,.0f} filas/s)")
+
+
+def cargar_archivo_sql(conn, file_path, tam_lote=TAM_LOTE, desactivar_fk=True,
+                       transaccion_unica=True, progreso=informe_progreso,
+                       intervalo_progreso=2.0, adaptar=None):
+    """
+    Carga un volcado SQL por streaming agrupando los INSERT en lotes.
+
+    Args:
+        conn: Connection de SQLAlchemy
+        file_path: ruta del archivo .sql
+        tam_lote: filas por cada INSERT enviado a la base de datos
+        desactivar_fk: desactiva las comprobaciones de claves foráneas durante la carga
+        transaccion_unica: si es False, se hace commit después de cada lote
+        progreso: función (archivo, filas, segundos) llamada cada intervalo_progreso segundos
+        adaptar: función opcional que transforma cada sentencia antes de ejecutarla
+
+    Returns:
+        dict con sentencias, filas, segundos y filas por segundo
+    """
+    adaptar = adaptar or (lambda sql: sql)
+
+    def ejecutar(sql):
+        sql = adaptar(sql)
+        if sql:
+            # exec_driver_sql evita que ':' o '%' dentro de los datos se
+            # interpreten como parámetros
+            conn.exec_driver_sql(sql)
+
+    inicio = time.perf_counter()
+    ultimo_informe = inicio
+    sentencias = filas = 0
+    lote = []
+
+    def enviar_lote(cabecera):
+        nonlocal sentencias, filas
+        if not lote:
+            return
+        ejecutar(cabecera + "\n" + ",\n".join(lote))
+        filas += len(lote)
+        sentencias += 1
+        lote.clear()
+        if not transaccion_unica:
+            conn.commit()
+
+    antes, despues = _sentencias_previas(conn.dialect.name, desactivar_fk)
+    for sql in antes:
+        conn.exec_driver_sql(sql)
+
+    try:
+        with open(file_path, "r", encoding="utf-8") as archivo:
+            for evento in iterar_sentencias(archivo):
+                if evento[0] == "fila":
+                    lote.append(evento[2])
+                    if len(lote) >= tam_lote:
+                        enviar_lote(evento[1])
+                elif evento[0] == "fin_insert":
+                    enviar_lote(evento[1])
+                else:
+                    ejecutar(evento[1])
+                    sentencias += 1
+
+                ahora = time.perf_counter()
+                if progreso and ahora - ultimo_informe >= intervalo_progreso:
+                    progreso(file_path, filas, ahora - inicio)
+                    ultimo_informe = ahora
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        for sql in despues:
+            conn.exec_driver_sql(sql)
+        conn.commit()
+
+    segundos = time.perf_counter() - inicio
+    resultado = {
+        "file": file_path,
+        "statements": sentencias,
+        "rows": filas,
+        "seconds": round(segundos, 3),
+        "rows_per_second": round(filas / segundos, 1) if segundos else 0.0,
+    }
+    if progreso:
+        progreso(file_path, filas, segundos)
+    return resultado
+
+
+if __name__ == "__main__":
+    # Uso: python cargador_sql.py sql/*.sql [--lote 1000]
+    from conexion import get_engine
+
+    argumentos = sys.argv[1:]
+    tam_lote = TAM_LOTE
+    if "--lote" in argumentos:
+        i = argumentos.index("--lote")
+        tam_lote = int(argumentos[i + 1])
+        del argumentos[i:i + 2]
+
+    with get_engine().connect() as conexion:
+        for ruta in argumentos:
+            resultado = cargar_archivo_sql(conexion, ruta, tam_lote=tam_lote)
+            print(f"✅ {ruta}: {resultado['rows']} filas en {resultado['seconds']} s")
+
+    # Los workers de la API comparten la caché de consultas en disco: la
+    # nueva versión de datos descarta los resultados anteriores a la carga
+    from cache_disco import invalidar_cache_disco
+    invalidar_cache_disco()
+    # Las instantáneas del cubo (instantanea.py) anteriores a la carga dejan de usarse
+    from instantanea import marcar_datos_modificados
+    marcar_datos_modificados()
@@ -0,0 +1,222 @@
+import os
+import zlib
+
+from fastapi import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+from metricas import medir
+
+# Compresión de las respuestas de texto (JSON, NDJSON, HTML, CSV) con gzip
+# o brotli según la cabecera Accept-Encoding del cliente. Las respuestas
+# normales se comprimen de una vez y las transmitidas por bloques se
+# comprimen bloque a bloque. Las respuestas guardadas en caché se
+# comprimen una sola vez al guardarlas y se sirven ya comprimidas.
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli está en requirements.txt
+    brotli = None
+
+COMPRESION_ACTIVA = os.getenv("COMPRESION_ACTIVA", "1").lower() in ("1", "true", "si", "yes")
+# Tamaño mínimo (bytes) para comprimir una respuesta completa
+COMPRESION_MINIMO_BYTES = int(os.getenv("COMPRESION_MINIMO_BYTES", "1024"))
+# Niveles para la compresión al vuelo (gzip 1-9, brotli 0-11)
+COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+COMPRESION_NIVEL_BROTLI = int(os.getenv("COMPRESION_NIVEL_BROTLI", "5"))
+# Niveles para las respuestas en caché: se comprimen una vez y se sirven muchas
+COMPRESION_NIVEL_GZIP_CACHE = int(os.getenv("COMPRESION_NIVEL_GZIP_CACHE", "9"))
+COMPRESION_NIVEL_BROTLI_CACHE = int(os.getenv("COMPRESION_NIVEL_BROTLI_CACHE", "11"))
+
+IDENTIDAD = "identity"
+
+# Tipos de contenido que se comprimen
+TIPOS_COMPRIMIBLES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def codificaciones_disponibles():
+    """Codificaciones soportadas, en orden de preferencia"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negociar(accept_encoding):
+    """
+    Elige la codificación a partir de la cabecera Accept-Encoding
+    respetando los valores q. Devuelve None si no se acepta ninguna.
+    """
+    if not COMPRESION_ACTIVA or not accept_encoding:
+        return None
+    pesos = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        nombre = nombre.strip().lower()
+        peso = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                peso = float(parametros[2:])
+            except ValueError:
+                peso = 0.0
+        if nombre:
+            pesos[nombre] = peso
+    comodin = pesos.get("*", 0.0)
+    candidatas = [(pesos.get(c, comodin), -i, c) for i, c in enumerate(codificaciones_disponibles())]
+    peso, _, codificacion = max(candidatas)
+    return codificacion if peso > 0 else None
+
+
+def es_comprimible(cabeceras):
+    """La respuesta es de texto y no viene ya comprimida"""
+    if "content-encoding" in cabeceras:
+        return False
+    tipo = cabeceras.get("content-type", "")
+    return tipo.startswith(TIPOS_COMPRIMIBLES)
+
+
+def comprimir(contenido, codificacion, nivel=None):
+    """Comprime un cuerpo completo con gzip o brotli"""
+    if codificacion == "br":
+        calidad = COMPRESION_NIVEL_BROTLI if nivel is None else nivel
+        return brotli.compress(contenido, quality=calidad)
+    nivel = COMPRESION_NIVEL_GZIP if nivel is None else nivel
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    return compresor.compress(contenido) + compresor.flush()
+
+
+class Compresor:
+    """Compresor incremental; cada bloque se vacía para que el cliente lo reciba sin esperar"""
+
+    def __init__(self, codificacion):
+        self.codificacion = codificacion
+        if codificacion == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESION_NIVEL_BROTLI)
+        else:
+            self._zlib = zlib.compressobj(COMPRESION_NIVEL_GZIP, zlib.DEFLATED, 31)
+
+    def bloque(self, datos):
+        if self.codificacion == "br":
+            return self._brotli.process(datos) + self._brotli.flush()
+        return self._zlib.compress(datos) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminar(self):
+        if self.codificacion == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CuerpoPrecomprimido:
+    """
+    Cuerpo de una respuesta en caché con sus versiones comprimidas.
+    len() es la memoria total que ocupan todas las versiones.
+    """
+
+    __slots__ = ("variantes",)
+
+    def __init__(self, contenido):
+        self.variantes = {IDENTIDAD: contenido}
+        if COMPRESION_ACTIVA and len(contenido) >= COMPRESION_MINIMO_BYTES:
+            with medir("compresion"):
+                self.variantes["gzip"] = comprimir(contenido, "gzip", COMPRESION_NIVEL_GZIP_CACHE)
+                if brotli is not None:
+                    self.variantes["br"] = comprimir(contenido, "br", COMPRESION_NIVEL_BROTLI_CACHE)
+
+    def __len__(self):
+        return sum(len(variante) for variante in self.variantes.values())
+
+    @property
+    def contenido(self):
+        return self.variantes[IDENTIDAD]
+
+
+class RespuestaPrecomprimida(Response):
+    """Respuesta que envía la versión ya comprimida que acepte el cliente"""
+
+    def __init__(self, cuerpo, media_type="application/json", **kwargs):
+        self.cuerpo = cuerpo
+        super().__init__(content=cuerpo.contenido, media_type=media_type, **kwargs)
+
+    async def __call__(self, scope, receive, send):
+        codificacion = negociar(Headers(scope=scope).get("accept-encoding"))
+        cabeceras = MutableHeaders(raw=self.raw_headers)
+        if codificacion in self.cuerpo.variantes:
+            self.body = self.cuerpo.variantes[codificacion]
+            cabeceras["Content-Length"] = str(len(self.body))
+            cabeceras["Content-Encoding"] = codificacion
+        if len(self.cuerpo.variantes) > 1:
+            cabeceras.add_vary_header("Accept-Encoding")
+        await super().__call__(scope, receive, send)
+
+
+class MiddlewareCompresion:
+    """
+    Middleware ASGI que comprime las respuestas de texto según Accept-Encoding.
+    Las respuestas completas menores que COMPRESION_MINIMO_BYTES se envían
+    sin comprimir; las transmitidas por bloques se comprimen siempre.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = negociar(Headers(scope=scope).get("accept-encoding"))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compresor = None
+        pasar = False
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor, pasar
+            if mensaje["type"] == "http.response.start":
+                # Las cabeceras se retienen hasta ver el primer bloque del cuerpo
+                inicio = mensaje
+                return
+            if mensaje["type"] != "http.response.body" or pasar:
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+
+            if compresor is None:
+                cabeceras = MutableHeaders(scope=inicio)
+                if not es_comprimible(cabeceras) or (not mas and len(cuerpo) < COMPRESION_MINIMO_BYTES):
+                    pasar = True
+                    if "content-encoding" not in cabeceras and es_comprimible(cabeceras):
+                        cabeceras.add_vary_header("Accept-Encoding")
+                    await send(inicio)
+                    await send(mensaje)
+                    return
+
+                cabeceras["Content-Encoding"] = codificacion
+                cabeceras.add_vary_header("Accept-Encoding")
+                if not mas:
+                    with medir("compresion"):
+                        datos = comprimir(cuerpo, codificacion)
+                    cabeceras["Content-Length"] = str(len(datos))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": datos})
+                    return
+
+                # Respuesta en streaming: la longitud final no se conoce
+                del cabeceras["Content-Length"]
+                compresor = Compresor(codificacion)
+                await send(inicio)
+
+            with medir("compresion"):
+                datos = compresor.bloque(cuerpo) if cuerpo else b""
+                if not mas:
+                    datos += compresor.terminar()
+            await send({"type": "http.response.body", "body": datos, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
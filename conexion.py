@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# URL por defecto si no se define DATABASE_URL en el entorno
+DEFAULT_DATABASE_URL = "mysql+pymysql://root:rootpassword@db:3306/video_games"
+
+# Driver asíncrono equivalente a cada driver síncrono
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+_engine = None
+_async_engine = None
+_lock = threading.Lock()
+
+
+def _env_int(nombre, defecto):
+    valor = os.getenv(nombre)
+    return int(valor) if valor not in (None, "") else defecto
+
+
+def _env_bool(nombre, defecto):
+    valor = os.getenv(nombre)
+    if valor in (None, ""):
+        return defecto
+    return valor.lower() in ("1", "true", "si", "yes")
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que además registra cuánto se espera para obtener una conexión"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._stats_lock:
+                self.esperas += 1
+                self.espera_total += espera
+                self.espera_max = max(self.espera_max, espera)
+
+
+def configuracion_pool():
+    """Lee la configuración de la conexión desde variables de entorno"""
+    return {
+        "url": os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL),
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 3600),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def crear_engine(url=None, **opciones):
+    """
+    Crea un engine de SQLAlchemy con el pool configurado por entorno.
+
+    Args:
+        url: URL de conexión; por defecto DATABASE_URL
+        opciones: valores que reemplazan a los de configuracion_pool()
+    """
+    config = {**configuracion_pool(), **opciones}
+    url = make_url(url or config.pop("url"))
+    config.pop("url", None)
+
+    # SQLite en memoria no admite un pool de varias conexiones
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return create_engine(url)
+
+    return create_engine(url, poolclass=PoolMedido, **config)
+
+
+def url_async(url=None):
+    """
+    URL para el engine asíncrono: ASYNC_DATABASE_URL si está definida o,
+    si no, DATABASE_URL con el driver asíncrono correspondiente.
+    """
+    if url is None and os.getenv("ASYNC_DATABASE_URL"):
+        return make_url(os.getenv("ASYNC_DATABASE_URL"))
+
+    url = make_url(url or configuracion_pool()["url"])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No hay un driver asíncrono configurado para '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def crear_engine_async(url=None, **opciones):
+    """Crea un engine asíncrono con la misma configuración de pool que crear_engine"""
+    config = {**configuracion_pool(), **opciones}
+    config.pop("url")
+    url = url_async(url)
+
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return create_async_engine(url)
+
+    # aiosqlite usa NullPool por defecto; se fuerza el mismo tipo de pool para todos
+    return create_async_engine(url, poolclass=AsyncAdaptedQueuePool, **config)
+
+
+def get_engine():
+    """Devuelve el engine compartido por todos los módulos del proceso"""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = crear_engine()
+    return _engine
+
+
+def get_async_engine():
+    """Devuelve el engine asíncrono compartido, creado en el primer uso"""
+    global _async_engine
+    if _async_engine is None:
+        with _lock:
+            if _async_engine is None:
+                _async_engine = crear_engine_async()
+    return _async_engine
+
+
+def estadisticas_pool(engine=None):
+    """Estado actual del pool de conexiones y tiempos de espera acumulados"""
+    engine = engine or get_engine()
+    pool = engine.pool
+    stats = {
+        "url": engine.url.render_as_string(hide_password=True),
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            # Conexiones máximas que puede abrir cada worker de uvicorn
+            "max_connections_per_worker": pool.size() + pool._max_overflow,
+        })
+
+    if isinstance(pool, PoolMedido):
+        with pool._stats_lock:
+            stats.update({
+                "waits": pool.esperas,
+                "timeouts": pool.timeouts,
+                "wait_time_total_ms": round(pool.espera_total * 1000, 3),
+                "wait_time_avg_ms": round(pool.espera_total * 1000 / pool.esperas, 3) if pool.esperas else 0.0,
+                "wait_time_max_ms": round(pool.espera_max * 1000, 3),
+            })
+
+    return stats
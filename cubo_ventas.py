@@ -0,0 +1,347 @@
+import os
+import threading
+import numpy as np
+from sqlalchemy import text
+
+from database import engine
+from instantanea import abrir_instantanea
+from version_datos import al_invalidar
+
+# Motor columnar en memoria para los endpoints /stats/*.
+# region_sales se carga una sola vez como arrays de NumPy codificados con enteros
+# y las agregaciones se resuelven con np.bincount en lugar de joins en MySQL.
+# Si hay una instantánea binaria (instantanea.py), el cubo se construye desde
+# sus columnas mapeadas en memoria sin consultar la base de datos.
+CUBO_ACTIVO = os.getenv("CUBO_VENTAS", "0").lower() in ("1", "true", "si", "yes")
+
+_cubo = None
+_lock = threading.Lock()
+
+
+def _agrupar_por_nombre(filas):
+    """
+    Agrupa los ids de una dimensión por nombre, igual que el GROUP BY por
+    nombre de las consultas SQL.
+
+    Returns:
+        (nombres, lookup): lista de nombres únicos y array id -> código (-1 si no existe)
+    """
+    nombres = []
+    codigos = {}
+    max_id = max((fila[0] for fila in filas), default=0)
+    lookup = np.full(max_id + 1, -1, dtype=np.int32)
+    for id_, nombre in filas:
+        if nombre not in codigos:
+            codigos[nombre] = len(nombres)
+            nombres.append(nombre)
+        lookup[id_] = codigos[nombre]
+    return nombres, lookup
+
+
+def _cargar_dimension(conn, tabla, columna):
+    """Carga una tabla de dimensión y agrupa sus ids por nombre"""
+    return _agrupar_por_nombre(conn.execute(text(f"SELECT id, {columna} FROM {tabla}")).all())
+
+
+def _codificar(ids, lookup, defecto=-1):
+    """Traduce un array de ids (con -1 para NULL) a códigos de dimensión"""
+    codigos = np.full(len(ids), defecto, dtype=np.int32)
+    validos = (ids >= 0) & (ids < len(lookup))
+    codigos[validos] = lookup[ids[validos]]
+    if defecto != -1:
+        # Ids que no existen en la dimensión equivalen a un LEFT JOIN sin coincidencia
+        codigos[codigos == -1] = defecto
+    return codigos
+
+
+def _columna(filas, indice):
+    """Extrae una columna entera de las filas, usando -1 para los NULL"""
+    return np.fromiter(
+        (-1 if fila[indice] is None else fila[indice] for fila in filas),
+        dtype=np.int64,
+        count=len(filas),
+    )
+
+
+def _cubo_desde_bd():
+    """Lee region_sales y sus dimensiones de la base de datos"""
+    query = text("""
+    SELECT rs.region_id,
+           gpl.platform_id,
+           gpl.release_year,
+           gp.publisher_id,
+           ga.id AS game_id,
+           ga.genre_id,
+           ROUND(rs.num_sales * 100) AS centimos,
+           gpl.id AS game_platform_id,
+           gp.id AS game_publisher_id
+    FROM region_sales rs
+    LEFT JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+    LEFT JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+    LEFT JOIN game ga ON gp.game_id = ga.id
+    """)
+
+    with engine.connect() as conn:
+        plataformas, lookup_plataforma = _cargar_dimension(conn, "platform", "platform_name")
+        publishers, lookup_publisher = _cargar_dimension(conn, "publisher", "publisher_name")
+        generos, lookup_genero = _cargar_dimension(conn, "genre", "genre_name")
+        regiones, lookup_region = _cargar_dimension(conn, "region", "region_name")
+        filas = conn.execute(query).all()
+
+    # Las ventas se suman en céntimos: los enteros son exactos en float64,
+    # así que los totales coinciden con el SUM(DECIMAL) de MySQL
+    centimos = np.array(
+        [0 if fila[6] is None else int(fila[6]) for fila in filas], dtype=np.int64
+    )
+
+    return _ensamblar_cubo(
+        region=_codificar(_columna(filas, 0), lookup_region),
+        platform_id=_columna(filas, 1),
+        year=_columna(filas, 2),
+        publisher_id=_columna(filas, 3),
+        game=_columna(filas, 4),
+        genre_id=_columna(filas, 5),
+        centimos=centimos,
+        regiones=regiones,
+        tiene_plataforma=_columna(filas, 7) >= 0,
+        tiene_publisher=_columna(filas, 8) >= 0,
+        dimensiones={
+            "platform": (plataformas, lookup_plataforma),
+            "publisher": (publishers, lookup_publisher),
+            "genre": (generos, lookup_genero),
+        },
+    )
+
+
+def _cubo_desde_instantanea(inst):
+    """
+    Construye el cubo desde las columnas de una instantánea. Los LEFT JOIN de
+    la consulta se resuelven con arrays id -> fila de cada tabla.
+    """
+    tablas = inst.tablas
+    cadenas = inst.cadenas
+
+    def dimension(tabla, columna):
+        ids = tablas[tabla]["id"]
+        return _agrupar_por_nombre(list(zip(ids.tolist(), cadenas.lista(tablas[tabla][columna]))))
+
+    def tomar(columna, posiciones):
+        """Valores de una columna en las filas dadas (-1 donde no hay fila)"""
+        valores = np.full(len(posiciones), -1, dtype=np.int64)
+        validas = posiciones >= 0
+        valores[validas] = columna[posiciones[validas]]
+        return valores
+
+    plataformas, lookup_plataforma = dimension("platform", "platform_name")
+    publishers, lookup_publisher = dimension("publisher", "publisher_name")
+    generos, lookup_genero = dimension("genre", "genre_name")
+    regiones, lookup_region = dimension("region", "region_name")
+
+    gpl, gp, ga, rs = tablas["game_platform"], tablas["game_publisher"], tablas["game"], tablas["region_sales"]
+    fila_gpl = _codificar(np.asarray(rs["game_platform_id"]), _posiciones(gpl["id"]))
+    fila_gp = _codificar(tomar(gpl["game_publisher_id"], fila_gpl), _posiciones(gp["id"]))
+    fila_ga = _codificar(tomar(gp["game_id"], fila_gp), _posiciones(ga["id"]))
+
+    return _ensamblar_cubo(
+        region=_codificar(np.asarray(rs["region_id"]), lookup_region),
+        platform_id=tomar(gpl["platform_id"], fila_gpl),
+        year=tomar(gpl["release_year"], fila_gpl),
+        publisher_id=tomar(gp["publisher_id"], fila_gp),
+        game=tomar(ga["id"], fila_ga),
+        genre_id=tomar(ga["genre_id"], fila_ga),
+        # Las ventas se quedan en el memmap: todos los workers comparten esas páginas
+        centimos=rs["centimos"],
+        regiones=regiones,
+        tiene_plataforma=fila_gpl >= 0,
+        tiene_publisher=fila_gp >= 0,
+        dimensiones={
+            "platform": (plataformas, lookup_plataforma),
+            "publisher": (publishers, lookup_publisher),
+            "genre": (generos, lookup_genero),
+        },
+    )
+
+
+def _posiciones(ids):
+    """Array id -> posición de la fila en la tabla (-1 si no existe)"""
+    lookup = np.full(int(ids.max()) + 1 if len(ids) else 1, -1, dtype=np.int64)
+    lookup[ids] = np.arange(len(ids))
+    return lookup
+
+
+def _ensamblar_cubo(region, platform_id, year, publisher_id, game, genre_id, centimos, regiones,
+                    tiene_plataforma, tiene_publisher, dimensiones):
+    """Codifica las columnas de hechos (ids con -1 para NULL) y arma el cubo"""
+    plataformas, lookup_plataforma = dimensiones["platform"]
+    publishers, lookup_publisher = dimensiones["publisher"]
+    generos, lookup_genero = dimensiones["genre"]
+
+    # El LEFT JOIN a genre agrupa juegos sin género bajo NULL ('Desconocido')
+    if None not in generos:
+        generos.append(None)
+    codigo_sin_genero = generos.index(None)
+
+    plataforma = _codificar(platform_id, lookup_plataforma)
+    plataforma[~tiene_plataforma] = -1
+
+    publisher = _codificar(publisher_id, lookup_publisher)
+    publisher[~tiene_publisher] = -1
+
+    genero = _codificar(genre_id, lookup_genero, defecto=codigo_sin_genero)
+    genero[game < 0] = -1
+
+    anio = year.astype(np.int32)
+    anio[~tiene_plataforma] = -1
+
+    return {
+        "region": region,
+        "platform": plataforma,
+        "publisher": publisher,
+        "genre": genero,
+        "year": anio,
+        "game": game.astype(np.int32),
+        "centimos": centimos,
+        "nombres": {
+            "region": regiones,
+            "platform": plataformas,
+            "publisher": publishers,
+            "genre": generos,
+        },
+        "filas": len(centimos),
+    }
+
+
+def _construir_cubo():
+    """
+    Construye el cubo desde la instantánea vigente o, si no hay ninguna
+    posterior a la última recarga de datos, desde la base de datos.
+    """
+    inst = abrir_instantanea()
+    if inst is not None:
+        cubo = _cubo_desde_instantanea(inst)
+        cubo["origen"] = f"instantanea:{inst.id}"
+        return cubo
+    cubo = _cubo_desde_bd()
+    cubo["origen"] = "base de datos"
+    return cubo
+
+
+def recargar_cubo():
+    """
+    Vuelve a leer region_sales (de la instantánea o de la base de datos) y
+    reemplaza el cubo. Las consultas en curso siguen usando la versión
+    anterior hasta terminar.
+    """
+    global _cubo
+    nuevo = _construir_cubo()
+    with _lock:
+        _cubo = nuevo
+    return {"filas": nuevo["filas"], "origen": nuevo["origen"]}
+
+
+def obtener_cubo():
+    """Devuelve el cubo actual, construyéndolo en el primer uso"""
+    global _cubo
+    if _cubo is None:
+        with _lock:
+            if _cubo is None:
+                _cubo = _construir_cubo()
+    return _cubo
+
+
+def _agrupar(codigos, centimos, n_grupos, top=None):
+    """
+    Suma las ventas por código y devuelve los índices de grupo ordenados
+    por ventas descendentes. Con top usa argpartition para no ordenar todo.
+    """
+    validos = codigos >= 0
+    totales = np.bincount(codigos[validos], weights=centimos[validos], minlength=n_grupos)
+    presentes = np.bincount(codigos[validos], minlength=n_grupos) > 0
+    grupos = np.flatnonzero(presentes)
+
+    if top is not None and top < len(grupos):
+        candidatos = np.argpartition(-totales[grupos], top - 1)[:top]
+        grupos = grupos[candidatos]
+
+    # Orden estable: ventas descendentes y, en empate, por código
+    orden = np.lexsort((grupos, -totales[grupos]))
+    grupos = grupos[orden]
+    return grupos, totales[grupos] / 100.0
+
+
+def _ventas_por_dimension(dimension, columna, top=None):
+    cubo = obtener_cubo()
+    nombres = cubo["nombres"][dimension]
+    grupos, totales = _agrupar(cubo[dimension], cubo["centimos"], len(nombres), top)
+    return [
+        {columna: nombres[g], "total_sales": round(float(t), 2)}
+        for g, t in zip(grupos.tolist(), totales.tolist())
+    ]
+
+
+def ventas_por_genero(top=None):
+    """Ventas totales por género (equivalente a /stats/sales-by-genre)"""
+    datos = _ventas_por_dimension("genre", "genre", top)
+    for fila in datos:
+        if fila["genre"] is None:
+            fila["genre"] = "Desconocido"
+    return datos
+
+
+def ventas_por_plataforma(top=None):
+    """Ventas totales por plataforma (equivalente a /stats/sales-by-platform)"""
+    return _ventas_por_dimension("platform", "platform_name", top)
+
+
+def ventas_por_publisher(top=None):
+    """Ventas totales por publisher (equivalente a /stats/sales-by-publisher)"""
+    return _ventas_por_dimension("publisher", "publisher_name", top)
+
+
+def ventas_por_region(top=None):
+    """Ventas totales por región"""
+    return _ventas_por_dimension("region", "region_name", top)
+
+
+def ventas_por_anio_plataforma():
+    """Ventas por año y plataforma (equivalente a /stats/sales-by-year-platform)"""
+    cubo = obtener_cubo()
+    plataformas = cubo["nombres"]["platform"]
+    anio = cubo["year"]
+    plataforma = cubo["platform"]
+
+    validos = (anio >= 0) & (plataforma >= 0)
+    anios = np.unique(anio[validos])
+    # Código combinado año-plataforma para un único bincount
+    codigo = np.full(len(anio), -1, dtype=np.int64)
+    codigo[validos] = np.searchsorted(anios, anio[validos]) * len(plataformas) + plataforma[validos]
+
+    n_grupos = len(anios) * len(plataformas)
+    validos = codigo >= 0
+    totales = np.bincount(codigo[validos], weights=cubo["centimos"][validos], minlength=n_grupos)
+    grupos = np.flatnonzero(np.bincount(codigo[validos], minlength=n_grupos) > 0)
+
+    indice_anio = grupos // len(plataformas)
+    indice_plataforma = grupos % len(plataformas)
+    # Año descendente y, dentro de cada año, ventas descendentes
+    orden = np.lexsort((indice_plataforma, -totales[grupos], -anios[indice_anio]))
+
+    return [
+        {
+            "year": int(anios[indice_anio[i]]),
+            "platform_name": plataformas[indice_plataforma[i]],
+            "total_sales": round(float(totales[grupos[i]] / 100.0), 2),
+        }
+        for i in orden.tolist()
+    ]
+
+
+@al_invalidar
+def _recargar_si_activo():
+    """
+    Recarga el cubo cuando se invalidan los datos, si está en uso. La
+    instantánea vigente es anterior a los datos nuevos, así que se lee de la
+    base de datos hasta que se escriba otra.
+    """
+    if CUBO_ACTIVO or _cubo is not None:
+        recargar_cubo()
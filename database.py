@@ -1,15 +1,25 @@
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import glob
+import asyncio
+import json
+import base64
+import datetime
+from decimal import Decimal
+from conexion import get_engine, get_async_engine
+from replicas import conectar_lectura, conectar_lectura_async
+from cargador_sql import cargar_archivo_sql
+from version_datos import invalidar_datos
+from metricas import medir
+import cache_disco
+from exportacion import exportar_a_archivo, consulta_tabla
+from esquema import obtener_esquema, obtener_esquema_async, tablas, identificador, claves_unicas, columnas
 
-# Configuración de la conexión a la base de datos
-DATABASE_URL = "mysql+pymysql://root:rootpassword@db:3306/video_games"
-engine = create_engine(DATABASE_URL)
+# Engine compartido, configurado con DATABASE_URL y las variables DB_POOL_*
+engine = get_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -22,42 +32,356 @@ def get_db():
         db.close()
 
 def get_tables():
-    """Obtiene una lista de todas las tablas en la base de datos"""
-    inspector = inspect(engine)
-    return inspector.get_table_names()
+    """Obtiene una lista de todas las tablas en la base de datos (desde la caché del esquema)"""
+    return tablas()
 
 def get_table_data(table_name, limit=100):
-    """Obtiene datos de una tabla específica"""
-    query = text(f"SELECT * FROM {table_name} LIMIT {limit}")
-    with engine.connect() as conn:
-        result = conn.execute(query)
-        data = [dict(row._mapping) for row in result]
-    return data
-
-def execute_query(query_text, params=None):
-    """Ejecuta una consulta SQL personalizada"""
+    """Obtiene datos de una tabla específica; el nombre se valida contra el esquema"""
+    return execute_query(f"SELECT * FROM {identificador(table_name)} LIMIT {int(limit)}", nombre="tabla")
+
+# Columnas usadas para la paginación por cursor (keyset) cuando no son la
+# clave primaria de la tabla. Solo se admiten claves únicas: con una clave
+# repetida, la condición ">" del cursor se salta filas. Las tablas sin clave
+# única (como region_sales) se paginan con OFFSET.
+PAGINATION_KEYS = {}
+
+# LIMIT para "sin límite" con OFFSET (MySQL y SQLite exigen LIMIT antes de OFFSET)
+SIN_LIMITE = 2 ** 63 - 1
+
+def _clave_unica(table_name, columns):
+    """Indica si las columnas contienen una clave primaria o única de la tabla"""
+    return any(set(clave) <= set(columns) for clave in claves_unicas(table_name))
+
+def registrar_clave_paginacion(table_name, columns):
+    """
+    Registra las columnas de paginación por cursor de una tabla.
+
+    Raises:
+        ValueError: si las columnas no forman una clave única
+    """
+    if not _clave_unica(table_name, columns):
+        raise ValueError(f"Las columnas {', '.join(columns)} no son una clave única de '{table_name}'")
+    PAGINATION_KEYS[table_name] = tuple(columns)
+
+def _json_default(value):
+    """Convierte a JSON los tipos que devuelve el driver de MySQL"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+def encode_cursor(values):
+    """Codifica los valores de la clave de la última fila en un token opaco"""
+    raw = json.dumps(values, default=_json_default).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token):
+    """Decodifica un token generado por encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+    if not isinstance(values, list):
+        raise ValueError("Cursor de paginación inválido")
+    return values
+
+def keyset_condition(keys, cursor=None):
+    """
+    Construye la condición WHERE que continúa después del cursor.
+
+    Args:
+        keys: lista de tuplas (expresión SQL, "ASC" | "DESC", columna de salida)
+        cursor: token devuelto en "next" por la página anterior
+
+    Returns:
+        (condición SQL, parámetros)
+    """
+    if cursor is None:
+        return "1 = 1", {}
+
+    values = decode_cursor(cursor)
+    if len(values) != len(keys):
+        raise ValueError("Cursor de paginación inválido")
+
+    params = {f"k{i}": value for i, value in enumerate(values)}
+    terms = []
+    for i, (expr, direction, _) in enumerate(keys):
+        operator = "<" if direction == "DESC" else ">"
+        equals = [f"{keys[j][0]} = :k{j}" for j in range(i)]
+        terms.append("(" + " AND ".join(equals + [f"{expr} {operator} :k{i}"]) + ")")
+    return "(" + " OR ".join(terms) + ")", params
+
+def keyset_order(keys):
+    """Cláusula ORDER BY correspondiente a las claves de paginación"""
+    return ", ".join(f"{expr} {direction}" for expr, direction, _ in keys)
+
+def keyset_query(query_template, keys, params=None, cursor=None, limit=None):
+    """
+    Completa una plantilla de consulta con la condición y el orden del cursor.
+    La plantilla debe contener {keyset} en el WHERE y {order} en el ORDER BY.
+
+    Returns:
+        (consulta SQL, parámetros)
+    """
+    condition, cursor_params = keyset_condition(keys, cursor)
+    query = query_template.format(keyset=condition, order=keyset_order(keys))
+    params = {**(params or {}), **cursor_params}
+    if limit is not None:
+        query += " LIMIT :limit"
+        params["limit"] = limit
+    return query, params
+
+def quitar_columnas(row, columns):
+    """Copia de una fila (diccionario) sin las columnas indicadas"""
+    return {key: value for key, value in row.items() if key not in columns}
+
+def _page_result(data, keys, limit, ocultas=()):
+    """
+    Recorta la fila extra de una página y genera el cursor siguiente. Las
+    columnas ocultas (solo usadas por el cursor) se quitan de las filas.
+    """
+    next_cursor = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_cursor = encode_cursor([data[-1][column] for _, _, column in keys])
+    if ocultas:
+        data = [quitar_columnas(row, ocultas) for row in data]
+    return data, next_cursor
+
+def fetch_page(query_template, keys, params=None, limit=100, cursor=None, ocultas=()):
+    """
+    Ejecuta una consulta paginada por cursor (keyset).
+
+    Returns:
+        (filas, token de la página siguiente o None)
+    """
+    # Se pide una fila de más para saber si existe una página siguiente
+    query, params = keyset_query(query_template, keys, params, cursor, limit + 1)
+    return _page_result(execute_query(query, params, nombre="pagina"), keys, limit, ocultas)
+
+async def fetch_page_async(query_template, keys, params=None, limit=100, cursor=None, ocultas=()):
+    """Versión asíncrona de fetch_page"""
+    query, params = keyset_query(query_template, keys, params, cursor, limit + 1)
+    return _page_result(await execute_query_async(query, params, nombre="pagina"), keys, limit, ocultas)
+
+def table_keys(table_name):
+    """
+    Claves de paginación por cursor de una tabla: las registradas o su clave
+    primaria. None si la tabla no tiene clave única (se pagina con OFFSET).
+    """
+    columns = PAGINATION_KEYS.get(table_name)
+    # El esquema puede haber cambiado desde que se registró la clave
+    if columns is None or not _clave_unica(table_name, columns):
+        unicas = claves_unicas(table_name)
+        columns = unicas[0] if unicas else None
+    if columns is None:
+        return None
+    return [(column, "ASC", column) for column in columns]
+
+def table_query_template(table_name):
+    """Plantilla de consulta paginable para una tabla completa"""
+    return f"SELECT * FROM {identificador(table_name)} WHERE {{keyset}} ORDER BY {{order}}"
+
+def _offset(cursor):
+    """Filas ya devueltas según un cursor de paginación con OFFSET"""
+    if cursor is None:
+        return 0
+    values = decode_cursor(cursor)
+    if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+        raise ValueError("Cursor de paginación inválido")
+    return values[0]
+
+def table_query(table_name, cursor=None, limit=None):
+    """
+    Consulta de una tabla completa a partir de un cursor: por clave (keyset)
+    si la tabla tiene una clave única y con OFFSET si no. Sin clave, las filas
+    se ordenan por todas las columnas para que el orden sea estable.
+
+    Returns:
+        (consulta SQL, parámetros)
+    """
+    keys = table_keys(table_name)
+    if keys is not None:
+        return keyset_query(table_query_template(table_name), keys, cursor=cursor, limit=limit)
+    quote = engine.dialect.identifier_preparer.quote
+    order = ", ".join(quote(column) for column in columnas(table_name))
+    query = f"SELECT * FROM {identificador(table_name)} ORDER BY {order} LIMIT :limit OFFSET :offset"
+    return query, {"limit": SIN_LIMITE if limit is None else limit, "offset": _offset(cursor)}
+
+def _offset_page_result(data, cursor, limit):
+    """Recorta la fila extra de una página con OFFSET y genera el cursor siguiente"""
+    next_cursor = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_cursor = encode_cursor([_offset(cursor) + limit])
+    return data, next_cursor
+
+def get_table_page(table_name, limit=100, cursor=None):
+    """Obtiene una página de una tabla ordenada por su clave, a partir de un cursor"""
+    keys = table_keys(table_name)
+    if keys is not None:
+        return fetch_page(table_query_template(table_name), keys, limit=limit, cursor=cursor)
+    query, params = table_query(table_name, cursor, limit + 1)
+    return _offset_page_result(execute_query(query, params, nombre="pagina"), cursor, limit)
+
+async def get_table_page_async(table_name, limit=100, cursor=None):
+    """Versión asíncrona de get_table_page"""
+    await obtener_esquema_async()
+    keys = table_keys(table_name)
+    if keys is not None:
+        return await fetch_page_async(table_query_template(table_name), keys, limit=limit, cursor=cursor)
+    query, params = table_query(table_name, cursor, limit + 1)
+    return _offset_page_result(await execute_query_async(query, params, nombre="pagina"), cursor, limit)
+
+def stream_query(query_text, params=None):
+    """
+    Ejecuta una consulta con un cursor del lado del servidor y devuelve
+    las filas a medida que llegan, sin cargar todo el resultado en memoria.
+    """
+    query = text(query_text)
+    with conectar_lectura() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=1000).execute(query, params or {})
+        for row in result:
+            yield dict(row._mapping)
+
+async def stream_query_async(query_text, params=None):
+    """Versión asíncrona de stream_query"""
+    query = text(query_text)
+    conn = await conectar_lectura_async()
+    try:
+        result = await conn.stream(query, params or {})
+        async for row in result:
+            yield dict(row._mapping)
+    finally:
+        await conn.close()
+
+def stream_ndjson(rows, batch_size=500):
+    """Serializa filas como NDJSON agrupando las líneas en bloques"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=_json_default, ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+async def stream_ndjson_async(rows, batch_size=500):
+    """Versión de stream_ndjson para iteradores asíncronos"""
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(row, default=_json_default, ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def _filas_cacheadas(cacheado):
+    """
+    Convierte un resultado guardado en la caché de disco (columnas y tuplas)
+    en filas Row, las mismas que devuelve una consulta (row._mapping, row.columna).
+    """
+    columns, rows = cacheado
+    return columns, IteratorResult(SimpleResultMetaData(columns), iter(rows)).all()
+
+def execute_query_rows(query_text, params=None, nombre="consulta", compartir=False):
+    """
+    Ejecuta una consulta SQL y devuelve (columnas, filas) sin convertir las
+    filas a diccionarios. Registra por separado la espera del pool y la
+    ejecución bajo el nombre de consulta indicado (ver metricas.py). Es una
+    lectura: se ejecuta en una réplica si hay alguna disponible (ver replicas.py).
+    Con compartir=True (consultas analíticas de /stats/*) el resultado se
+    guarda en la caché de disco compartida con los demás workers (ver cache_disco.py).
+    """
+    clave = cache_disco.clave("filas", query_text, params) if compartir else None
+    if compartir:
+        cacheado = cache_disco.obtener(clave, nombre)
+        if cacheado is not None:
+            return _filas_cacheadas(cacheado)
+    query = text(query_text)
+    with medir("pool", nombre):
+        conn = conectar_lectura()
+    try:
+        with medir("sql", nombre):
+            result = conn.execute(query, params or {})
+            columns = list(result.keys())
+            rows = result.all()
+    finally:
+        conn.close()
+    if compartir:
+        cache_disco.guardar(clave, (columns, [tuple(row) for row in rows]), nombre)
+    return columns, rows
+
+async def execute_query_rows_async(query_text, params=None, nombre="consulta", compartir=False):
+    """Versión asíncrona de execute_query_rows"""
+    clave = cache_disco.clave("filas", query_text, params) if compartir else None
+    if compartir:
+        # La lectura de SQLite y la decodificación también van fuera del event loop
+        cacheado = await asyncio.to_thread(cache_disco.obtener, clave, nombre)
+        if cacheado is not None:
+            return _filas_cacheadas(cacheado)
     query = text(query_text)
-    with engine.connect() as conn:
-        result = conn.execute(query, params or {})
-        data = [dict(row._mapping) for row in result]
-    return data
+    with medir("pool", nombre):
+        conn = await conectar_lectura_async()
+    try:
+        with medir("sql", nombre):
+            result = await conn.execute(query, params or {})
+            columns = list(result.keys())
+            rows = result.all()
+    finally:
+        await conn.close()
+    if compartir:
+        # La escritura en disco se hace fuera del event loop
+        await asyncio.to_thread(cache_disco.guardar, clave, (columns, [tuple(row) for row in rows]), nombre)
+    return columns, rows
+
+def execute_query(query_text, params=None, nombre="consulta"):
+    """Ejecuta una consulta SQL personalizada y devuelve una lista de diccionarios"""
+    columns, rows = execute_query_rows(query_text, params, nombre)
+    with medir("conversion", nombre):
+        return [dict(zip(columns, row)) for row in rows]
+
+async def execute_query_async(query_text, params=None, nombre="consulta"):
+    """Ejecuta una consulta SQL personalizada sin bloquear el event loop"""
+    columns, rows = await execute_query_rows_async(query_text, params, nombre)
+    with medir("conversion", nombre):
+        return [dict(zip(columns, row)) for row in rows]
+
+async def get_table_data_async(table_name, limit=100):
+    """Versión asíncrona de get_table_data"""
+    await obtener_esquema_async()
+    return await execute_query_async(f"SELECT * FROM {identificador(table_name)} LIMIT {int(limit)}", nombre="tabla")
+
+async def get_table_rows_async(table_name, limit=100):
+    """Como get_table_data_async, pero devuelve (columnas, filas)"""
+    await obtener_esquema_async()
+    return await execute_query_rows_async(f"SELECT * FROM {identificador(table_name)} LIMIT {int(limit)}", nombre="tabla")
+
+async def get_tables_async():
+    """Versión asíncrona de get_tables"""
+    return list(await obtener_esquema_async())
 
 def get_table_to_dataframe(table_name, limit=1000):
     """Convierte una tabla a DataFrame de pandas"""
-    query = text(f"SELECT * FROM {table_name} LIMIT {limit}")
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn)
-    return df
+    # pandas se importa bajo demanda para no cargarlo en los workers que solo sirven JSON
+    from carga_dataframes import leer_dataframe
+    return leer_dataframe(f"SELECT * FROM {identificador(table_name)} LIMIT {int(limit)}", nombre="get_table_to_dataframe")
 
 def export_table_to_csv(table_name, file_path):
-    """Exporta una tabla a un archivo CSV"""
-    df = get_table_to_dataframe(table_name)
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    df.to_csv(file_path, index=False)
+    """Exporta una tabla completa a un archivo CSV, por bloques y sin límite de filas"""
+    exportar_a_archivo(consulta_tabla(table_name), file_path, "csv")
     return file_path
 
 def create_bar_chart(data, x_column, y_column, title, file_path):
     """Crea un gráfico de barras y lo guarda"""
+    import pandas as pd
+    import matplotlib
+    matplotlib.use('Agg')  # Usar backend no interactivo
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.figure(figsize=(12, 6))
     if isinstance(data, list):
         # Convertir lista de diccionarios a DataFrame
@@ -75,6 +399,10 @@ def create_bar_chart(data, x_column, y_column, title, file_path):
 
 def create_line_chart(data, x_column, y_column, title, file_path):
     """Crea un gráfico de líneas y lo guarda"""
+    import pandas as pd
+    import matplotlib
+    matplotlib.use('Agg')  # Usar backend no interactivo
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(12, 6))
     if isinstance(data, list):
         # Convertir lista de diccionarios a DataFrame
@@ -92,33 +420,8 @@ def create_line_chart(data, x_column, y_column, title, file_path):
     return file_path
 
 def get_database_schema():
-    """Obtiene el esquema de la base de datos"""
-    inspector = inspect(engine)
-    schema = {}
-    
-    for table_name in inspector.get_table_names():
-        columns = []
-        for column in inspector.get_columns(table_name):
-            columns.append({
-                "name": column["name"],
-                "type": str(column["type"]),
-                "nullable": column["nullable"]
-            })
-        
-        foreign_keys = []
-        for fk in inspector.get_foreign_keys(table_name):
-            foreign_keys.append({
-                "referred_table": fk["referred_table"],
-                "referred_columns": fk["referred_columns"],
-                "constrained_columns": fk["constrained_columns"]
-            })
-        
-        schema[table_name] = {
-            "columns": columns,
-            "foreign_keys": foreign_keys
-        }
-    
-    return schema
+    """Obtiene el esquema de la base de datos (columnas y claves foráneas de cada tabla), desde la caché"""
+    return obtener_esquema()
 
 def get_all_databases(db):
     """Obtiene una lista de todas las bases de datos en el servidor MySQL"""
@@ -127,25 +430,34 @@ def get_all_databases(db):
     databases = [row[0] for row in result]
     return databases
 
-def execute_sql_file(db, file_path):
-    """Ejecuta un archivo SQL"""
-    with open(file_path, 'r') as file:
-        sql_content = file.read()
-    
-    # Dividir por ; para ejecutar múltiples comandos
-    statements = sql_content.split(';')
-    
-    for statement in statements:
-        if statement.strip():
-            db.execute(text(statement))
+def execute_sql_file(db, file_path, batch_size=1000, disable_fk_checks=True, single_transaction=True):
+    """
+    Ejecuta un archivo SQL por streaming, agrupando los INSERT en lotes
+    (ver cargador_sql.cargar_archivo_sql)
+    """
+    # El volcado se carga en una conexión propia para que los SET de la
+    # carga (claves foráneas) se apliquen a todos los lotes
+    with db.get_bind().connect() as conn:
+        result = cargar_archivo_sql(
+            conn,
+            file_path,
+            tam_lote=batch_size,
+            desactivar_fk=disable_fk_checks,
+            transaccion_unica=single_transaction,
+        )
     
     db.commit()
-    return True
+    invalidar_datos()
+    return result
 
 # Nueva función para realizar consultas para gráficos de seaborn
-def execute_dataframe_query(query_text, params=None):
-    """Ejecuta una consulta SQL y devuelve un DataFrame de pandas"""
-    query = text(query_text)
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params=params or {})
-    return df
\ No newline at end of file
+def execute_dataframe_query(query_text, params=None, nombre="dataframe", tipos=None, chunksize=None):
+    """
+    Ejecuta una consulta SQL y devuelve un DataFrame de pandas con tipos
+    compactos (ver carga_dataframes.py). Con chunksize devuelve un iterador
+    de DataFrames leídos por bloques.
+    """
+    from carga_dataframes import leer_dataframe, iterar_dataframe
+    if chunksize:
+        return iterar_dataframe(query_text, params, nombre, tipos, chunksize=chunksize)
+    return leer_dataframe(query_text, params, nombre, tipos)
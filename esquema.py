@@ -0,0 +1,161 @@
+import time
+import threading
+from sqlalchemy import inspect
+from fastapi.concurrency import run_in_threadpool
+
+from conexion import get_engine
+from replicas import TABLA_LATIDO
+from version_datos import al_invalidar
+
+# Caché del esquema de la base de datos.
+# inspect(engine) lanza varias consultas a information_schema por tabla; el
+# esquema se lee una sola vez y se reutiliza para listar tablas, describir
+# columnas y claves foráneas y validar los nombres de tabla que llegan en
+# las URLs. Se vuelve a leer tras invalidar_datos() (recarga de los volcados)
+# o con invalidar_esquema().
+
+engine = get_engine()
+
+# Tablas de uso interno que no se muestran ni se aceptan en las URLs
+TABLAS_INTERNAS = {TABLA_LATIDO}
+
+_esquema = None
+_claves = {}
+_cargado_en = None
+_lock = threading.Lock()
+_lecturas = 0
+
+
+def _claves_unicas(inspector, table_name, columnas_nulables):
+    """
+    Claves primarias y únicas de una tabla cuyas columnas no admiten NULL
+    (dos filas con NULL no chocan en un índice único).
+    """
+    candidatas = [inspector.get_pk_constraint(table_name).get("constrained_columns") or []]
+    candidatas += [constraint["column_names"] for constraint in inspector.get_unique_constraints(table_name)]
+    candidatas += [index["column_names"] for index in inspector.get_indexes(table_name) if index.get("unique")]
+    claves = []
+    for columnas in candidatas:
+        # Los índices sobre expresiones devuelven None como nombre de columna
+        if not columnas or None in columnas or set(columnas) & columnas_nulables:
+            continue
+        if tuple(columnas) not in claves:
+            claves.append(tuple(columnas))
+    return claves
+
+
+def _leer_esquema():
+    inspector = inspect(engine)
+    schema = {}
+    claves = {}
+
+    for table_name in inspector.get_table_names():
+        if table_name in TABLAS_INTERNAS:
+            continue
+        columns = []
+        for column in inspector.get_columns(table_name):
+            columns.append({
+                "name": column["name"],
+                "type": str(column["type"]),
+                "nullable": column["nullable"]
+            })
+
+        foreign_keys = []
+        for fk in inspector.get_foreign_keys(table_name):
+            foreign_keys.append({
+                "referred_table": fk["referred_table"],
+                "referred_columns": fk["referred_columns"],
+                "constrained_columns": fk["constrained_columns"]
+            })
+
+        schema[table_name] = {
+            "columns": columns,
+            "foreign_keys": foreign_keys
+        }
+        nulables = {column["name"] for column in columns if column["nullable"]}
+        claves[table_name] = _claves_unicas(inspector, table_name, nulables)
+
+    return schema, claves
+
+
+def esquema_cargado():
+    """Indica si el esquema ya está en caché (sin consultas pendientes)"""
+    return _esquema is not None
+
+
+def obtener_esquema():
+    """Esquema completo {tabla: {columns, foreign_keys}}, leído una sola vez"""
+    global _esquema, _claves, _cargado_en, _lecturas
+    esquema = _esquema
+    if esquema is not None:
+        return esquema
+    with _lock:
+        if _esquema is None:
+            _esquema, _claves = _leer_esquema()
+            _cargado_en = time.time()
+            _lecturas += 1
+        return _esquema
+
+
+async def obtener_esquema_async():
+    """Igual que obtener_esquema, pero la primera lectura se hace fuera del bucle de eventos"""
+    esquema = _esquema
+    if esquema is not None:
+        return esquema
+    return await run_in_threadpool(obtener_esquema)
+
+
+def tablas():
+    """Nombres de las tablas de la base de datos"""
+    return list(obtener_esquema())
+
+
+def comprobar_tabla(table_name):
+    """
+    Comprueba que la tabla existe.
+
+    Raises:
+        ValueError: si la tabla no está en el esquema
+    """
+    if table_name not in obtener_esquema():
+        raise ValueError(f"La tabla '{table_name}' no existe")
+    return table_name
+
+
+def claves_unicas(table_name):
+    """Claves primarias y únicas (tuplas de columnas NOT NULL) de una tabla existente"""
+    comprobar_tabla(table_name)
+    return _claves.get(table_name, [])
+
+
+def columnas(table_name):
+    """Nombres de las columnas de una tabla existente"""
+    return [column["name"] for column in obtener_esquema()[comprobar_tabla(table_name)]["columns"]]
+
+
+def identificador(table_name):
+    """Nombre de una tabla existente entre las comillas del dialecto, listo para usar en SQL"""
+    return engine.dialect.identifier_preparer.quote(comprobar_tabla(table_name))
+
+
+def invalidar_esquema():
+    """Descarta el esquema guardado; se vuelve a leer en el siguiente uso"""
+    global _esquema, _cargado_en
+    with _lock:
+        _esquema = None
+        _cargado_en = None
+
+
+def estado_esquema():
+    """Estado de la caché del esquema"""
+    esquema = _esquema
+    return {
+        "cached": esquema is not None,
+        "tables": len(esquema) if esquema is not None else 0,
+        "loaded_at": _cargado_en,
+        "reads": _lecturas,
+    }
+
+
+# Una recarga de los datos puede crear o modificar tablas
+al_invalidar(invalidar_esquema)
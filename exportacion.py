@@ -0,0 +1,256 @@
+import io
+import os
+import csv
+import zlib
+from sqlalchemy import text
+
+from replicas import conectar_lectura
+from esquema import identificador
+
+# Exportación de tablas completas y consultas analíticas por bloques.
+# Las filas se leen con un cursor del lado del servidor en bloques de tamaño
+# fijo y cada bloque se convierte en bytes de CSV, CSV comprimido con gzip o
+# Parquet en cuanto llega, así que la memoria no depende del tamaño de la
+# tabla y la descarga empieza antes de terminar la consulta. Las lecturas
+# van a una réplica si hay alguna disponible (ver replicas.py).
+
+# Filas por bloque leído de la base de datos
+TAM_BLOQUE_EXPORTACION = int(os.getenv("TAM_BLOQUE_EXPORTACION", "5000"))
+
+FORMATOS_EXPORTACION = {
+    "csv": {"media_type": "text/csv", "extension": "csv"},
+    "csv.gz": {"media_type": "application/gzip", "extension": "csv.gz"},
+    "parquet": {"media_type": "application/vnd.apache.parquet", "extension": "parquet"},
+}
+
+# Consultas analíticas exportables por nombre
+CONSULTAS_EXPORTACION = {
+    "ventas_detalle": """
+        SELECT g.id AS game_id,
+               g.game_name,
+               gen.genre_name,
+               pu.publisher_name,
+               p.platform_name,
+               gpl.release_year,
+               r.region_name,
+               rs.num_sales
+        FROM region_sales rs
+        JOIN region r ON rs.region_id = r.id
+        JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+        JOIN platform p ON gpl.platform_id = p.id
+        JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+        JOIN publisher pu ON gp.publisher_id = pu.id
+        JOIN game g ON gp.game_id = g.id
+        LEFT JOIN genre gen ON g.genre_id = gen.id
+        ORDER BY rs.game_platform_id, rs.region_id
+    """,
+    "ventas_por_juego": """
+        SELECT g.id AS game_id,
+               g.game_name,
+               COALESCE(gen.genre_name, 'Desconocido') AS genre,
+               ROUND(SUM(rs.num_sales), 2) AS total_sales
+        FROM game g
+        LEFT JOIN genre gen ON g.genre_id = gen.id
+        JOIN game_publisher gp ON g.id = gp.game_id
+        JOIN game_platform gpl ON gp.id = gpl.game_publisher_id
+        JOIN region_sales rs ON gpl.id = rs.game_platform_id
+        GROUP BY g.id, g.game_name, gen.genre_name
+        ORDER BY SUM(rs.num_sales) DESC
+    """,
+    "ventas_por_genero": """
+        SELECT COALESCE(g.genre_name, 'Desconocido') AS genre,
+               ROUND(SUM(rs.num_sales), 2) AS total_sales
+        FROM region_sales rs
+        JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+        JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+        JOIN game ga ON gp.game_id = ga.id
+        LEFT JOIN genre g ON ga.genre_id = g.id
+        GROUP BY g.genre_name
+        ORDER BY SUM(rs.num_sales) DESC
+    """,
+    "ventas_por_plataforma": """
+        SELECT p.platform_name,
+               ROUND(SUM(rs.num_sales), 2) AS total_sales
+        FROM region_sales rs
+        JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+        JOIN platform p ON gpl.platform_id = p.id
+        GROUP BY p.platform_name
+        ORDER BY SUM(rs.num_sales) DESC
+    """,
+    "ventas_por_publisher": """
+        SELECT pu.publisher_name,
+               ROUND(SUM(rs.num_sales), 2) AS total_sales
+        FROM region_sales rs
+        JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+        JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+        JOIN publisher pu ON gp.publisher_id = pu.id
+        GROUP BY pu.publisher_name
+        ORDER BY SUM(rs.num_sales) DESC
+    """,
+    "ventas_por_anio_plataforma": """
+        SELECT gpl.release_year AS year,
+               p.platform_name,
+               ROUND(SUM(rs.num_sales), 2) AS total_sales
+        FROM region_sales rs
+        JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+        JOIN platform p ON gpl.platform_id = p.id
+        WHERE gpl.release_year IS NOT NULL
+        GROUP BY gpl.release_year, p.platform_name
+        ORDER BY gpl.release_year DESC, SUM(rs.num_sales) DESC
+    """,
+}
+
+
+def consulta_tabla(table_name):
+    """
+    SELECT completo de una tabla existente. El nombre se comprueba contra
+    el esquema en caché y se usa entre comillas del dialecto.
+    """
+    return f"SELECT * FROM {identificador(table_name)}"
+
+
+def consulta_nombrada(nombre):
+    """SQL de una consulta analítica exportable"""
+    if nombre not in CONSULTAS_EXPORTACION:
+        raise ValueError(
+            f"Consulta '{nombre}' no disponible. Opciones: {', '.join(sorted(CONSULTAS_EXPORTACION))}"
+        )
+    return CONSULTAS_EXPORTACION[nombre]
+
+
+def iterar_bloques(query_text, params=None, tam_bloque=TAM_BLOQUE_EXPORTACION):
+    """
+    Ejecuta la consulta con un cursor del lado del servidor y genera
+    (columnas, filas) por cada bloque de tam_bloque filas.
+    """
+    with conectar_lectura() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=tam_bloque).execute(
+            text(query_text), params or {}
+        )
+        columnas = list(result.keys())
+        vacio = True
+        for filas in result.partitions(tam_bloque):
+            vacio = False
+            yield columnas, filas
+        if vacio:
+            # Sin filas se genera igualmente la cabecera
+            yield columnas, []
+
+
+def _csv_bloques(bloques):
+    """Genera el CSV (cabecera incluida) bloque a bloque"""
+    cabecera = False
+    for columnas, filas in bloques:
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        if not cabecera:
+            escritor.writerow(columnas)
+            cabecera = True
+        escritor.writerows(filas)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _gzip_bloques(bloques):
+    """Comprime en formato gzip el CSV a medida que se genera"""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for datos in _csv_bloques(bloques):
+        comprimido = compresor.compress(datos)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+class _Sumidero(io.RawIOBase):
+    """Archivo de solo escritura cuyo contenido se recoge tras cada bloque"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        contenido = b"".join(self._partes)
+        self._partes.clear()
+        return contenido
+
+
+def _tabla_arrow(pa, columnas, filas, esquema=None):
+    if filas:
+        valores = {columna: list(datos) for columna, datos in zip(columnas, zip(*filas))}
+    else:
+        valores = {columna: [] for columna in columnas}
+    if esquema is not None:
+        return pa.table(valores, schema=esquema)
+    tabla = pa.table(valores)
+    # Las columnas sin valores en el primer bloque se exportan como texto
+    campos = [
+        pa.field(campo.name, pa.string()) if pa.types.is_null(campo.type) else campo
+        for campo in tabla.schema
+    ]
+    return tabla.cast(pa.schema(campos))
+
+
+def _parquet_bloques(bloques):
+    """Escribe un grupo de filas de Parquet por bloque y genera sus bytes"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sumidero = _Sumidero()
+    escritor = None
+    for columnas, filas in bloques:
+        tabla = _tabla_arrow(pa, columnas, filas, escritor.schema if escritor else None)
+        if escritor is None:
+            escritor = pq.ParquetWriter(sumidero, tabla.schema, compression="snappy")
+        escritor.write_table(tabla)
+        contenido = sumidero.vaciar()
+        if contenido:
+            yield contenido
+    if escritor is not None:
+        escritor.close()
+    yield sumidero.vaciar()
+
+
+def comprobar_formato(formato):
+    """Valida el formato pedido; Parquet necesita pyarrow instalado"""
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato '{formato}' no soportado. Opciones: {', '.join(FORMATOS_EXPORTACION)}")
+    if formato == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("La exportación a Parquet requiere el paquete pyarrow")
+
+
+def exportar(query_text, formato="csv", params=None, tam_bloque=TAM_BLOQUE_EXPORTACION):
+    """Genera los bytes del archivo exportado bloque a bloque"""
+    comprobar_formato(formato)
+    bloques = iterar_bloques(query_text, params, tam_bloque)
+    if formato == "csv":
+        return _csv_bloques(bloques)
+    if formato == "csv.gz":
+        return _gzip_bloques(bloques)
+    return _parquet_bloques(bloques)
+
+
+def exportar_a_archivo(query_text, file_path, formato="csv", params=None, tam_bloque=TAM_BLOQUE_EXPORTACION):
+    """Escribe la exportación en un archivo y devuelve el número de bytes escritos"""
+    directorio = os.path.dirname(file_path)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    escritos = 0
+    with open(file_path, "wb") as archivo:
+        for datos in exportar(query_text, formato, params, tam_bloque):
+            archivo.write(datos)
+            escritos += len(datos)
+    return escritos
@@ -1,21 +1,38 @@
-from fastapi.responses import HTMLResponse
+import os
+import math
+from html import escape
 
-def tabla_formato(tabla, titulo: str) -> HTMLResponse:
-    """
-    Convierte un DataFrame de pandas en una tabla HTML con formato bootstrap
-    
-    Args:
-        tabla: DataFrame de pandas
-        titulo: Título que se mostrará en la página
-        
-    Returns:
-        HTMLResponse: Respuesta HTML con la tabla formateada
-    """
-    tabla_html = tabla.to_html(
-        index=False,
-        classes='table table-bordered table-striped-columns table-hover text-center',
-    )
-    html_total = f"""
+import pandas as pd
+from fastapi.responses import StreamingResponse
+
+# Tablas HTML paginadas y transmitidas por bloques.
+# La cabecera del documento se envía en cuanto empieza la respuesta y las
+# filas de la página pedida se escapan y se envían en bloques de
+# FILAS_POR_BLOQUE, sin construir el HTML completo con DataFrame.to_html.
+
+# Filas por página cuando no se indica ?size=
+TAM_PAGINA_HTML = int(os.getenv("TAM_PAGINA_HTML", "500"))
+# Tamaño máximo de página admitido
+MAX_TAM_PAGINA_HTML = 10000
+# Filas por cada fragmento enviado al cliente
+FILAS_POR_BLOQUE = int(os.getenv("FILAS_POR_BLOQUE_HTML", "200"))
+
+CLASES_TABLA = "dataframe table table-bordered table-striped-columns table-hover text-center"
+
+
+def _celda(valor):
+    """Texto escapado de una celda; las ventas (float32) con 2 decimales, igual que DECIMAL(5,2)"""
+    if valor is None or valor is pd.NA or (isinstance(valor, float) and math.isnan(valor)):
+        return "NaN"
+    if isinstance(valor, float):
+        return f"{valor:.2f}"
+    return escape(str(valor))
+
+
+def _cabecera(titulo, columnas):
+    titulo = escape(titulo)
+    encabezados = "".join(f"<th>{escape(str(columna))}</th>" for columna in columnas)
+    return f"""
     <!DOCTYPE html>
     <html lang="es">
     <head>
@@ -30,18 +47,92 @@ def tabla_formato(tabla, titulo: str) -> HTMLResponse:
                 text-align: center;
                 vertical-align: middle;
                 background-color: #04922b;
-                color: white; 
-            }} 
-        </style>    
+                color: white;
+            }}
+        </style>
     </head>
     <body>
         <div class="container my-5">
             <h2 class="text-center mb-4">{titulo}</h2>
             <div class="table-responsive">
-                {tabla_html}
+                <table class="{CLASES_TABLA}">
+                  <thead>
+                    <tr>{encabezados}</tr>
+                  </thead>
+                  <tbody>
+"""
+
+
+def _pie(page, size, paginas, total):
+    enlaces = []
+    if page > 1:
+        enlaces.append(f'<a class="btn btn-outline-success" href="?page={page - 1}&amp;size={size}">&laquo; Anterior</a>')
+    if page < paginas:
+        enlaces.append(f'<a class="btn btn-outline-success" href="?page={page + 1}&amp;size={size}">Siguiente &raquo;</a>')
+    return f"""
+                  </tbody>
+                </table>
+            </div>
+            <div class="d-flex justify-content-between align-items-center">
+                <span>Página {page} de {paginas} ({total} filas)</span>
+                <div>{" ".join(enlaces)}</div>
             </div>
         </div>
     </body>
     </html>
     """
-    return HTMLResponse(content=html_total)
\ No newline at end of file
+
+
+def _filas_html(tabla):
+    """Genera el HTML de las filas en bloques de FILAS_POR_BLOQUE"""
+    for inicio in range(0, len(tabla), FILAS_POR_BLOQUE):
+        bloque = tabla.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+        yield "".join(
+            "<tr>" + "".join(f"<td>{_celda(valor)}</td>" for valor in fila) + "</tr>\n"
+            for fila in bloque.itertuples(index=False, name=None)
+        )
+
+
+def paginar(total, page=1, size=None):
+    """
+    Valida la página pedida y devuelve (page, size, paginas, inicio).
+
+    Raises:
+        ValueError: si la página o el tamaño no son válidos
+    """
+    size = TAM_PAGINA_HTML if size is None else size
+    if page < 1:
+        raise ValueError("El parámetro page debe ser mayor o igual que 1")
+    if not 1 <= size <= MAX_TAM_PAGINA_HTML:
+        raise ValueError(f"El parámetro size debe estar entre 1 y {MAX_TAM_PAGINA_HTML}")
+    paginas = max(1, math.ceil(total / size))
+    if page > paginas:
+        raise ValueError(f"La página {page} no existe; hay {paginas} página(s)")
+    return page, size, paginas, (page - 1) * size
+
+
+def tabla_formato(tabla, titulo: str, page: int = 1, size: int = None) -> StreamingResponse:
+    """
+    Convierte un DataFrame de pandas en una tabla HTML con formato bootstrap
+
+    Args:
+        tabla: DataFrame de pandas
+        titulo: Título que se mostrará en la página
+        page: Página a mostrar (desde 1)
+        size: Filas por página (TAM_PAGINA_HTML por defecto)
+
+    Returns:
+        StreamingResponse: Respuesta HTML transmitida por bloques
+
+    Raises:
+        ValueError: si la página pedida no existe
+    """
+    page, size, paginas, inicio = paginar(len(tabla), page, size)
+    pagina = tabla.iloc[inicio:inicio + size]
+
+    def documento():
+        yield _cabecera(titulo, tabla.columns)
+        yield from _filas_html(pagina)
+        yield _pie(page, size, paginas, len(tabla))
+
+    return StreamingResponse(documento(), media_type="text/html")
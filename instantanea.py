@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import shutil
+import numpy as np
+from sqlalchemy import text
+
+from replicas import conectar_lectura
+from version_datos import al_invalidar
+
+# Instantánea binaria del esquema en estrella para compartirla entre workers.
+# `python instantanea.py` lee game, game_publisher, game_platform,
+# region_sales y las dimensiones (genre, platform, publisher, region) y las
+# escribe como archivos de columnas de ancho fijo (ids, claves foráneas,
+# años y ventas en céntimos) más un diccionario de cadenas para los nombres.
+# Los workers abren los archivos con np.memmap en solo lectura: todos los
+# procesos comparten la misma copia en la caché de páginas del sistema y el
+# cubo de ventas se construye sin consultar la base de datos.
+#
+# Estructura de INSTANTANEA_RUTA:
+#   actual                      nombre de la instantánea vigente
+#   <id>/manifiesto.json        filas y tipo de cada columna
+#   <id>/<tabla>.<columna>.bin  valores little-endian; -1 = NULL
+#   <id>/cadenas.datos          nombres en UTF-8, uno detrás de otro
+#   <id>/cadenas.posiciones     int64: inicio de cada nombre (y fin del último)
+#   datos_modificados           hora (time.time()) de la última recarga de datos
+# Cada instantánea se escribe en su propio directorio y `actual` se
+# reemplaza al final con os.replace, así que los lectores nunca ven una a medias.
+#
+# invalidar_datos() en cualquier proceso (o una carga con cargador_sql.py)
+# escribe la hora en datos_modificados. El manifiesto guarda la hora en que
+# empezó la lectura de la base de datos, y todos los procesos descartan las
+# instantáneas empezadas antes de la última recarga.
+
+INSTANTANEA_RUTA = os.getenv("INSTANTANEA_RUTA", "instantanea")
+# Instantáneas anteriores que se conservan al escribir una nueva
+INSTANTANEAS_CONSERVADAS = 1
+# Filas leídas de la base de datos por bloque
+FILAS_POR_BLOQUE = 50000
+
+CADENA = "cadena"
+
+# Columnas de cada tabla: (nombre, tipo, expresión SQL). Los nombres se
+# guardan como códigos int32 del diccionario de cadenas.
+TABLAS_INSTANTANEA = {
+    "game": [("id", "<i4", "id"), ("genre_id", "<i4", "genre_id"), ("game_name", CADENA, "game_name")],
+    "game_publisher": [("id", "<i4", "id"), ("game_id", "<i4", "game_id"), ("publisher_id", "<i4", "publisher_id")],
+    "game_platform": [
+        ("id", "<i4", "id"),
+        ("game_publisher_id", "<i4", "game_publisher_id"),
+        ("platform_id", "<i4", "platform_id"),
+        ("release_year", "<i2", "release_year"),
+    ],
+    # Ventas en céntimos, igual que el cubo: las sumas de enteros son exactas
+    "region_sales": [
+        ("game_platform_id", "<i4", "game_platform_id"),
+        ("region_id", "<i4", "region_id"),
+        ("centimos", "<i4", "COALESCE(ROUND(num_sales * 100), 0)"),
+    ],
+    "genre": [("id", "<i4", "id"), ("genre_name", CADENA, "genre_name")],
+    "platform": [("id", "<i4", "id"), ("platform_name", CADENA, "platform_name")],
+    "publisher": [("id", "<i4", "id"), ("publisher_name", CADENA, "publisher_name")],
+    "region": [("id", "<i4", "id"), ("region_name", CADENA, "region_name")],
+}
+
+
+class Cadenas:
+    """Diccionario de cadenas sobre memmap; decodifica solo los códigos pedidos"""
+
+    def __init__(self, datos, posiciones):
+        self.datos = datos
+        self.posiciones = posiciones
+
+    def __len__(self):
+        return len(self.posiciones) - 1
+
+    def __getitem__(self, codigo):
+        if codigo < 0:
+            return None
+        inicio, fin = self.posiciones[codigo], self.posiciones[codigo + 1]
+        return bytes(self.datos[inicio:fin]).decode("utf-8")
+
+    def lista(self, codigos):
+        """Cadenas de un array de códigos (None para -1)"""
+        return [self[codigo] for codigo in codigos.tolist()]
+
+
+class Instantanea:
+    """Tablas de una instantánea abiertas con np.memmap en solo lectura"""
+
+    def __init__(self, ruta, manifiesto, tablas, cadenas):
+        self.ruta = ruta
+        self.id = os.path.basename(ruta)
+        self.manifiesto = manifiesto
+        self.tablas = tablas
+        self.cadenas = cadenas
+
+    def tamano(self):
+        """Bytes mapeados (columnas y diccionario de cadenas)"""
+        columnas = sum(columna.nbytes for tabla in self.tablas.values() for columna in tabla.values())
+        return columnas + self.cadenas.datos.nbytes + self.cadenas.posiciones.nbytes
+
+
+def _abrir_columna(ruta, dtype, filas):
+    # np.memmap no admite archivos vacíos
+    if filas == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(ruta, dtype=dtype, mode="r", shape=(filas,))
+
+
+def marcar_datos_modificados(ruta=None):
+    """Registra, para todos los procesos, que los datos cambiaron y las instantáneas actuales ya no valen"""
+    base = ruta or INSTANTANEA_RUTA
+    if not os.path.isdir(base):
+        return
+    temporal = os.path.join(base, f".datos_modificados.{os.getpid()}.tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(repr(time.time()))
+    os.replace(temporal, os.path.join(base, "datos_modificados"))
+
+
+def ultima_modificacion(ruta=None):
+    """Hora de la última recarga de datos registrada (0 si no hay ninguna)"""
+    try:
+        with open(os.path.join(ruta or INSTANTANEA_RUTA, "datos_modificados"), encoding="utf-8") as f:
+            return float(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0.0
+
+
+def id_actual(ruta=None):
+    """Nombre de la instantánea vigente o None si no hay ninguna"""
+    try:
+        with open(os.path.join(ruta or INSTANTANEA_RUTA, "actual"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def abrir_instantanea(ruta=None):
+    """
+    Abre la instantánea vigente con np.memmap. None si no existe o si se
+    empezó a leer antes de la última recarga de datos.
+    """
+    base = ruta or INSTANTANEA_RUTA
+    actual = id_actual(base)
+    if actual is None:
+        return None
+    directorio = os.path.join(base, actual)
+    with open(os.path.join(directorio, "manifiesto.json"), encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    if manifiesto["creada"] <= ultima_modificacion(base):
+        return None
+
+    tablas = {}
+    for tabla, info in manifiesto["tablas"].items():
+        tablas[tabla] = {
+            columna: _abrir_columna(os.path.join(directorio, f"{tabla}.{columna}.bin"), dtype, info["filas"])
+            for columna, dtype in info["columnas"].items()
+        }
+    cadenas = Cadenas(
+        _abrir_columna(os.path.join(directorio, "cadenas.datos"), "u1", manifiesto["cadenas"]["bytes"]),
+        _abrir_columna(os.path.join(directorio, "cadenas.posiciones"), "<i8", manifiesto["cadenas"]["total"] + 1),
+    )
+    return Instantanea(directorio, manifiesto, tablas, cadenas)
+
+
+class _Diccionario:
+    """Asigna un código a cada cadena distinta mientras se escribe la instantánea"""
+
+    def __init__(self):
+        self.codigos = {}
+
+    def codigo(self, cadena):
+        if cadena is None:
+            return -1
+        codigo = self.codigos.get(cadena)
+        if codigo is None:
+            codigo = self.codigos[cadena] = len(self.codigos)
+        return codigo
+
+    def escribir(self, directorio):
+        datos = [cadena.encode("utf-8") for cadena in self.codigos]
+        posiciones = np.zeros(len(datos) + 1, dtype="<i8")
+        np.cumsum([len(d) for d in datos], out=posiciones[1:])
+        with open(os.path.join(directorio, "cadenas.datos"), "wb") as f:
+            f.write(b"".join(datos))
+        posiciones.tofile(os.path.join(directorio, "cadenas.posiciones"))
+        return {"total": len(datos), "bytes": int(posiciones[-1])}
+
+
+def _escribir_tabla(conn, directorio, tabla, columnas, diccionario):
+    expresiones = ", ".join(f"{expresion} AS {nombre}" for nombre, _, expresion in columnas)
+    orden = ", ".join(expresion for _, _, expresion in columnas[:2])
+    result = conn.execution_options(stream_results=True, max_row_buffer=FILAS_POR_BLOQUE).execute(
+        text(f"SELECT {expresiones} FROM {tabla} ORDER BY {orden}")
+    )
+    archivos = {nombre: open(os.path.join(directorio, f"{tabla}.{nombre}.bin"), "wb") for nombre, _, _ in columnas}
+    filas = 0
+    try:
+        for bloque in result.partitions(FILAS_POR_BLOQUE):
+            for i, (nombre, tipo, _) in enumerate(columnas):
+                if tipo == CADENA:
+                    valores = np.fromiter((diccionario.codigo(fila[i]) for fila in bloque), dtype="<i4", count=len(bloque))
+                else:
+                    valores = np.fromiter((-1 if fila[i] is None else int(fila[i]) for fila in bloque), dtype=tipo, count=len(bloque))
+                archivos[nombre].write(valores.tobytes())
+            filas += len(bloque)
+    finally:
+        for archivo in archivos.values():
+            archivo.close()
+    return {
+        "filas": filas,
+        "columnas": {nombre: "<i4" if tipo == CADENA else tipo for nombre, tipo, _ in columnas},
+        "cadenas": [nombre for nombre, tipo, _ in columnas if tipo == CADENA],
+    }
+
+
+def _limpiar_antiguas(base, actual):
+    """Borra las instantáneas anteriores salvo las INSTANTANEAS_CONSERVADAS más recientes"""
+    anteriores = sorted(
+        nombre for nombre in os.listdir(base)
+        if nombre != actual and os.path.isdir(os.path.join(base, nombre))
+    )
+    # Los workers que aún tengan mapeada una instantánea borrada la siguen leyendo
+    for nombre in anteriores[:max(0, len(anteriores) - INSTANTANEAS_CONSERVADAS)]:
+        shutil.rmtree(os.path.join(base, nombre), ignore_errors=True)
+
+
+def escribir_instantanea(ruta=None):
+    """
+    Lee las tablas del esquema en estrella y escribe una instantánea nueva,
+    que pasa a ser la vigente al terminar.
+
+    Returns:
+        id, filas por tabla, bytes y segundos
+    """
+    inicio = time.perf_counter()
+    # Hora previa a la lectura: una recarga durante la lectura deja obsoleta la instantánea
+    creada = time.time()
+    base = ruta or INSTANTANEA_RUTA
+    os.makedirs(base, exist_ok=True)
+    nuevo = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+    temporal = os.path.join(base, f".{nuevo}.tmp")
+    os.makedirs(temporal)
+
+    try:
+        diccionario = _Diccionario()
+        with conectar_lectura() as conn:
+            tablas = {
+                tabla: _escribir_tabla(conn, temporal, tabla, columnas, diccionario)
+                for tabla, columnas in TABLAS_INSTANTANEA.items()
+            }
+        manifiesto = {
+            "creada": creada,
+            "tablas": tablas,
+            "cadenas": diccionario.escribir(temporal),
+        }
+        with open(os.path.join(temporal, "manifiesto.json"), "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, indent=2)
+        os.rename(temporal, os.path.join(base, nuevo))
+    except Exception:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    # El puntero se reemplaza de forma atómica
+    puntero = os.path.join(base, f".actual.{os.getpid()}.tmp")
+    with open(puntero, "w", encoding="utf-8") as f:
+        f.write(nuevo)
+    os.replace(puntero, os.path.join(base, "actual"))
+    _limpiar_antiguas(base, nuevo)
+
+    tam = sum(os.path.getsize(os.path.join(base, nuevo, nombre)) for nombre in os.listdir(os.path.join(base, nuevo)))
+    return {
+        "id": nuevo,
+        "rows": {tabla: info["filas"] for tabla, info in tablas.items()},
+        "strings": manifiesto["cadenas"]["total"],
+        "bytes": tam,
+        "seconds": round(time.perf_counter() - inicio, 3),
+    }
+
+
+if __name__ == "__main__":
+    # Uso: python instantanea.py [directorio]
+    resultado = escribir_instantanea(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"✅ Instantánea {resultado['id']}: {resultado['bytes']} bytes en {resultado['seconds']} s")
+    for tabla, filas in resultado["rows"].items():
+        print(f"   {tabla}: {filas} filas")
+
+
+# Se registra al importar el módulo (cubo_ventas lo importa antes de registrar
+# su recarga), así que el cubo ya ve la instantánea como obsoleta al recargarse
+al_invalidar(marcar_datos_modificados)
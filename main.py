@@ -1,35 +1,70 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
-from typing import Optional, List
 import os
-import matplotlib
-matplotlib.use('Agg')  # Usar backend no interactivo
+import sys
+from typing import Optional, List
+
+# El registro de tiempos de arranque se importa antes que nada
+from arranque import (
+    importando, cargar, arranque_completado, precalentar, informe_arranque,
+    PRECALENTAR_MODULOS
+)
+
+with importando("fastapi"):
+    from fastapi import FastAPI, Depends, HTTPException, Query, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.concurrency import run_in_threadpool
+    from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 
 # Importar desde database.py correctamente
-from database import get_db, get_tables, get_table_data, execute_query, get_table_to_dataframe, create_bar_chart
+with importando("database"):
+    from database import (
+        get_db, get_tables, get_table_data, execute_query, get_table_to_dataframe, create_bar_chart,
+        table_query, keyset_query
+    )
+    # Versiones asíncronas usadas por los endpoints JSON
+    from database import (
+        execute_query_async, get_tables_async, get_table_page_async,
+        fetch_page_async, stream_query_async, stream_ndjson_async, quitar_columnas,
+        execute_query_rows_async, get_table_rows_async
+    )
+
+with importando("servicios"):
+    from conexion import estadisticas_pool, get_async_engine
+    from replicas import iniciar_comprobaciones, cerrar_replicas, comprobar_replicas, estado_replicas, REPLICA_URLS
+    from compresion import MiddlewareCompresion
+    from metricas import MiddlewareMetricas, texto_prometheus
+    from serializacion import RespuestaJSON, formatear_filas, filas_de_dicts, FORMATO_COLUMNAS
+    from exportacion import (
+        exportar, comprobar_formato, consulta_tabla, consulta_nombrada,
+        FORMATOS_EXPORTACION, CONSULTAS_EXPORTACION, TAM_BLOQUE_EXPORTACION
+    )
+    from version_datos import invalidar_datos, version_actual
+    from cache_graficas import cache as cache_graficas
+    from cache_respuestas import cache as cache_respuestas, cachear_respuesta
+    from cache_disco import estadisticas as estadisticas_cache_disco
+    from resumenes import usar_resumen, reconstruir_resumenes, refrescar_resumenes, estado_resumenes
+    from esquema import obtener_esquema, obtener_esquema_async, invalidar_esquema, estado_esquema
 
 # Importar los módulos nuevos
-from formato import tabla_formato
-from pandas_consultas import (
-    get_top_plataformas_mas_juegos, 
-    get_juegos_mas_vendidos_por_region, 
-    get_lanzamientos_por_anio,
-    get_top_generos_juegos,
-    get_top_juegos_menos_ventas,
-    get_top_publishers_juegos
-)
-from seaborn_graficas import (
-    get_top_editoras_por_cantidad_de_juegos,
-    get_distribucion_ventas_por_region,
-    get_juegos_mas_lanzados_por_anio,
-    get_top_juegos_ventas,
-    get_top_generos_ventas,
-    get_ventas_plataforma_region
-)
+with importando("busqueda_juegos"):
+    from busqueda_juegos import buscar_juegos, indice_cargado, obtener_indice, recargar_indice
+
+with importando("cubo_ventas"):
+    from cubo_ventas import (
+        CUBO_ACTIVO,
+        recargar_cubo,
+        ventas_por_genero,
+        ventas_por_plataforma,
+        ventas_por_publisher,
+        ventas_por_anio_plataforma
+    )
+    from instantanea import escribir_instantanea
+
+# pandas_consultas, seaborn_graficas, formato y carga_dataframes (pandas,
+# matplotlib y seaborn) se cargan con cargar() en el primer uso de los
+# endpoints /pandas/* y /seaborn/*
 
 # Crear la app FastAPI
-app = FastAPI(title="Game Database API")
+app = FastAPI(title="Game Database API", default_response_class=RespuestaJSON)
 
 # Agregar middleware CORS para permitir solicitudes desde el navegador
 app.add_middleware(
@@ -40,6 +75,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión gzip/brotli de las respuestas de texto. Va dentro del
+# middleware de métricas para que su tiempo aparezca en Server-Timing
+app.add_middleware(MiddlewareCompresion)
+
+# Tiempos por fase de cada petición: cabecera Server-Timing y /metrics
+app.add_middleware(MiddlewareMetricas)
+
 # Inicializar la base de datos al iniciar la aplicación
 @app.on_event("startup")
 def startup():
@@ -48,47 +90,211 @@ def startup():
         db = next(get_db())
         print("✅ Conexión a la base de datos exitosa")
         db.close()
+        # El esquema se lee una vez y queda en caché para /tables y /schema
+        print(f"✅ Esquema en caché ({len(obtener_esquema())} tablas)")
+        if REPLICA_URLS:
+            # Primera comprobación de las réplicas y comprobaciones periódicas en segundo plano
+            iniciar_comprobaciones()
+            disponibles = sum(replica["available"] for replica in estado_replicas()["replicas"])
+            print(f"✅ Réplicas de lectura disponibles: {disponibles} de {len(REPLICA_URLS)}")
+        info = recargar_indice()
+        print(f"✅ Índice de búsqueda de juegos cargado ({info['juegos']} juegos)")
+        if CUBO_ACTIVO:
+            info = recargar_cubo()
+            print(f"✅ Cubo de ventas cargado en memoria ({info['filas']} filas, desde {info['origen']})")
     except Exception as e:
         print(f"❌ Error durante la inicialización: {str(e)}")
+    arranque_completado()
+    # Pandas, matplotlib y seaborn se cargan en segundo plano sin retrasar el arranque
+    if PRECALENTAR_MODULOS:
+        precalentar()
+
+# Cerrar las conexiones del engine asíncrono, las réplicas y el pool de render al detener la aplicación
+@app.on_event("shutdown")
+async def shutdown():
+    await get_async_engine().dispose()
+    await cerrar_replicas()
+    # El pool de render solo existe si se llegó a cargar seaborn_graficas
+    if "seaborn_graficas" in sys.modules:
+        sys.modules["seaborn_graficas"].cerrar_pool_render()
 
 # Endpoint raíz
 @app.get("/")
 def read_root():
     return {"message": "Albion online es un mmorpg no lineal en el que escribes tu propia historia sin limitarte a seguir un camino prefijado, explora un amplio mundo abierto con cinco biomas unicos, todo cuanto hagas tendra su repercusíon en el mundo, con su economia orientada al jugador de albion los jugadores crean practicamente todo el equipo a partir de los recursos que consiguen, el equipo que llevas define quien eres, cambia de arma y armadura para pasar de caballero a mago o juego como una mezcla de ambas clases, aventurate en el mundo abierto y haz frente a los habitantes y las criaturas de albion, inicia expediciones o adentrate en mazmorras en las que encontraras enemigos aun mas dificiles, enfrentate a otros jugadores en encuentros en el mundo abierto, lucha por los territorios o por ciudades enteras en batallas tacticas, relajate en tu isla privada donde podras construir un hogar, cultivar cosechas, criar animales, unete a un gremio, todo es mejor cuando se trabaja en grupo [musica] adentrate ya en el mundo de albion y escribe tu propia historia."}
 
+# Endpoint con el estado del pool de conexiones compartido
+@app.get("/db/pool")
+def get_pool_stats():
+    try:
+        return estadisticas_pool()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas del pool: {str(e)}")
+
+# Endpoint con la salud, el retraso y las lecturas de cada réplica
+@app.get("/db/replicas")
+def get_replicas():
+    return estado_replicas()
+
+# Endpoint para comprobar las réplicas sin esperar a la siguiente comprobación periódica
+@app.post("/db/replicas/comprobar")
+def post_comprobar_replicas():
+    try:
+        return comprobar_replicas()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al comprobar las réplicas: {str(e)}")
+
+# Endpoint con el tiempo de arranque y de importación de cada módulo
+@app.get("/startup")
+def get_startup_report():
+    return informe_arranque()
+
+# Endpoint con los histogramas de tiempos en formato Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(texto_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Endpoint para listar tablas
 @app.get("/tables")
-def list_tables():
+async def list_tables():
     try:
-        tables = get_tables()
+        tables = await get_tables_async()
         return {"tables": tables}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener tablas: {str(e)}")
 
+# Endpoint con las columnas y claves foráneas de cada tabla (desde la caché del esquema)
+@app.get("/schema")
+async def get_schema():
+    try:
+        schema = await obtener_esquema_async()
+        return {"tables": schema, "count": len(schema)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener el esquema: {str(e)}")
+
+# Endpoint para volver a leer el esquema tras cambiar tablas fuera de la API
+@app.post("/schema/invalidar")
+async def invalidate_schema():
+    try:
+        invalidar_esquema()
+        schema = await obtener_esquema_async()
+        return {"message": "Esquema recargado", "count": len(schema), "cache": estado_esquema()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al recargar el esquema: {str(e)}")
+
+async def respuesta_ndjson(query, params=None, ocultas=()):
+    """
+    Devuelve el resultado de una consulta como NDJSON leído con un cursor del
+    servidor. Las columnas ocultas (claves internas del cursor) no se envían.
+    """
+    rows = stream_query_async(query, params)
+    if ocultas:
+        rows = (quitar_columnas(row, ocultas) async for row in rows)
+    # Se obtiene la primera fila antes de enviar las cabeceras para que los
+    # errores de la consulta todavía puedan devolverse como HTTP 500
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter(()), media_type="application/x-ndjson")
+
+    async def filas():
+        yield first
+        async for row in rows:
+            yield row
+
+    return StreamingResponse(stream_ndjson_async(filas()), media_type="application/x-ndjson")
+
 # Endpoint para obtener datos de una tabla
 @app.get("/tables/{table_name}")
-def get_table(table_name: str, limit: int = 100):
+async def get_table(
+    table_name: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: str = Query("json", alias="format")
+):
     try:
-        data = get_table_data(table_name, limit)
-        return {"table": table_name, "data": data, "count": len(data)}
+        if formato == "ndjson":
+            # Sin limit se transmite la tabla completa desde el cursor indicado
+            await obtener_esquema_async()
+            query, params = table_query(table_name, cursor, limit)
+            return await respuesta_ndjson(query, params)
+
+        data, next_cursor = await get_table_page_async(table_name, limit or 100, cursor)
+        count = len(data)
+        if formato == FORMATO_COLUMNAS:
+            data = formatear_filas(*filas_de_dicts(data), formato)
+        respuesta = {"table": table_name, "data": data, "count": count}
+        # "next" solo aparece al paginar (con limit o cursor)
+        if limit is not None or cursor is not None:
+            respuesta["next"] = next_cursor
+        return RespuestaJSON(respuesta)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener datos de la tabla: {str(e)}")
 
 # Endpoints básicos para cada tabla
 @app.get("/games")
-def get_games(limit: int = 100):
+async def get_games(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("game", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("game", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener juegos: {str(e)}")
 
+# Endpoint para obtener varios juegos completos en una sola consulta
+@app.get("/games/complete")
+async def get_games_complete(ids: str = Query(..., description="IDs separados por comas")):
+    try:
+        try:
+            game_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Los IDs deben ser números separados por comas")
+        
+        if not game_ids:
+            raise HTTPException(status_code=400, detail="Debe indicar al menos un ID")
+        if len(game_ids) > MAX_GAMES_COMPLETE:
+            raise HTTPException(status_code=400, detail=f"Se permiten como máximo {MAX_GAMES_COMPLETE} IDs por petición")
+        
+        games = await obtener_juegos_completos(game_ids)
+        
+        return {
+            "count": len(games),
+            "data": [games[game_id] for game_id in game_ids if game_id in games],
+            "not_found": [game_id for game_id in game_ids if game_id not in games]
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener información completa de los juegos: {str(e)}")
+
+# Búsqueda y autocompletado por nombre. Debe declararse antes de /games/{game_id}
+@app.get("/games/search")
+async def search_games(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=100),
+    modo: str = Query("auto", alias="mode"),
+    formato: str = Query("json", alias="format")
+):
+    try:
+        if not indice_cargado():
+            await run_in_threadpool(obtener_indice)
+        # Con el índice en memoria la búsqueda no bloquea: se resuelve en el propio bucle
+        data = buscar_juegos(q, limit, modo)
+        columnas = ["id", "game_name", "genre", "total_sales", "match"]
+        filas = [tuple(juego[columna] for columna in columnas) for juego in data]
+        return RespuestaJSON({"query": q, "mode": modo, "data": formatear_filas(columnas, filas, formato), "count": len(data)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar juegos: {str(e)}")
+
 @app.get("/games/{game_id}")
-def get_game_by_id(game_id: int):
+async def get_game_by_id(game_id: int):
     try:
         # Usamos parámetros para evitar inyección SQL
         query = "SELECT * FROM game WHERE id = :game_id"
-        data = execute_query(query, {"game_id": game_id})
+        data = await execute_query_async(query, {"game_id": game_id}, nombre="juego")
         if not data:
             raise HTTPException(status_code=404, detail=f"Juego con ID {game_id} no encontrado")
         return {"data": data[0]}
@@ -98,133 +304,153 @@ def get_game_by_id(game_id: int):
         raise HTTPException(status_code=500, detail=f"Error al obtener juego: {str(e)}")
 
 @app.get("/platforms")
-def get_platforms(limit: int = 100):
+async def get_platforms(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("platform", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("platform", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener plataformas: {str(e)}")
 
 @app.get("/publishers")
-def get_publishers(limit: int = 100):
+async def get_publishers(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("publisher", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("publisher", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener publishers: {str(e)}")
 
 @app.get("/genres")
-def get_genres(limit: int = 100):
+async def get_genres(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("genre", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("genre", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener géneros: {str(e)}")
 
 @app.get("/regions")
-def get_regions(limit: int = 100):
+async def get_regions(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("region", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("region", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener regiones: {str(e)}")
 
 @app.get("/sales")
-def get_sales(limit: int = 100):
+async def get_sales(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("region_sales", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("region_sales", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener ventas: {str(e)}")
 
 @app.get("/game-platforms")
-def get_game_platforms(limit: int = 100):
+async def get_game_platforms(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("game_platform", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("game_platform", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener relaciones juego-plataforma: {str(e)}")
 
 @app.get("/game-publishers")
-def get_game_publishers(limit: int = 100):
+async def get_game_publishers(limit: int = 100, formato: str = Query("json", alias="format")):
     try:
-        data = get_table_data("game_publisher", limit)
-        return {"data": data, "count": len(data)}
+        columnas, filas = await get_table_rows_async("game_publisher", limit)
+        return RespuestaJSON({"data": formatear_filas(columnas, filas, formato), "count": len(filas)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener relaciones juego-publisher: {str(e)}")
 
+# Consulta única con el juego y todas sus relaciones. Las columnas de las
+# tablas relacionadas llevan el prefijo rel_ para separarlas de las de game.
+GAME_COMPLETE_QUERY = """
+SELECT 
+    g.*,
+    gen.genre_name AS rel_genre_name,
+    gpu.id AS rel_game_publisher_id,
+    pu.id AS rel_publisher_id,
+    pu.publisher_name AS rel_publisher_name,
+    gp.id AS rel_game_platform_id,
+    p.id AS rel_platform_id,
+    p.platform_name AS rel_platform_name,
+    gp.release_year AS rel_release_year,
+    r.id AS rel_region_id,
+    r.region_name AS rel_region_name,
+    rs.num_sales AS rel_sales
+FROM 
+    game g
+LEFT JOIN 
+    genre gen ON g.genre_id = gen.id
+LEFT JOIN 
+    game_publisher gpu ON gpu.game_id = g.id
+LEFT JOIN 
+    publisher pu ON gpu.publisher_id = pu.id
+LEFT JOIN 
+    game_platform gp ON gp.game_publisher_id = gpu.id
+LEFT JOIN 
+    platform p ON gp.platform_id = p.id
+LEFT JOIN 
+    region_sales rs ON rs.game_platform_id = gp.id
+LEFT JOIN 
+    region r ON rs.region_id = r.id
+WHERE 
+    g.id IN ({ids})
+ORDER BY 
+    g.id, gpu.id, gp.id
+"""
+
+# Máximo de juegos por petición en /games/complete
+MAX_GAMES_COMPLETE = 500
+
+async def obtener_juegos_completos(game_ids):
+    """
+    Obtiene varios juegos con sus géneros, plataformas, publishers y ventas
+    en una sola consulta y arma la estructura anidada en Python.
+
+    Returns:
+        dict game_id -> {"game", "platforms", "publishers", "sales"}
+    """
+    placeholders = ', '.join([':id' + str(i) for i in range(len(game_ids))])
+    params = {f'id{i}': game_id for i, game_id in enumerate(game_ids)}
+    rows = await execute_query_async(GAME_COMPLETE_QUERY.format(ids=placeholders), params, nombre="juegos_completos")
+
+    games = {}
+    vistos = set()
+    for row in rows:
+        game_id = row["id"]
+        entry = games.get(game_id)
+        if entry is None:
+            game = {k: v for k, v in row.items() if not k.startswith("rel_")}
+            if row["rel_genre_name"]:
+                game["genre_name"] = row["rel_genre_name"]
+            entry = games[game_id] = {"game": game, "platforms": [], "publishers": [], "sales": []}
+
+        # El join repite publishers y plataformas una vez por cada fila de ventas
+        if row["rel_publisher_id"] is not None and ("gpu", row["rel_game_publisher_id"]) not in vistos:
+            vistos.add(("gpu", row["rel_game_publisher_id"]))
+            entry["publishers"].append({"id": row["rel_publisher_id"], "publisher_name": row["rel_publisher_name"]})
+
+        if row["rel_platform_id"] is not None and ("gp", row["rel_game_platform_id"]) not in vistos:
+            vistos.add(("gp", row["rel_game_platform_id"]))
+            entry["platforms"].append({
+                "id": row["rel_platform_id"],
+                "platform_name": row["rel_platform_name"],
+                "release_year": row["rel_release_year"]
+            })
+
+        if row["rel_region_id"] is not None:
+            entry["sales"].append({"region_name": row["rel_region_name"], "sales": row["rel_sales"]})
+
+    return games
+
 # Endpoint para obtener juego por ID con información completa (relaciones)
 @app.get("/games/{game_id}/complete")
-def get_game_complete(game_id: int):
+async def get_game_complete(game_id: int):
     try:
-        # Primero verificamos si el juego existe
-        game_exists_query = "SELECT id FROM game WHERE id = :game_id"
-        game_exists = execute_query(game_exists_query, {"game_id": game_id})
+        games = await obtener_juegos_completos([game_id])
         
-        if not game_exists:
+        if game_id not in games:
             raise HTTPException(status_code=404, detail=f"Juego con ID {game_id} no encontrado")
         
-        # Obtener datos básicos del juego
-        game_query = """
-        SELECT g.*
-        FROM game g
-        WHERE g.id = :game_id
-        """
-        game_data = execute_query(game_query, {"game_id": game_id})
-        
-        # Verificar si existe un genre_id y obtener el nombre del género
-        genre_name = None
-        if game_data and 'genre_id' in game_data[0] and game_data[0]['genre_id'] is not None:
-            genre_query = "SELECT genre_name FROM genre WHERE id = :genre_id"
-            genre_result = execute_query(genre_query, {"genre_id": game_data[0]['genre_id']})
-            if genre_result:
-                genre_name = genre_result[0]['genre_name']
-        
-        # Añadir el nombre del género a los datos del juego
-        if game_data and genre_name:
-            game_data[0]['genre_name'] = genre_name
-            
-        # Obtener plataformas del juego
-        platforms_query = """
-        SELECT p.id, p.platform_name, gp.release_year
-        FROM platform p
-        JOIN game_platform gp ON p.id = gp.platform_id
-        WHERE gp.game_publisher_id IN (
-            SELECT id FROM game_publisher WHERE game_id = :game_id
-        )
-        """
-        platforms = execute_query(platforms_query, {"game_id": game_id})
-        
-        # Obtener publishers del juego
-        publishers_query = """
-        SELECT pu.id, pu.publisher_name
-        FROM publisher pu
-        JOIN game_publisher gp ON pu.id = gp.publisher_id
-        WHERE gp.game_id = :game_id
-        """
-        publishers = execute_query(publishers_query, {"game_id": game_id})
-        
-        # Obtener ventas por región
-        sales_query = """
-        SELECT r.region_name, rs.num_sales as sales
-        FROM region_sales rs
-        JOIN region r ON rs.region_id = r.id
-        JOIN game_platform gp ON rs.game_platform_id = gp.id
-        WHERE gp.game_publisher_id IN (
-            SELECT id FROM game_publisher WHERE game_id = :game_id
-        )
-        """
-        sales = execute_query(sales_query, {"game_id": game_id})
-        
-        # Crear respuesta completa
-        response = {
-            "game": game_data[0],
-            "platforms": platforms,
-            "publishers": publishers,
-            "sales": sales
-        }
-        
-        return response
+        return games[game_id]
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -232,7 +458,8 @@ def get_game_complete(game_id: int):
 
 # Endpoint para obtener los juegos más vendidos
 @app.get("/stats/best-sellings-games/{numero}")
-def get_best_selling_games(numero: int):
+@cachear_respuesta()
+async def get_best_selling_games(numero: int, formato: str = Query("json", alias="format")):
     try:
         # Validar que el número sea positivo
         if numero <= 0:
@@ -244,7 +471,7 @@ def get_best_selling_games(numero: int):
             g.id,
             g.game_name,
             COALESCE(gen.genre_name, 'Desconocido') as genre,
-            SUM(rs.num_sales) as total_sales
+            ROUND(SUM(rs.num_sales), 2) as total_sales
         FROM 
             game g
         LEFT JOIN 
@@ -258,26 +485,20 @@ def get_best_selling_games(numero: int):
         GROUP BY 
             g.id, g.game_name, gen.genre_name
         ORDER BY 
-            total_sales DESC
+            SUM(rs.num_sales) DESC
         LIMIT :limite
         """
         
-        best_selling_games = execute_query(query, {"limite": numero})
+        columnas, filas = await execute_query_rows_async(query, {"limite": numero}, nombre="juegos_mas_vendidos", compartir=True)
         
-        if not best_selling_games:
+        if not filas:
             return {"message": "No se encontraron datos de ventas", "data": []}
         
-        # Formatear los resultados para mejor presentación
-        for game in best_selling_games:
-            if 'total_sales' in game:
-                # Redondear a 2 decimales para mejor presentación
-                game['total_sales'] = round(float(game['total_sales']), 2)
-            
-        return {
+        return RespuestaJSON({
             "message": f"Top {numero} juegos más vendidos",
-            "count": len(best_selling_games),
-            "data": best_selling_games
-        }
+            "count": len(filas),
+            "data": formatear_filas(columnas, filas, formato)
+        })
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -285,12 +506,13 @@ def get_best_selling_games(numero: int):
 
 # Endpoint para obtener ventas por género
 @app.get("/stats/sales-by-genre")
-def get_sales_by_genre():
+@cachear_respuesta()
+async def get_sales_by_genre(formato: str = Query("json", alias="format")):
     try:
         query = """
         SELECT 
             COALESCE(g.genre_name, 'Desconocido') as genre,
-            SUM(rs.num_sales) as total_sales
+            ROUND(SUM(rs.num_sales), 2) as total_sales
         FROM 
             region_sales rs
         JOIN 
@@ -304,35 +526,46 @@ def get_sales_by_genre():
         GROUP BY 
             g.genre_name
         ORDER BY 
-            total_sales DESC
+            SUM(rs.num_sales) DESC
         """
         
-        sales_by_genre = execute_query(query)
+        # Si la tabla resumen está al día se lee de ella en lugar de hacer el join
+        if not CUBO_ACTIVO and await run_in_threadpool(usar_resumen, "genero"):
+            query = """
+            SELECT 
+                COALESCE(genre_name, 'Desconocido') as genre,
+                ROUND(total_sales, 2) as total_sales
+            FROM 
+                resumen_ventas_genero
+            ORDER BY 
+                total_sales DESC
+            """
+        
+        if CUBO_ACTIVO:
+            columnas, filas = filas_de_dicts(await run_in_threadpool(ventas_por_genero))
+        else:
+            columnas, filas = await execute_query_rows_async(query, nombre="ventas_por_genero", compartir=True)
         
-        if not sales_by_genre:
+        if not filas:
             return {"message": "No se encontraron datos de ventas por género", "data": []}
         
-        # Formatear los resultados para mejor presentación
-        for genre in sales_by_genre:
-            if 'total_sales' in genre:
-                genre['total_sales'] = round(float(genre['total_sales']), 2)
-            
-        return {
+        return RespuestaJSON({
             "message": "Ventas totales por género",
-            "count": len(sales_by_genre),
-            "data": sales_by_genre
-        }
+            "count": len(filas),
+            "data": formatear_filas(columnas, filas, formato)
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener ventas por género: {str(e)}")
 
 # Endpoint para obtener ventas por plataforma
 @app.get("/stats/sales-by-platform")
-def get_sales_by_platform():
+@cachear_respuesta()
+async def get_sales_by_platform(formato: str = Query("json", alias="format")):
     try:
         query = """
         SELECT 
             p.platform_name,
-            SUM(rs.num_sales) as total_sales
+            ROUND(SUM(rs.num_sales), 2) as total_sales
         FROM 
             region_sales rs
         JOIN 
@@ -342,35 +575,46 @@ def get_sales_by_platform():
         GROUP BY 
             p.platform_name
         ORDER BY 
-            total_sales DESC
+            SUM(rs.num_sales) DESC
         """
         
-        sales_by_platform = execute_query(query)
+        # Si la tabla resumen está al día se lee de ella en lugar de hacer el join
+        if not CUBO_ACTIVO and await run_in_threadpool(usar_resumen, "plataforma"):
+            query = """
+            SELECT 
+                platform_name,
+                ROUND(total_sales, 2) as total_sales
+            FROM 
+                resumen_ventas_plataforma
+            ORDER BY 
+                total_sales DESC
+            """
         
-        if not sales_by_platform:
+        if CUBO_ACTIVO:
+            columnas, filas = filas_de_dicts(await run_in_threadpool(ventas_por_plataforma))
+        else:
+            columnas, filas = await execute_query_rows_async(query, nombre="ventas_por_plataforma", compartir=True)
+        
+        if not filas:
             return {"message": "No se encontraron datos de ventas por plataforma", "data": []}
         
-        # Formatear los resultados para mejor presentación
-        for platform in sales_by_platform:
-            if 'total_sales' in platform:
-                platform['total_sales'] = round(float(platform['total_sales']), 2)
-            
-        return {
+        return RespuestaJSON({
             "message": "Ventas totales por plataforma",
-            "count": len(sales_by_platform),
-            "data": sales_by_platform
-        }
+            "count": len(filas),
+            "data": formatear_filas(columnas, filas, formato)
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener ventas por plataforma: {str(e)}")
 
 # Endpoint para obtener ventas por publisher
 @app.get("/stats/sales-by-publisher")
-def get_sales_by_publisher():
+@cachear_respuesta()
+async def get_sales_by_publisher(formato: str = Query("json", alias="format")):
     try:
         query = """
         SELECT 
             pu.publisher_name,
-            SUM(rs.num_sales) as total_sales
+            ROUND(SUM(rs.num_sales), 2) as total_sales
         FROM 
             region_sales rs
         JOIN 
@@ -382,36 +626,47 @@ def get_sales_by_publisher():
         GROUP BY 
             pu.publisher_name
         ORDER BY 
-            total_sales DESC
+            SUM(rs.num_sales) DESC
         """
         
-        sales_by_publisher = execute_query(query)
+        # Si la tabla resumen está al día se lee de ella en lugar de hacer el join
+        if not CUBO_ACTIVO and await run_in_threadpool(usar_resumen, "publisher"):
+            query = """
+            SELECT 
+                publisher_name,
+                ROUND(total_sales, 2) as total_sales
+            FROM 
+                resumen_ventas_publisher
+            ORDER BY 
+                total_sales DESC
+            """
         
-        if not sales_by_publisher:
+        if CUBO_ACTIVO:
+            columnas, filas = filas_de_dicts(await run_in_threadpool(ventas_por_publisher))
+        else:
+            columnas, filas = await execute_query_rows_async(query, nombre="ventas_por_publisher", compartir=True)
+        
+        if not filas:
             return {"message": "No se encontraron datos de ventas por publisher", "data": []}
         
-        # Formatear los resultados para mejor presentación
-        for publisher in sales_by_publisher:
-            if 'total_sales' in publisher:
-                publisher['total_sales'] = round(float(publisher['total_sales']), 2)
-            
-        return {
+        return RespuestaJSON({
             "message": "Ventas totales por publisher",
-            "count": len(sales_by_publisher),
-            "data": sales_by_publisher
-        }
+            "count": len(filas),
+            "data": formatear_filas(columnas, filas, formato)
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener ventas por publisher: {str(e)}")
 
 # Endpoint para obtener ventas por año y plataforma
 @app.get("/stats/sales-by-year-platform")
-def get_sales_by_year_platform():
+@cachear_respuesta()
+async def get_sales_by_year_platform(formato: str = Query("json", alias="format")):
     try:
         query = """
         SELECT 
             gp.release_year as year,
             p.platform_name,
-            SUM(rs.num_sales) as total_sales
+            ROUND(SUM(rs.num_sales), 2) as total_sales
         FROM 
             region_sales rs
         JOIN 
@@ -423,59 +678,144 @@ def get_sales_by_year_platform():
         GROUP BY 
             gp.release_year, p.platform_name
         ORDER BY 
-            gp.release_year DESC, total_sales DESC
+            gp.release_year DESC, SUM(rs.num_sales) DESC
         """
         
-        sales_by_year_platform = execute_query(query)
+        # Si la tabla resumen está al día se lee de ella en lugar de hacer el join
+        if not CUBO_ACTIVO and await run_in_threadpool(usar_resumen, "anio_plataforma"):
+            query = """
+            SELECT 
+                release_year as year,
+                platform_name,
+                ROUND(total_sales, 2) as total_sales
+            FROM 
+                resumen_ventas_anio_plataforma
+            ORDER BY 
+                release_year DESC, total_sales DESC
+            """
         
-        if not sales_by_year_platform:
+        if CUBO_ACTIVO:
+            columnas, filas = filas_de_dicts(await run_in_threadpool(ventas_por_anio_plataforma))
+        else:
+            columnas, filas = await execute_query_rows_async(query, nombre="ventas_por_anio_plataforma", compartir=True)
+        
+        if not filas:
             return {"message": "No se encontraron datos de ventas por año y plataforma", "data": []}
         
-        # Formatear los resultados para mejor presentación
-        for entry in sales_by_year_platform:
-            if 'total_sales' in entry:
-                entry['total_sales'] = round(float(entry['total_sales']), 2)
-            
-        return {
+        return RespuestaJSON({
             "message": "Ventas totales por año y plataforma",
-            "count": len(sales_by_year_platform),
-            "data": sales_by_year_platform
-        }
+            "count": len(filas),
+            "data": formatear_filas(columnas, filas, formato)
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener ventas por año y plataforma: {str(e)}")
 
+# Endpoint para recargar el cubo de ventas en memoria tras actualizar los datos
+@app.post("/stats/cubo/recargar")
+def recargar_cubo_ventas():
+    try:
+        info = recargar_cubo()
+        return {"message": "Cubo de ventas recargado", "rows": info["filas"], "source": info["origen"], "active": CUBO_ACTIVO}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al recargar el cubo de ventas: {str(e)}")
+
+# Endpoint para escribir una instantánea binaria del esquema en estrella y cargar el cubo desde ella
+@app.post("/stats/cubo/instantanea")
+def crear_instantanea_cubo():
+    try:
+        resultado = escribir_instantanea()
+        info = recargar_cubo()
+        return {"message": "Instantánea escrita", **resultado, "cube_source": info["origen"]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al escribir la instantánea: {str(e)}")
+
+# Consulta base de juegos por año, paginable por cursor
+GAMES_BY_YEAR_QUERY = """
+SELECT 
+    g.id,
+    g.game_name,
+    COALESCE(gen.genre_name, 'Desconocido') as genre,
+    gp.release_year as year,
+    p.platform_name,
+    pu.publisher_name,
+    gp.id as game_platform_id
+FROM 
+    game g
+LEFT JOIN 
+    genre gen ON g.genre_id = gen.id
+JOIN 
+    game_publisher gpu ON g.id = gpu.game_id
+JOIN 
+    publisher pu ON gpu.publisher_id = pu.id
+JOIN 
+    game_platform gp ON gpu.id = gp.game_publisher_id
+JOIN 
+    platform p ON gp.platform_id = p.id
+WHERE
+    {filtro} AND {{keyset}}
+ORDER BY 
+    {{order}}
+"""
+
+# Claves de orden: año descendente, nombre y, para desempatar, el id de game_platform
+GAMES_BY_YEAR_KEYS = [
+    ("gp.release_year", "DESC", "year"),
+    ("g.game_name", "ASC", "game_name"),
+    ("gp.id", "ASC", "game_platform_id"),
+]
+# El id de game_platform solo se usa para el cursor y no se devuelve en las filas
+GAMES_BY_YEAR_OCULTAS = ("game_platform_id",)
+
+# Endpoint para avisar de que los datos se han recargado: vacía las cachés
+# y recarga los datos en memoria
+@app.post("/datos/invalidar")
+def invalidar_cache_datos():
+    try:
+        version = invalidar_datos()
+        return {"message": "Datos invalidados", "version": version}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al invalidar los datos: {str(e)}")
+
+# ENDPOINTS PARA LAS TABLAS RESUMEN
+
+@app.get("/resumenes")
+def get_estado_resumenes():
+    """Estado de las tablas resumen de ventas"""
+    try:
+        return estado_resumenes()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener el estado de los resúmenes: {str(e)}")
+
+@app.post("/resumenes/reconstruir")
+def post_reconstruir_resumenes():
+    """Recalcula por completo las tablas resumen"""
+    try:
+        return {"message": "Tablas resumen reconstruidas", "data": reconstruir_resumenes()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al reconstruir los resúmenes: {str(e)}")
+
+@app.post("/resumenes/refrescar")
+def post_refrescar_resumenes(game_platform_ids: List[int]):
+    """Recalcula solo los grupos afectados por los game_platform_id indicados"""
+    try:
+        return {"message": "Tablas resumen refrescadas", "data": refrescar_resumenes(game_platform_ids)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al refrescar los resúmenes: {str(e)}")
+
 # Endpoint para filtrar juegos por año de lanzamiento
 @app.get("/games/by-year/{year}")
-def get_games_by_year(year: str):
+async def get_games_by_year(
+    year: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: str = Query("json", alias="format")
+):
     try:
         if year.lower() == "all":
             # Mostrar todos los juegos organizados por año
-            query = """
-            SELECT 
-                g.id,
-                g.game_name,
-                COALESCE(gen.genre_name, 'Desconocido') as genre,
-                gp.release_year as year,
-                p.platform_name,
-                pu.publisher_name
-            FROM 
-                game g
-            LEFT JOIN 
-                genre gen ON g.genre_id = gen.id
-            JOIN 
-                game_publisher gpu ON g.id = gpu.game_id
-            JOIN 
-                publisher pu ON gpu.publisher_id = pu.id
-            JOIN 
-                game_platform gp ON gpu.id = gp.game_publisher_id
-            JOIN 
-                platform p ON gp.platform_id = p.id
-            WHERE
-                gp.release_year IS NOT NULL
-            ORDER BY 
-                gp.release_year DESC, g.game_name
-            """
-            games = execute_query(query)
+            template = GAMES_BY_YEAR_QUERY.format(filtro="gp.release_year IS NOT NULL")
+            keys = GAMES_BY_YEAR_KEYS
+            params = {}
             message = "Todos los juegos organizados por año"
         else:
             # Intentar convertir el año a entero
@@ -485,153 +825,268 @@ def get_games_by_year(year: str):
                 raise HTTPException(status_code=400, detail="El año debe ser un número o 'all'")
             
             # Filtrar juegos por el año específico
-            query = """
-            SELECT 
-                g.id,
-                g.game_name,
-                COALESCE(gen.genre_name, 'Desconocido') as genre,
-                gp.release_year as year,
-                p.platform_name,
-                pu.publisher_name
-            FROM 
-                game g
-            LEFT JOIN 
-                genre gen ON g.genre_id = gen.id
-            JOIN 
-                game_publisher gpu ON g.id = gpu.game_id
-            JOIN 
-                publisher pu ON gpu.publisher_id = pu.id
-            JOIN 
-                game_platform gp ON gpu.id = gp.game_publisher_id
-            JOIN 
-                platform p ON gp.platform_id = p.id
-            WHERE
-                gp.release_year = :year
-            ORDER BY 
-                g.game_name
-            """
-            games = execute_query(query, {"year": year_int})
+            template = GAMES_BY_YEAR_QUERY.format(filtro="gp.release_year = :year")
+            keys = GAMES_BY_YEAR_KEYS[1:]
+            params = {"year": year_int}
             message = f"Juegos lanzados en el año {year}"
+
+        if formato == "ndjson":
+            query, params = keyset_query(template, keys, params, cursor=cursor, limit=limit)
+            return await respuesta_ndjson(query, params, GAMES_BY_YEAR_OCULTAS)
+
+        paginado = limit is not None or cursor is not None
+        next_cursor = None
+        if paginado:
+            games, next_cursor = await fetch_page_async(template, keys, params, limit or 100, cursor, GAMES_BY_YEAR_OCULTAS)
+            columnas, filas = filas_de_dicts(games)
+        else:
+            query, params = keyset_query(template, keys, params)
+            columnas, filas = await execute_query_rows_async(query, params, nombre="juegos_por_anio")
+            visibles = [i for i, columna in enumerate(columnas) if columna not in GAMES_BY_YEAR_OCULTAS]
+            columnas = [columnas[i] for i in visibles]
+            filas = [tuple(fila[i] for i in visibles) for fila in filas]
         
-        if not games:
+        if not filas:
             return {"message": "No se encontraron juegos para el criterio especificado", "data": []}
             
-        return {
+        respuesta = {
             "message": message,
-            "count": len(games),
-            "data": games
+            "count": len(filas),
+            "data": formatear_filas(columnas, filas, formato)
         }
+        # "next" solo aparece al paginar (con limit o cursor)
+        if paginado:
+            respuesta["next"] = next_cursor
+        return RespuestaJSON(respuesta)
     except HTTPException as e:
         raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener juegos por año: {str(e)}")
 
+# ENDPOINTS DE EXPORTACIÓN
+
+async def respuesta_exportacion(query, nombre, formato, tam_bloque):
+    """Descarga del resultado de una consulta generado por bloques mientras se envía"""
+    comprobar_formato(formato)
+    bloques = exportar(query, formato, tam_bloque=tam_bloque)
+    # El primer bloque se genera antes de enviar las cabeceras para que los
+    # errores de la consulta todavía puedan devolverse como HTTP 500
+    primero = await run_in_threadpool(next, bloques, b"")
+
+    def contenido():
+        yield primero
+        yield from bloques
+
+    extension = FORMATOS_EXPORTACION[formato]["extension"]
+    return StreamingResponse(
+        contenido(),
+        media_type=FORMATOS_EXPORTACION[formato]["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{extension}"'}
+    )
+
+@app.get("/export/tables/{table_name}")
+async def export_table(
+    table_name: str,
+    formato: str = Query("csv", alias="format"),
+    chunk: int = Query(TAM_BLOQUE_EXPORTACION, ge=1, le=100000)
+):
+    """Descarga una tabla completa en CSV, CSV comprimido (csv.gz) o Parquet"""
+    try:
+        query = await run_in_threadpool(consulta_tabla, table_name)
+        return await respuesta_exportacion(query, table_name, formato, chunk)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar la tabla: {str(e)}")
+
+@app.get("/export/queries")
+def list_export_queries():
+    """Consultas analíticas disponibles para exportar"""
+    return {"queries": sorted(CONSULTAS_EXPORTACION), "formats": list(FORMATOS_EXPORTACION)}
+
+@app.get("/export/queries/{nombre}")
+async def export_query(
+    nombre: str,
+    formato: str = Query("csv", alias="format"),
+    chunk: int = Query(TAM_BLOQUE_EXPORTACION, ge=1, le=100000)
+):
+    """Descarga el resultado completo de una consulta analítica con nombre"""
+    try:
+        return await respuesta_exportacion(consulta_nombrada(nombre), nombre, formato, chunk)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar la consulta: {str(e)}")
+
 # ENDPOINTS PARA CONSULTAS PANDAS
 
+@app.get("/pandas/memoria")
+def get_memoria_dataframes():
+    """Memoria de los DataFrames de cada consulta antes y después de compactar los tipos"""
+    carga = cargar("carga_dataframes")
+    return {"optimized": carga.DATAFRAMES_OPTIMIZADOS, "queries": carga.informe_memoria()}
+
 @app.get("/pandas/top-plataformas/{top}", response_class=HTMLResponse)
-def get_top_plataformas(top: int = 10):
+def get_top_plataformas(top: int = 10, page: int = 1, size: Optional[int] = None):
     """Endpoint para obtener las plataformas con más juegos usando pandas"""
     try:
-        df = get_top_plataformas_mas_juegos(top)
-        return tabla_formato(df, f"Top {top} Plataformas con Más Juegos")
+        df = cargar("pandas_consultas").get_top_plataformas_mas_juegos(top)
+        return cargar("formato").tabla_formato(df, f"Top {top} Plataformas con Más Juegos", page, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener top plataformas: {str(e)}")
 
 @app.get("/pandas/juegos-region/{region}/{top}", response_class=HTMLResponse)
-def get_juegos_por_region(region: str, top: int = 10):
+def get_juegos_por_region(region: str, top: int = 10, page: int = 1, size: Optional[int] = None):
     """Endpoint para obtener los juegos más vendidos por región usando pandas"""
     try:
-        df = get_juegos_mas_vendidos_por_region(region, top)
-        return tabla_formato(df, f"Top {top} Juegos Más Vendidos en {region}")
+        df = cargar("pandas_consultas").get_juegos_mas_vendidos_por_region(region, top)
+        return cargar("formato").tabla_formato(df, f"Top {top} Juegos Más Vendidos en {region}", page, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener juegos por región: {str(e)}")
 
 @app.get("/pandas/lanzamientos-anio", response_class=HTMLResponse)
-def get_lanzamientos_anio():
+def get_lanzamientos_anio(page: int = 1, size: Optional[int] = None):
     """Endpoint para obtener lanzamientos por año usando pandas"""
     try:
-        df = get_lanzamientos_por_anio()
-        return tabla_formato(df, "Lanzamientos de Juegos por Año")
+        df = cargar("pandas_consultas").get_lanzamientos_por_anio()
+        return cargar("formato").tabla_formato(df, "Lanzamientos de Juegos por Año", page, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener lanzamientos por año: {str(e)}")
 
 @app.get("/pandas/top-generos/{top}", response_class=HTMLResponse)
-def get_top_generos(top: int = 10):
+def get_top_generos(top: int = 10, page: int = 1, size: Optional[int] = None):
     """Endpoint para obtener los géneros con más juegos usando pandas"""
     try:
-        df = get_top_generos_juegos(top)
-        return tabla_formato(df, f"Top {top} Géneros con Más Juegos")
+        df = cargar("pandas_consultas").get_top_generos_juegos(top)
+        return cargar("formato").tabla_formato(df, f"Top {top} Géneros con Más Juegos", page, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener top géneros: {str(e)}")
 
 @app.get("/pandas/juegos-menos-ventas/{top}", response_class=HTMLResponse)
-def get_juegos_menos_ventas(top: int = 10):
+def get_juegos_menos_ventas(top: int = 10, page: int = 1, size: Optional[int] = None):
     """Endpoint para obtener los juegos con menos ventas usando pandas"""
     try:
-        df = get_top_juegos_menos_ventas(top)
-        return tabla_formato(df, f"Top {top} Juegos con Menos Ventas")
+        df = cargar("pandas_consultas").get_top_juegos_menos_ventas(top)
+        return cargar("formato").tabla_formato(df, f"Top {top} Juegos con Menos Ventas", page, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener juegos con menos ventas: {str(e)}")
 
 @app.get("/pandas/top-publishers/{top}", response_class=HTMLResponse)
-def get_publishers_mas_juegos(top: int = 10):
+def get_publishers_mas_juegos(top: int = 10, page: int = 1, size: Optional[int] = None):
     """Endpoint para obtener los publishers con más juegos usando pandas"""
     try:
-        df = get_top_publishers_juegos(top)
-        return tabla_formato(df, f"Top {top} Publishers con Más Juegos")
+        df = cargar("pandas_consultas").get_top_publishers_juegos(top)
+        return cargar("formato").tabla_formato(df, f"Top {top} Publishers con Más Juegos", page, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener top publishers: {str(e)}")
 
 # ENDPOINTS PARA GRÁFICAS SEABORN
 
 @app.get("/seaborn/top-editoras/{top}")
-def generate_top_editoras(top: int = 10):
-    """Endpoint para generar gráfico de las editoras con más juegos"""
+def generate_top_editoras(top: int = 10, formato: str = Query("png", alias="format")):
+    """Endpoint para generar gráfico de las editoras con más juegos (format=png, vega o data)"""
     try:
-        return get_top_editoras_por_cantidad_de_juegos(top)
+        return cargar("seaborn_graficas").get_top_editoras_por_cantidad_de_juegos(top, formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar gráfico de editoras: {str(e)}")
 
 @app.get("/seaborn/distribucion-ventas")
-def generate_distribucion_ventas():
-    """Endpoint para generar gráfico de distribución de ventas por región"""
+def generate_distribucion_ventas(formato: str = Query("png", alias="format")):
+    """Endpoint para generar gráfico de distribución de ventas por región (format=png, vega o data)"""
     try:
-        return get_distribucion_ventas_por_region()
+        return cargar("seaborn_graficas").get_distribucion_ventas_por_region(formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar gráfico de distribución de ventas: {str(e)}")
 
 @app.get("/seaborn/lanzamientos-anio/{top}")
-def generate_lanzamientos_anio(top: int = 10):
-    """Endpoint para generar gráfico de años con más lanzamientos"""
+def generate_lanzamientos_anio(top: int = 10, formato: str = Query("png", alias="format")):
+    """Endpoint para generar gráfico de años con más lanzamientos (format=png, vega o data)"""
     try:
-        return get_juegos_mas_lanzados_por_anio(top)
+        return cargar("seaborn_graficas").get_juegos_mas_lanzados_por_anio(top, formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar gráfico de lanzamientos por año: {str(e)}")
 
 @app.get("/seaborn/top-juegos-ventas/{top}")
-def generate_top_juegos_ventas(top: int = 10):
-    """Endpoint para generar gráfico de los juegos con más ventas"""
+def generate_top_juegos_ventas(top: int = 10, formato: str = Query("png", alias="format")):
+    """Endpoint para generar gráfico de los juegos con más ventas (format=png, vega o data)"""
     try:
-        return get_top_juegos_ventas(top)
+        return cargar("seaborn_graficas").get_top_juegos_ventas(top, formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar gráfico de ventas: {str(e)}")
 
 @app.get("/seaborn/top-generos-ventas/{top}")
-def generate_top_generos_ventas(top: int = 10):
-    """Endpoint para generar gráfico de los géneros con más ventas"""
+def generate_top_generos_ventas(top: int = 10, formato: str = Query("png", alias="format")):
+    """Endpoint para generar gráfico de los géneros con más ventas (format=png, vega o data)"""
     try:
-        return get_top_generos_ventas(top)
+        return cargar("seaborn_graficas").get_top_generos_ventas(top, formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar gráfico de géneros: {str(e)}")
 
 @app.get("/seaborn/ventas-plataforma-region/{top}")
-def generate_ventas_plataforma_region(top: int = 10):
-    """Endpoint para generar gráfico de ventas por plataforma y región"""
+def generate_ventas_plataforma_region(top: int = 10, formato: str = Query("png", alias="format")):
+    """Endpoint para generar gráfico de ventas por plataforma y región (format=png, vega o data)"""
     try:
-        return get_ventas_plataforma_region(top)
+        return cargar("seaborn_graficas").get_ventas_plataforma_region(top, formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar gráfico de plataformas por región: {str(e)}")
 
+@app.get("/seaborn/dashboard")
+def generate_dashboard(
+    charts: Optional[str] = Query(None, description="Gráficas separadas por comas (por defecto, todas)"),
+    top: int = Query(10, ge=1, le=100),
+    columnas: int = Query(2, ge=1, le=6, alias="columns"),
+    formato: str = Query("png", alias="format")
+):
+    """Endpoint con varias gráficas a partir de una sola lectura de datos, como imagen compuesta, multipart, Vega-Lite o datos"""
+    try:
+        graficas = [nombre.strip() for nombre in charts.split(",") if nombre.strip()] if charts else None
+        return cargar("seaborn_graficas").get_dashboard(graficas, top, formato, columnas)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar el dashboard: {str(e)}")
+
+@app.get("/stats/cache")
+def get_cache_respuestas():
+    """Endpoint con las estadísticas de la caché de respuestas de /stats/*"""
+    return {**cache_respuestas.estadisticas(), "data_version": version_actual()}
+
+@app.get("/db/cache")
+def get_cache_disco():
+    """Endpoint con las estadísticas de la caché de consultas en disco compartida por los workers"""
+    return estadisticas_cache_disco()
+
+@app.get("/seaborn/cache")
+def get_cache_graficas():
+    """Endpoint con las estadísticas de la caché de gráficos"""
+    return {**cache_graficas.estadisticas(), "data_version": version_actual()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,176 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+
+# Métricas de tiempos por petición y por consulta.
+# Cada petición acumula la duración de sus fases (espera del pool, SQL,
+# conversión de filas, serialización, render de gráficas...) en un
+# diccionario guardado en una ContextVar. El middleware lo devuelve en la
+# cabecera Server-Timing y lo añade a los histogramas que expone /metrics
+# en formato de texto de Prometheus.
+
+# Límites superiores (en segundos) de los buckets de los histogramas
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fases de la petición en curso; None fuera de una petición
+_fases = ContextVar("fases_peticion", default=None)
+
+
+class Histograma:
+    """Histograma acumulativo con etiquetas, exportable en formato Prometheus"""
+
+    def __init__(self, nombre, ayuda, etiquetas, buckets=BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valores, segundos):
+        """Registra una duración para la combinación de etiquetas indicada"""
+        indice = bisect.bisect_left(self.buckets, segundos)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                # Conteos por bucket (el último es +Inf), suma y total
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += segundos
+            serie[2] += 1
+
+    def exponer(self):
+        """Líneas del histograma en el formato de texto de Prometheus"""
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(valores, list(conteos), suma, total) for valores, (conteos, suma, total) in self._series.items()]
+
+        for valores, conteos, suma, total in sorted(series):
+            etiquetas = ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(self.etiquetas, valores))
+            acumulado = 0
+            for limite, conteo in zip(list(self.buckets) + ["+Inf"], conteos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f"{self.nombre}_sum{{{etiquetas}}} {suma:.6f}")
+            lineas.append(f"{self.nombre}_count{{{etiquetas}}} {total}")
+        return lineas
+
+    def limpiar(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+peticiones = Histograma(
+    "http_request_duration_seconds",
+    "Duración total de las peticiones HTTP por ruta",
+    ("route", "method", "status"),
+)
+fases_peticion = Histograma(
+    "http_request_phase_seconds",
+    "Tiempo de cada fase dentro de las peticiones HTTP por ruta",
+    ("route", "phase"),
+)
+fases_consulta = Histograma(
+    "db_query_phase_seconds",
+    "Tiempo de cada fase de las consultas con nombre",
+    ("query", "phase"),
+)
+
+
+def registrar(fase, segundos, consulta=None):
+    """
+    Suma la duración de una fase a la petición en curso y, si se indica
+    el nombre de la consulta, la registra también en su histograma.
+    """
+    fases = _fases.get()
+    if fases is not None:
+        fases[fase] = fases.get(fase, 0.0) + segundos
+    if consulta:
+        fases_consulta.observar((consulta, fase), segundos)
+
+
+@contextmanager
+def medir(fase, consulta=None):
+    """Mide el bloque y lo registra como la fase indicada"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(fase, time.perf_counter() - inicio, consulta)
+
+
+def server_timing(fases, total):
+    """Valor de la cabecera Server-Timing (duraciones en milisegundos)"""
+    partes = [f"{fase};dur={segundos * 1000:.2f}" for fase, segundos in fases.items()]
+    partes.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(partes)
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mide cada petición, añade la cabecera Server-Timing
+    y registra los tiempos por ruta. Las fases que ocurren después de
+    enviar las cabeceras (respuestas en streaming) solo llegan a /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._rutas = None
+
+    def _ruta(self, scope):
+        """Plantilla de la ruta (/games/{game_id}) para no crear una serie por URL"""
+        if self._rutas is None:
+            app = scope.get("app")
+            rutas = getattr(app, "routes", [])
+            self._rutas = {getattr(r, "endpoint", None): r.path for r in rutas if hasattr(r, "path")}
+        return self._rutas.get(scope.get("endpoint"), "sin_ruta")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        fases = {}
+        token = _fases.set(fases)
+        inicio = time.perf_counter()
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                cabeceras = MutableHeaders(scope=mensaje)
+                cabeceras.append("Server-Timing", server_timing(fases, time.perf_counter() - inicio))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            total = time.perf_counter() - inicio
+            _fases.reset(token)
+            ruta = self._ruta(scope)
+            peticiones.observar((ruta, scope["method"], str(estado)), total)
+            for fase, segundos in list(fases.items()):
+                fases_peticion.observar((ruta, fase), segundos)
+
+
+def texto_prometheus():
+    """Todas las métricas en el formato de exposición de Prometheus"""
+    lineas = []
+    for histograma in (peticiones, fases_peticion, fases_consulta):
+        lineas.extend(histograma.exponer())
+    return "\n".join(lineas) + "\n"
+
+
+def limpiar_metricas():
+    """Reinicia todos los histogramas"""
+    for histograma in (peticiones, fases_peticion, fases_consulta):
+        histograma.limpiar()
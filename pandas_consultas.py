@@ -1,9 +1,7 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
 import os
 
-DATABASE_URL = "mysql+pymysql://root:rootpassword@db:3306/video_games"
-engine = create_engine(DATABASE_URL)
+from carga_dataframes import leer_dataframe
 
 def get_top_plataformas_mas_juegos(TOP):
     """
@@ -19,7 +17,7 @@ def get_top_plataformas_mas_juegos(TOP):
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(query, engine)
+    df = leer_dataframe(query, nombre="get_top_plataformas_mas_juegos")
     return df
 
 def get_juegos_mas_vendidos_por_region(region_name, TOP):
@@ -40,7 +38,7 @@ def get_juegos_mas_vendidos_por_region(region_name, TOP):
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(text(query), engine, params={"region_name": region_name})
+    df = leer_dataframe(query, {"region_name": region_name}, nombre="get_juegos_mas_vendidos_por_region")
     return df
 
 def get_lanzamientos_por_anio():
@@ -56,7 +54,7 @@ def get_lanzamientos_por_anio():
     ORDER BY gpl.release_year
     """
     
-    df = pd.read_sql(query, engine)
+    df = leer_dataframe(query, nombre="get_lanzamientos_por_anio")
     return df
 
 def get_top_generos_juegos(TOP):
@@ -73,7 +71,7 @@ def get_top_generos_juegos(TOP):
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(query, engine)
+    df = leer_dataframe(query, nombre="get_top_generos_juegos")
     return df
 
 def get_top_juegos_menos_ventas(TOP):
@@ -93,7 +91,7 @@ def get_top_juegos_menos_ventas(TOP):
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(query, engine)
+    df = leer_dataframe(query, nombre="get_top_juegos_menos_ventas")
     return df
 
 def get_top_publishers_juegos(TOP):
@@ -110,6 +108,6 @@ def get_top_publishers_juegos(TOP):
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(query, engine)
+    df = leer_dataframe(query, nombre="get_top_publishers_juegos")
     return df
 
@@ -0,0 +1,114 @@
+import matplotlib
+matplotlib.use('Agg')  # Usar backend no interactivo
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import seaborn as sns
+from io import BytesIO
+
+# Funciones de dibujo de las gráficas de seaborn_graficas.py. Usan objetos
+# Figure/Axes explícitos en lugar del estado global de pyplot, de modo que se
+# pueden ejecutar en los procesos del pool de render. Solo importan
+# matplotlib y seaborn para que los procesos arranquen rápido.
+
+
+def _rotar_etiquetas(ax, rotacion, alineacion="right"):
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_rotation(rotacion)
+        etiqueta.set_horizontalalignment(alineacion)
+
+
+def dibujar_top_editoras(ax, df, TOP):
+    # Gráfica de barras – Las editoras con más juegos publicados
+    sns.barplot(x='publisher', y='total_games', data=df, palette='coolwarm', ax=ax)
+    ax.set_title(f"TOP {TOP} editoras con más juegos publicados")
+    ax.set_ylabel("Cantidad de juegos")
+    ax.set_xlabel("Editora")
+    _rotar_etiquetas(ax, 10)
+
+
+def dibujar_distribucion_ventas(ax, df):
+    # Gráfica de pastel – Distribución global de ventas por región
+    ax.pie(df['total_sales'], labels=df['region_name'], autopct='%1.1f%%',
+           colors=matplotlib.colormaps['Set3'].colors)
+    ax.axis('equal')
+    ax.set_title("Distribución global de ventas por región")
+
+
+def dibujar_lanzamientos_anio(ax, df, TOP):
+    # Gráfica de líneas – Años con más lanzamientos de videojuegos
+    sns.lineplot(x='release_year', y='num_games', data=df, marker='o', color='orange', ax=ax)
+    ax.set_title(f"TOP {TOP} años con más lanzamientos de videojuegos")
+    ax.set_xlabel("Año")
+    ax.set_ylabel("Cantidad de juegos lanzados")
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(True)
+
+
+def dibujar_top_juegos_ventas(ax, df, TOP):
+    # Gráfica de barras – Juegos con más ventas totales
+    sns.barplot(x='game', y='total_sales', data=df, palette='viridis', ax=ax)
+    ax.set_title(f"TOP {TOP} juegos con más ventas totales")
+    ax.set_ylabel("Ventas totales (millones)")
+    ax.set_xlabel("Juego")
+    _rotar_etiquetas(ax, 45)
+
+
+def dibujar_top_generos_ventas(ax, df, TOP):
+    # Gráfica de barras – Géneros con más ventas totales
+    sns.barplot(x='genre', y='total_sales', data=df, palette='plasma', ax=ax)
+    ax.set_title(f"TOP {TOP} géneros con más ventas totales")
+    ax.set_ylabel("Ventas totales (millones)")
+    ax.set_xlabel("Género")
+    _rotar_etiquetas(ax, 15)
+
+
+def dibujar_ventas_plataforma_region(ax, df, TOP):
+    # Gráfica de barras agrupadas – Ventas por plataforma y región
+    sns.barplot(x="platform", y="total_sales", hue="region", data=df, palette="Set2", ax=ax)
+    ax.set_title(f"Ventas por región en las TOP {TOP} plataformas")
+    ax.set_ylabel("Ventas totales (millones)")
+    ax.set_xlabel("Plataforma")
+    ax.tick_params(axis='x', rotation=45)
+    ax.legend(title="Región")
+
+
+def render_png(dibujar, figsize, df, *params):
+    """
+    Dibuja una gráfica en una figura nueva y devuelve los bytes del PNG.
+    Es la función que se ejecuta en los procesos del pool.
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    dibujar(ax, df, *params)
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def componer_png(pngs, columnas=2, margen=20):
+    """
+    Une varias imágenes PNG en una sola, en una cuadrícula de `columnas`
+    columnas. Cada celda mide lo que la imagen más grande de su fila y columna.
+    """
+    from PIL import Image
+
+    imagenes = [Image.open(BytesIO(png)).convert("RGB") for png in pngs]
+    filas = [imagenes[i:i + columnas] for i in range(0, len(imagenes), columnas)]
+    anchos = [max(img.width for img in imagenes[c::columnas]) for c in range(min(columnas, len(imagenes)))]
+    altos = [max(img.height for img in fila) for fila in filas]
+
+    lienzo = Image.new("RGB", (sum(anchos) + margen * (len(anchos) + 1), sum(altos) + margen * (len(altos) + 1)), "white")
+    y = margen
+    for fila, alto in zip(filas, altos):
+        x = margen
+        for imagen, ancho in zip(fila, anchos):
+            lienzo.paste(imagen, (x + (ancho - imagen.width) // 2, y))
+            x += ancho + margen
+        y += alto + margen
+
+    buffer = BytesIO()
+    lienzo.save(buffer, format="PNG")
+    return buffer.getvalue()
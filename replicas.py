@@ -0,0 +1,259 @@
+import os
+import time
+import asyncio
+import itertools
+import threading
+from sqlalchemy import text
+
+from conexion import get_engine, get_async_engine, crear_engine, crear_engine_async
+from version_datos import al_invalidar
+
+# Enrutado de lecturas a réplicas.
+# El engine de escritura es el de DATABASE_URL (primaria): cargas de
+# volcados, tablas resumen y sesiones. Las consultas analíticas y de solo
+# lectura (database.execute_query*, stream_query*, DataFrames de pandas y
+# seaborn, exportaciones) piden la conexión a conectar_lectura(), que
+# reparte entre las réplicas de DATABASE_REPLICA_URLS por turnos.
+#
+# El retraso de cada réplica se mide con una fila de latido: la primaria
+# escribe la hora actual en replica_latido y la réplica la devuelve cuando
+# le ha llegado. Una réplica queda fuera del reparto si no responde, si su
+# retraso supera REPLICA_RETRASO_MAXIMO o si todavía no ha recibido la
+# última recarga de datos hecha desde este proceso. Sin réplicas
+# disponibles, las lecturas van a la primaria.
+
+# URLs de las réplicas separadas por comas (vacío = todo a la primaria)
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Segundos de retraso a partir de los cuales una réplica deja de usarse
+REPLICA_RETRASO_MAXIMO = float(os.getenv("REPLICA_RETRASO_MAXIMO", "5"))
+# Segundos entre comprobaciones de salud
+REPLICA_INTERVALO_COMPROBACION = float(os.getenv("REPLICA_INTERVALO_COMPROBACION", "5"))
+
+TABLA_LATIDO = "replica_latido"
+
+
+class Replica:
+    """Engines y estado de salud de una réplica"""
+
+    def __init__(self, url):
+        self.engine = crear_engine(url)
+        self.url = self.engine.url
+        self._engine_async = None
+        self.sana = False
+        self.retraso = None
+        self.latido = None
+        self.error = "sin comprobar"
+        self.comprobada_en = None
+        self.lecturas = 0
+        self.fallos = 0
+
+    def engine_async(self):
+        if self._engine_async is None:
+            self._engine_async = crear_engine_async(self.url)
+        return self._engine_async
+
+    def marcar_caida(self, error):
+        self.sana = False
+        # Primera línea del error, sin el SQL ni el enlace de SQLAlchemy
+        self.error = str(error).splitlines()[0] if str(error) else type(error).__name__
+        self.fallos += 1
+
+    def estado(self):
+        return {
+            "url": self.url.render_as_string(hide_password=True),
+            "healthy": self.sana,
+            "available": _disponible(self),
+            "lag_seconds": None if self.retraso is None else round(self.retraso, 3),
+            "error": self.error,
+            "checked_at": self.comprobada_en,
+            "reads": self.lecturas,
+            "failures": self.fallos,
+        }
+
+
+_replicas = [Replica(url) for url in REPLICA_URLS]
+_turno = itertools.count()
+_lock = threading.Lock()
+_lock_comprobacion = threading.Lock()
+_comprobadas = False
+_tabla_creada = False
+_ultima_escritura = 0.0
+_lecturas_primaria = 0
+_hilo = None
+_parar = threading.Event()
+
+
+def engine_escritura():
+    """Engine de la primaria, para cargas y cualquier consulta que modifique datos"""
+    return get_engine()
+
+
+def _disponible(replica):
+    # Una réplica con un latido anterior a la última recarga aún no tiene esos datos
+    return replica.sana and replica.latido is not None and replica.latido >= _ultima_escritura
+
+
+def _escribir_latido():
+    """Escribe la hora actual en la fila de latido de la primaria y la devuelve"""
+    global _tabla_creada
+    instante = time.time()
+    with engine_escritura().begin() as conn:
+        if not _tabla_creada:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {TABLA_LATIDO} (id INTEGER PRIMARY KEY, instante DOUBLE PRECISION NOT NULL)"))
+            _tabla_creada = True
+        actualizadas = conn.execute(text(f"UPDATE {TABLA_LATIDO} SET instante = :instante WHERE id = 1"), {"instante": instante})
+        if actualizadas.rowcount == 0:
+            conn.execute(text(f"INSERT INTO {TABLA_LATIDO} (id, instante) VALUES (1, :instante)"), {"instante": instante})
+    return instante
+
+
+def _comprobar(replica):
+    try:
+        with replica.engine.connect() as conn:
+            latido = conn.execute(text(f"SELECT instante FROM {TABLA_LATIDO} WHERE id = 1")).scalar()
+        if latido is None:
+            raise ValueError("la réplica no tiene fila de latido")
+        replica.latido = float(latido)
+        replica.retraso = max(0.0, time.time() - replica.latido)
+        if replica.retraso > REPLICA_RETRASO_MAXIMO:
+            replica.sana = False
+            replica.error = f"retraso de {replica.retraso:.1f} s (máximo {REPLICA_RETRASO_MAXIMO} s)"
+        else:
+            replica.sana = True
+            replica.error = None
+    except Exception as e:
+        replica.marcar_caida(e)
+    replica.comprobada_en = time.time()
+
+
+def comprobar_replicas():
+    """Escribe un latido en la primaria y mide la salud y el retraso de cada réplica"""
+    global _comprobadas
+    if not _replicas:
+        return estado_replicas()
+    try:
+        _escribir_latido()
+    except Exception as e:
+        # Sin latido nuevo el retraso de las réplicas crece y acaban fuera del reparto
+        print(f"❌ Error al escribir el latido de réplicas: {str(e)}")
+    for replica in _replicas:
+        _comprobar(replica)
+    _comprobadas = True
+    return estado_replicas()
+
+
+def _primera_comprobacion():
+    """Comprueba las réplicas si todavía no se ha hecho (normalmente ya lo hace el arranque)"""
+    if not _comprobadas:
+        with _lock_comprobacion:
+            if not _comprobadas:
+                comprobar_replicas()
+
+
+def _candidatas():
+    if not _replicas:
+        return []
+    _primera_comprobacion()
+    disponibles = [replica for replica in _replicas if _disponible(replica)]
+    if not disponibles:
+        return []
+    # Por turnos, empezando por una réplica distinta en cada lectura
+    inicio = next(_turno) % len(disponibles)
+    return disponibles[inicio:] + disponibles[:inicio]
+
+
+def _contar_lectura(replica=None):
+    global _lecturas_primaria
+    with _lock:
+        if replica is None:
+            _lecturas_primaria += 1
+        else:
+            replica.lecturas += 1
+
+
+def conectar_lectura():
+    """
+    Conexión para una consulta de solo lectura: la siguiente réplica
+    disponible o, si ninguna responde, la primaria.
+    """
+    for replica in _candidatas():
+        try:
+            conn = replica.engine.connect()
+        except Exception as e:
+            replica.marcar_caida(e)
+            continue
+        _contar_lectura(replica)
+        return conn
+    _contar_lectura()
+    return get_engine().connect()
+
+
+async def conectar_lectura_async():
+    """Versión asíncrona de conectar_lectura (engines asíncronos de las réplicas)"""
+    if _replicas and not _comprobadas:
+        # La primera comprobación escribe el latido y conecta a cada réplica:
+        # se hace en un hilo para no bloquear el event loop
+        await asyncio.to_thread(_primera_comprobacion)
+    for replica in _candidatas():
+        try:
+            conn = await replica.engine_async().connect()
+        except Exception as e:
+            replica.marcar_caida(e)
+            continue
+        _contar_lectura(replica)
+        return conn
+    _contar_lectura()
+    return await get_async_engine().connect()
+
+
+def _bucle_comprobaciones():
+    while not _parar.wait(REPLICA_INTERVALO_COMPROBACION):
+        comprobar_replicas()
+
+
+def iniciar_comprobaciones():
+    """Comprueba las réplicas ahora y después cada REPLICA_INTERVALO_COMPROBACION segundos"""
+    global _hilo
+    if not _replicas or _hilo is not None:
+        return
+    comprobar_replicas()
+    _parar.clear()
+    _hilo = threading.Thread(target=_bucle_comprobaciones, name="comprobar-replicas", daemon=True)
+    _hilo.start()
+
+
+async def cerrar_replicas():
+    """Detiene las comprobaciones y cierra las conexiones de las réplicas"""
+    global _hilo
+    _parar.set()
+    _hilo = None
+    for replica in _replicas:
+        replica.engine.dispose()
+        if replica._engine_async is not None:
+            await replica._engine_async.dispose()
+
+
+def estado_replicas():
+    """Salud, retraso y lecturas servidas por cada réplica y por la primaria"""
+    return {
+        "replicas": [replica.estado() for replica in _replicas],
+        "max_lag_seconds": REPLICA_RETRASO_MAXIMO,
+        "check_interval_seconds": REPLICA_INTERVALO_COMPROBACION,
+        "primary_reads": _lecturas_primaria,
+    }
+
+
+@al_invalidar
+def _tras_recarga():
+    """
+    Tras recargar datos en la primaria, las réplicas no se usan hasta que les
+    llega un latido posterior a la recarga (lecturas coherentes con la escritura).
+    """
+    global _ultima_escritura
+    if not _replicas:
+        return
+    try:
+        _ultima_escritura = _escribir_latido()
+    except Exception as e:
+        print(f"❌ Error al escribir el latido de réplicas: {str(e)}")
+        _ultima_escritura = time.time()
@@ -0,0 +1,356 @@
+import os
+import time
+import datetime
+import threading
+from sqlalchemy import text
+
+from conexion import get_engine
+from version_datos import al_invalidar
+from cache_respuestas import cache as cache_respuestas
+from cache_graficas import cache as cache_graficas
+from cache_disco import invalidar_cache_disco
+
+# Tablas resumen con los totales de ventas que usan /stats/* y las gráficas.
+# Se reconstruyen por completo o se refrescan solo los grupos afectados por
+# un conjunto de game_platform_id. Mientras una tabla no esté marcada como
+# fresca, las consultas siguen usando el join sobre region_sales.
+# Cada resumen tiene además una tabla {tabla}_grupos con los grupos a los
+# que contribuía cada game_platform_id en el último cálculo, para refrescar
+# también los grupos de los que sale una fila borrada o movida.
+
+engine = get_engine()
+
+# Segundos que se reutiliza en memoria el estado de frescura de las tablas
+RESUMENES_TTL = float(os.getenv("RESUMENES_TTL", "10"))
+
+# Joins desde region_sales hasta cada dimensión. {filtro} permite limitar
+# el cálculo a ciertos grupos en el refresco incremental.
+_JOIN_GENERO = """
+    FROM region_sales rs
+    JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+    JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+    JOIN game ga ON gp.game_id = ga.id
+    LEFT JOIN genre g ON ga.genre_id = g.id
+"""
+_JOIN_PLATAFORMA = """
+    FROM region_sales rs
+    JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+    JOIN platform p ON gpl.platform_id = p.id
+"""
+_JOIN_PUBLISHER = """
+    FROM region_sales rs
+    JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+    JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+    JOIN publisher pu ON gp.publisher_id = pu.id
+"""
+_JOIN_ANIO = """
+    FROM region_sales rs
+    JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+"""
+_JOIN_REGION = """
+    FROM region_sales rs
+    JOIN region r ON rs.region_id = r.id
+"""
+_JOIN_PLATAFORMA_REGION = """
+    FROM region_sales rs
+    JOIN region r ON rs.region_id = r.id
+    JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+    JOIN platform p ON gpl.platform_id = p.id
+"""
+
+RESUMENES = {
+    "genero": {
+        "tabla": "resumen_ventas_genero",
+        "columnas": {"genre_name": "VARCHAR(50)"},
+        "claves": ["g.genre_name"],
+        "join": _JOIN_GENERO,
+    },
+    "plataforma": {
+        "tabla": "resumen_ventas_plataforma",
+        "columnas": {"platform_name": "VARCHAR(50)"},
+        "claves": ["p.platform_name"],
+        "join": _JOIN_PLATAFORMA,
+    },
+    "publisher": {
+        "tabla": "resumen_ventas_publisher",
+        "columnas": {"publisher_name": "VARCHAR(100)"},
+        "claves": ["pu.publisher_name"],
+        "join": _JOIN_PUBLISHER,
+    },
+    "region": {
+        "tabla": "resumen_ventas_region",
+        "columnas": {"region_name": "VARCHAR(50)"},
+        "claves": ["r.region_name"],
+        "join": _JOIN_REGION,
+    },
+    "anio": {
+        "tabla": "resumen_ventas_anio",
+        "columnas": {"release_year": "INT"},
+        "claves": ["gpl.release_year"],
+        "join": _JOIN_ANIO,
+        "condicion": "gpl.release_year IS NOT NULL",
+    },
+    "anio_plataforma": {
+        "tabla": "resumen_ventas_anio_plataforma",
+        "columnas": {"release_year": "INT", "platform_name": "VARCHAR(50)"},
+        "claves": ["gpl.release_year", "p.platform_name"],
+        "join": _JOIN_PLATAFORMA,
+        "condicion": "gpl.release_year IS NOT NULL",
+    },
+    "plataforma_region": {
+        "tabla": "resumen_ventas_plataforma_region",
+        "columnas": {"platform_name": "VARCHAR(50)", "region_name": "VARCHAR(50)"},
+        "claves": ["p.platform_name", "r.region_name"],
+        "join": _JOIN_PLATAFORMA_REGION,
+    },
+}
+
+_estado_cache = {}
+_estado_lock = threading.Lock()
+
+
+def _crear_tablas(conn):
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS resumen_estado (
+      nombre VARCHAR(64) NOT NULL,
+      fresco INT NOT NULL,
+      actualizado VARCHAR(32) DEFAULT NULL,
+      CONSTRAINT pk_resumen_estado PRIMARY KEY (nombre)
+    )
+    """))
+    for definicion in RESUMENES.values():
+        columnas = ",\n      ".join(f"{nombre} {tipo} DEFAULT NULL" for nombre, tipo in definicion["columnas"].items())
+        conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {definicion['tabla']} (
+          {columnas},
+          total_sales DECIMAL(12,2) DEFAULT NULL
+        )
+        """))
+        conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {definicion['tabla']}_grupos (
+          game_platform_id INT NOT NULL,
+          {columnas}
+        )
+        """))
+
+
+def _guardar_estado(conn, nombre, fresco):
+    conn.execute(text("DELETE FROM resumen_estado WHERE nombre = :nombre"), {"nombre": nombre})
+    conn.execute(
+        text("INSERT INTO resumen_estado (nombre, fresco, actualizado) VALUES (:nombre, :fresco, :actualizado)"),
+        {"nombre": nombre, "fresco": int(fresco), "actualizado": datetime.datetime.now().isoformat(timespec="seconds")},
+    )
+
+
+def _actualizar_estado(conn, nombre, fresco):
+    """
+    Cambia la frescura de una tabla que ya tiene estado. Las tablas sin fila
+    en resumen_estado nunca se han reconstruido por completo y siguen sin usarse.
+    """
+    conn.execute(
+        text("UPDATE resumen_estado SET fresco = :fresco, actualizado = :actualizado WHERE nombre = :nombre"),
+        {"nombre": nombre, "fresco": int(fresco), "actualizado": datetime.datetime.now().isoformat(timespec="seconds")},
+    )
+
+
+def _insert_select(definicion, filtro="1 = 1"):
+    """INSERT ... SELECT que calcula el resumen desde region_sales"""
+    claves = ", ".join(definicion["claves"])
+    condicion = definicion.get("condicion", "1 = 1")
+    return f"""
+    INSERT INTO {definicion['tabla']} ({', '.join(definicion['columnas'])}, total_sales)
+    SELECT {claves}, SUM(rs.num_sales)
+    {definicion['join']}
+    WHERE {condicion} AND {filtro}
+    GROUP BY {claves}
+    """
+
+
+def _insert_grupos(definicion, filtro="1 = 1"):
+    """INSERT ... SELECT que guarda los grupos de cada game_platform_id"""
+    condicion = definicion.get("condicion", "1 = 1")
+    return f"""
+    INSERT INTO {definicion['tabla']}_grupos (game_platform_id, {', '.join(definicion['columnas'])})
+    SELECT DISTINCT rs.game_platform_id, {', '.join(definicion['claves'])}
+    {definicion['join']}
+    WHERE {condicion} AND {filtro}
+    """
+
+
+def _reconstruir(conn, definicion):
+    """Recalcula una tabla resumen completa y sus grupos; devuelve las filas del resumen"""
+    conn.execute(text(f"DELETE FROM {definicion['tabla']}"))
+    filas = conn.execute(text(_insert_select(definicion))).rowcount
+    conn.execute(text(f"DELETE FROM {definicion['tabla']}_grupos"))
+    conn.execute(text(_insert_grupos(definicion)))
+    return filas
+
+
+def _limpiar_cache_estado():
+    with _estado_lock:
+        _estado_cache.clear()
+
+
+def _descartar_resultados():
+    """
+    Descarta las respuestas, gráficas y consultas guardadas con los totales
+    anteriores al refresco. No llama a invalidar_datos(), que volvería a
+    marcar las tablas resumen como obsoletas.
+    """
+    cache_respuestas.invalidar()
+    cache_graficas.invalidar()
+    invalidar_cache_disco()
+
+
+def reconstruir_resumenes(nombres=None):
+    """
+    Recalcula por completo las tablas resumen indicadas (por defecto todas)
+    y las marca como frescas.
+    """
+    nombres = nombres or list(RESUMENES)
+    resultado = {}
+    with engine.begin() as conn:
+        _crear_tablas(conn)
+    for nombre in nombres:
+        definicion = RESUMENES[nombre]
+        inicio = time.perf_counter()
+        with engine.begin() as conn:
+            filas = _reconstruir(conn, definicion)
+            _guardar_estado(conn, nombre, True)
+        resultado[nombre] = {"rows": filas, "seconds": round(time.perf_counter() - inicio, 3)}
+    _limpiar_cache_estado()
+    _descartar_resultados()
+    return resultado
+
+
+def refrescar_resumenes(game_platform_ids, nombres=None):
+    """
+    Refresca solo los grupos afectados por los game_platform_id indicados:
+    los grupos a los que contribuían en el último cálculo (tabla _grupos) y
+    los que les corresponden con los datos actuales. Así una fila borrada o
+    movida a otra plataforma, publisher o año también actualiza su grupo
+    anterior. Las tablas ya reconstruidas alguna vez quedan marcadas como frescas.
+
+    Un resumen sin grupos guardados (calculado antes de existir la tabla
+    _grupos) se reconstruye por completo.
+    """
+    nombres = nombres or list(RESUMENES)
+    ids = sorted({int(i) for i in game_platform_ids})
+    if not ids:
+        return {}
+
+    placeholders = ', '.join([':id' + str(i) for i in range(len(ids))])
+    params_ids = {f'id{i}': game_platform_id for i, game_platform_id in enumerate(ids)}
+    filtro_ids = f"rs.game_platform_id IN ({placeholders})"
+    resultado = {}
+
+    with engine.begin() as conn:
+        _crear_tablas(conn)
+
+    for nombre in nombres:
+        definicion = RESUMENES[nombre]
+        claves = definicion["claves"]
+        tabla_grupos = f"{definicion['tabla']}_grupos"
+        with engine.begin() as conn:
+            if conn.execute(text(f"SELECT game_platform_id FROM {tabla_grupos}")).first() is None:
+                filas = _reconstruir(conn, definicion)
+                _actualizar_estado(conn, nombre, True)
+                resultado[nombre] = {"rebuilt": True, "rows": filas}
+                continue
+
+            anteriores = conn.execute(
+                text(f"SELECT DISTINCT {', '.join(definicion['columnas'])} FROM {tabla_grupos} "
+                     f"WHERE game_platform_id IN ({placeholders})"),
+                params_ids,
+            ).all()
+            actuales = conn.execute(
+                text(f"SELECT DISTINCT {', '.join(claves)} {definicion['join']} "
+                     f"WHERE {definicion.get('condicion', '1 = 1')} AND {filtro_ids}"),
+                params_ids,
+            ).all()
+            afectados = {tuple(valores) for valores in anteriores} | {tuple(valores) for valores in actuales}
+
+            for valores in afectados:
+                # Condición por clave; los NULL se comparan con IS NULL
+                condiciones_tabla = []
+                condiciones_join = []
+                params = {}
+                for i, (columna, expresion, valor) in enumerate(zip(definicion["columnas"], claves, valores)):
+                    if valor is None:
+                        condiciones_tabla.append(f"{columna} IS NULL")
+                        condiciones_join.append(f"{expresion} IS NULL")
+                    else:
+                        condiciones_tabla.append(f"{columna} = :k{i}")
+                        condiciones_join.append(f"{expresion} = :k{i}")
+                        params[f"k{i}"] = valor
+
+                conn.execute(text(f"DELETE FROM {definicion['tabla']} WHERE {' AND '.join(condiciones_tabla)}"), params)
+                conn.execute(text(_insert_select(definicion, ' AND '.join(condiciones_join))), params)
+
+            conn.execute(text(f"DELETE FROM {tabla_grupos} WHERE game_platform_id IN ({placeholders})"), params_ids)
+            conn.execute(text(_insert_grupos(definicion, filtro_ids)), params_ids)
+            _actualizar_estado(conn, nombre, True)
+
+        resultado[nombre] = {"groups": len(afectados)}
+    _limpiar_cache_estado()
+    _descartar_resultados()
+    return resultado
+
+
+def marcar_obsoletos(nombres=None):
+    """Marca las tablas resumen como no frescas (por ejemplo, tras una carga de datos)"""
+    nombres = nombres or list(RESUMENES)
+    with engine.begin() as conn:
+        _crear_tablas(conn)
+        for nombre in nombres:
+            _actualizar_estado(conn, nombre, False)
+    _limpiar_cache_estado()
+
+
+def usar_resumen(nombre):
+    """
+    Indica si la tabla resumen está fresca y puede sustituir al join.
+    El estado se lee de resumen_estado y se guarda RESUMENES_TTL segundos.
+    """
+    ahora = time.monotonic()
+    with _estado_lock:
+        guardado = _estado_cache.get(nombre)
+    if guardado is not None and ahora - guardado[1] < RESUMENES_TTL:
+        return guardado[0]
+
+    try:
+        with engine.connect() as conn:
+            fila = conn.execute(
+                text("SELECT fresco FROM resumen_estado WHERE nombre = :nombre"), {"nombre": nombre}
+            ).first()
+        fresco = bool(fila and fila[0])
+    except Exception:
+        # Sin tablas resumen se usa siempre la consulta original
+        fresco = False
+
+    with _estado_lock:
+        _estado_cache[nombre] = (fresco, ahora)
+    return fresco
+
+
+def estado_resumenes():
+    """Estado de cada tabla resumen"""
+    try:
+        with engine.connect() as conn:
+            filas = conn.execute(text("SELECT nombre, fresco, actualizado FROM resumen_estado")).all()
+    except Exception:
+        filas = []
+    estados = {nombre: {"fresh": bool(fresco), "updated": actualizado} for nombre, fresco, actualizado in filas}
+    return {
+        nombre: {"table": definicion["tabla"], **estados.get(nombre, {"fresh": False, "updated": None})}
+        for nombre, definicion in RESUMENES.items()
+    }
+
+
+@al_invalidar
+def _marcar_obsoletos_al_invalidar():
+    """Los datos recargados dejan las tablas resumen obsoletas"""
+    try:
+        marcar_obsoletos()
+    except Exception as e:
+        print(f"❌ No se pudieron marcar las tablas resumen como obsoletas: {str(e)}")
@@ -1,101 +1,194 @@
 from fastapi import Response
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import BytesIO
-from sqlalchemy import create_engine, text
+import os
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-# Configuración de la conexión a la base de datos
-DATABASE_URL = "mysql+pymysql://root:rootpassword@db:3306/video_games"
-engine = create_engine(DATABASE_URL)
+from metricas import medir
+from carga_dataframes import leer_dataframe
+from cache_graficas import cachear_grafica, respuesta_grafica, cache as cache_graficas
+from compresion import CuerpoPrecomprimido, RespuestaPrecomprimida
+from serializacion import dumps
+from version_datos import version_actual
+from resumenes import usar_resumen
+import render_graficas
+from render_graficas import (
+    dibujar_top_editoras,
+    dibujar_distribucion_ventas,
+    dibujar_lanzamientos_anio,
+    dibujar_top_juegos_ventas,
+    dibujar_top_generos_ventas,
+    dibujar_ventas_plataforma_region,
+    componer_png
+)
+import vega_graficas
+from vega_graficas import (
+    especificar_top_editoras,
+    especificar_distribucion_ventas,
+    especificar_lanzamientos_anio,
+    especificar_top_juegos_ventas,
+    especificar_top_generos_ventas,
+    especificar_ventas_plataforma_region,
+    datos_grafica
+)
 
-def get_top_editoras_por_cantidad_de_juegos(TOP):
+# Procesos dedicados al render de gráficas (0 = renderizar en el propio proceso)
+GRAFICAS_WORKERS = int(os.getenv("GRAFICAS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Formatos de salida: PNG dibujado en el servidor, especificación Vega-Lite
+# para dibujar en el navegador o solo los datos agregados
+FORMATOS_GRAFICA = ("png", "vega", "data")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Crea el pool de procesos en el primer render"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn evita heredar hilos y conexiones abiertas del servidor
+                contexto = multiprocessing.get_context("spawn")
+                _pool = ProcessPoolExecutor(max_workers=GRAFICAS_WORKERS, mp_context=contexto)
+    return _pool
+
+
+def cerrar_pool_render():
+    """Detiene los procesos de render (al apagar la aplicación)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def renderizar(dibujar, figsize, df, *params):
+    """
+    Renderiza una gráfica y devuelve los bytes del PNG. Solo el DataFrame
+    y los parámetros cruzan al proceso de render.
+    """
+    with medir("render"):
+        if GRAFICAS_WORKERS <= 0:
+            return render_graficas.render_png(dibujar, figsize, df, *params)
+        return _get_pool().submit(render_graficas.render_png, dibujar, figsize, df, *params).result()
+
+
+def renderizar_varias(tareas):
+    """
+    Renderiza varias gráficas a la vez repartidas entre los procesos del pool.
+    tareas es una lista de (dibujar, figsize, df, *params); devuelve los PNG
+    en el mismo orden.
+    """
+    with medir("render"):
+        if GRAFICAS_WORKERS <= 0:
+            return [render_graficas.render_png(*tarea) for tarea in tareas]
+        pool = _get_pool()
+        futuros = [pool.submit(render_graficas.render_png, *tarea) for tarea in tareas]
+        return [futuro.result() for futuro in futuros]
+
+
+def _respuesta_png(contenido):
+    return Response(content=contenido, media_type="image/png")
+
+
+def comprobar_formato(formato, opciones=FORMATOS_GRAFICA):
+    """
+    Raises:
+        ValueError: si el formato no está entre las opciones
+    """
+    if formato not in opciones:
+        raise ValueError(f"Formato '{formato}' no soportado. Opciones: {', '.join(opciones)}")
+
+
+def _respuesta_json(contenido):
+    with medir("serializacion"):
+        cuerpo = CuerpoPrecomprimido(dumps(contenido))
+    return RespuestaPrecomprimida(cuerpo)
+
+
+def _respuesta_grafica(formato, dibujar, especificar, figsize, df, *params):
+    """
+    PNG renderizado en el pool o, con formato vega/data, el JSON para que el
+    cliente dibuje la gráfica sin pasar por matplotlib.
+    """
+    if formato == "png":
+        return _respuesta_png(renderizar(dibujar, figsize, df, *params))
+    with medir("conversion"):
+        spec = especificar(df, *params)
+    return _respuesta_json(spec if formato == "vega" else datos_grafica(spec))
+
+@cachear_grafica
+def get_top_editoras_por_cantidad_de_juegos(TOP, formato="png"):
     # Gráfica de barras – Las editoras con más juegos publicados
+    comprobar_formato(formato)
     query = f"""
     SELECT pu.publisher_name AS publisher, 
            COUNT(*) AS total_games
     FROM publisher pu
     JOIN game_publisher gp ON pu.id = gp.publisher_id
     GROUP BY pu.publisher_name
-    ORDER BY total_games DESC
+    ORDER BY total_games DESC, publisher
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(query, engine)
-    
-    plt.figure(figsize=(max(10, len(df)*0.8), 6))
-    grafica = sns.barplot(x='publisher', y='total_games', data=df, palette='coolwarm')
+    df = leer_dataframe(query, nombre="get_top_editoras_por_cantidad_de_juegos")
     
-    plt.title(f"TOP {TOP} editoras con más juegos publicados")
-    plt.ylabel("Cantidad de juegos")
-    plt.xlabel("Editora")
-    grafica.set_xticklabels(grafica.get_xticklabels(), rotation=10, ha='right')
-    plt.tight_layout()
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close()
-    return Response(content=buffer.read(), media_type="image/png")
+    return _respuesta_grafica(formato, dibujar_top_editoras, especificar_top_editoras,
+                              (max(10, len(df)*0.8), 6), df, TOP)
 
 
-def get_distribucion_ventas_por_region():
+@cachear_grafica
+def get_distribucion_ventas_por_region(formato="png"):
     # Gráfica de pastel – Distribución global de ventas por región
+    comprobar_formato(formato)
     query = """
     SELECT r.region_name, 
            SUM(rs.num_sales) AS total_sales
     FROM region_sales rs
     JOIN region r ON rs.region_id = r.id
     GROUP BY r.region_name
-    ORDER BY total_sales DESC
+    ORDER BY total_sales DESC, r.region_name
     """
+    if usar_resumen("region"):
+        query = """
+        SELECT region_name, total_sales
+        FROM resumen_ventas_region
+        ORDER BY total_sales DESC, region_name
+        """
     
-    df = pd.read_sql(query, engine)
-    
-    plt.figure(figsize=(14, 10))
-    plt.pie(df['total_sales'], labels=df['region_name'], autopct='%1.1f%%', colors=plt.cm.Set3.colors)
-    plt.axis('equal')
-    plt.title("Distribución global de ventas por región")
-    plt.tight_layout()
+    df = leer_dataframe(query, nombre="get_distribucion_ventas_por_region")
     
-    buffer = BytesIO()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close()
-    return Response(content=buffer.read(), media_type="image/png")
+    return _respuesta_grafica(formato, dibujar_distribucion_ventas, especificar_distribucion_ventas,
+                              (14, 10), df)
 
 
-def get_juegos_mas_lanzados_por_anio(TOP):
+@cachear_grafica
+def get_juegos_mas_lanzados_por_anio(TOP, formato="png"):
     # Gráfica de líneas – Años con más lanzamientos de videojuegos
+    comprobar_formato(formato)
     query = f"""
     SELECT gpl.release_year AS release_year, 
            COUNT(*) AS num_games
     FROM game_platform gpl
     WHERE gpl.release_year IS NOT NULL
     GROUP BY gpl.release_year
-    ORDER BY num_games DESC
+    ORDER BY num_games DESC, release_year
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(query, engine).sort_values('release_year')
+    df = leer_dataframe(query, nombre="get_juegos_mas_lanzados_por_anio").sort_values('release_year')
     
-    plt.figure(figsize=(12, 6))
-    sns.lineplot(x='release_year', y='num_games', data=df, marker='o', color='orange')
-    plt.title(f"TOP {TOP} años con más lanzamientos de videojuegos")
-    plt.xlabel("Año")
-    plt.ylabel("Cantidad de juegos lanzados")
-    plt.xticks(rotation=45)
-    plt.grid(True)
-    plt.tight_layout()
-
-    buffer = BytesIO()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close()
-    return Response(content=buffer.read(), media_type="image/png")
-
-def get_top_juegos_ventas(TOP):
+    return _respuesta_grafica(formato, dibujar_lanzamientos_anio, especificar_lanzamientos_anio,
+                              (12, 6), df, TOP)
+
+@cachear_grafica
+def get_top_juegos_ventas(TOP, formato="png"):
     # Gráfica de barras – Juegos con más ventas totales
+    comprobar_formato(formato)
     query = f"""
     SELECT g.game_name AS game,
            SUM(rs.num_sales) AS total_sales
@@ -104,29 +197,19 @@ def get_top_juegos_ventas(TOP):
     JOIN game_platform gpl ON gp.id = gpl.game_publisher_id
     JOIN region_sales rs ON gpl.id = rs.game_platform_id
     GROUP BY g.game_name
-    ORDER BY total_sales DESC
+    ORDER BY total_sales DESC, game
     LIMIT {TOP}
     """
     
-    df = pd.read_sql(query, engine)
-    
-    plt.figure(figsize=(max(12, len(df)*0.8), 6))
-    grafica = sns.barplot(x='game', y='total_sales', data=df, palette='viridis')
+    df = leer_dataframe(query, nombre="get_top_juegos_ventas")
     
-    plt.title(f"TOP {TOP} juegos con más ventas totales")
-    plt.ylabel("Ventas totales (millones)")
-    plt.xlabel("Juego")
-    grafica.set_xticklabels(grafica.get_xticklabels(), rotation=45, ha='right')
-    plt.tight_layout()
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close()
-    return Response(content=buffer.read(), media_type="image/png")
+    return _respuesta_grafica(formato, dibujar_top_juegos_ventas, especificar_top_juegos_ventas,
+                              (max(12, len(df)*0.8), 6), df, TOP)
 
-def get_top_generos_ventas(TOP):
+@cachear_grafica
+def get_top_generos_ventas(TOP, formato="png"):
     # Gráfica de barras – Géneros con más ventas totales
+    comprobar_formato(formato)
     query = f"""
     SELECT COALESCE(g.genre_name, 'Desconocido') AS genre,
            SUM(rs.num_sales) AS total_sales
@@ -136,29 +219,26 @@ def get_top_generos_ventas(TOP):
     JOIN game ga ON gp.game_id = ga.id
     LEFT JOIN genre g ON ga.genre_id = g.id
     GROUP BY g.genre_name
-    ORDER BY total_sales DESC
+    ORDER BY total_sales DESC, genre
     LIMIT {TOP}
     """
+    if usar_resumen("genero"):
+        query = f"""
+        SELECT COALESCE(genre_name, 'Desconocido') AS genre, total_sales
+        FROM resumen_ventas_genero
+        ORDER BY total_sales DESC, genre
+        LIMIT {TOP}
+        """
     
-    df = pd.read_sql(query, engine)
-    
-    plt.figure(figsize=(max(10, len(df)*0.8), 6))
-    grafica = sns.barplot(x='genre', y='total_sales', data=df, palette='plasma')
-    
-    plt.title(f"TOP {TOP} géneros con más ventas totales")
-    plt.ylabel("Ventas totales (millones)")
-    plt.xlabel("Género")
-    grafica.set_xticklabels(grafica.get_xticklabels(), rotation=15, ha='right')
-    plt.tight_layout()
+    df = leer_dataframe(query, nombre="get_top_generos_ventas")
     
-    buffer = BytesIO()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close()
-    return Response(content=buffer.read(), media_type="image/png")
+    return _respuesta_grafica(formato, dibujar_top_generos_ventas, especificar_top_generos_ventas,
+                              (max(10, len(df)*0.8), 6), df, TOP)
 
-def get_ventas_plataforma_region(TOP):
+@cachear_grafica
+def get_ventas_plataforma_region(TOP, formato="png"):
     # Gráfica de barras agrupadas – Ventas por plataforma y región
+    comprobar_formato(formato)
     # Primero obtenemos las TOP plataformas por ventas totales
     platform_query = f"""
     SELECT p.platform_name AS platform,
@@ -167,11 +247,18 @@ def get_ventas_plataforma_region(TOP):
     JOIN game_platform gpl ON rs.game_platform_id = gpl.id
     JOIN platform p ON gpl.platform_id = p.id
     GROUP BY p.platform_name
-    ORDER BY total_sales DESC
+    ORDER BY total_sales DESC, platform
     LIMIT {TOP}
     """
+    if usar_resumen("plataforma"):
+        platform_query = f"""
+        SELECT platform_name AS platform, total_sales
+        FROM resumen_ventas_plataforma
+        ORDER BY total_sales DESC, platform
+        LIMIT {TOP}
+        """
     
-    top_platforms_df = pd.read_sql(platform_query, engine)
+    top_platforms_df = leer_dataframe(platform_query, nombre="get_ventas_plataforma_region")
     top_platform_list = top_platforms_df['platform'].tolist()
     
     # Ahora obtenemos las ventas por región para estas plataformas
@@ -189,27 +276,251 @@ def get_ventas_plataforma_region(TOP):
         JOIN platform p ON gpl.platform_id = p.id
         WHERE p.platform_name IN ({placeholders})
         GROUP BY p.platform_name, r.region_name
-        ORDER BY p.platform_name, SUM(rs.num_sales) DESC
+        ORDER BY p.platform_name, SUM(rs.num_sales) DESC, r.region_name
         """
+        if usar_resumen("plataforma_region"):
+            query = f"""
+            SELECT platform_name AS platform,
+                   region_name AS region,
+                   total_sales
+            FROM resumen_ventas_plataforma_region
+            WHERE platform_name IN ({placeholders})
+            ORDER BY platform_name, total_sales DESC, region_name
+            """
         
-        df = pd.read_sql(text(query), engine, params=params)
+        df = leer_dataframe(query, params, nombre="get_ventas_plataforma_region")
     else:
         # En caso de que no haya plataformas (poco probable)
         df = pd.DataFrame(columns=['platform', 'region', 'total_sales'])
     
-    # Usamos un gráfico de barras estándar en lugar de catplot para mejor control
-    plt.figure(figsize=(max(12, len(top_platform_list)*1.5), 8))
-    sns.barplot(x="platform", y="total_sales", hue="region", data=df, palette="Set2")
-    
-    plt.title(f"Ventas por región en las TOP {TOP} plataformas")
-    plt.ylabel("Ventas totales (millones)")
-    plt.xlabel("Plataforma")
-    plt.xticks(rotation=45)
-    plt.legend(title="Región")
-    plt.tight_layout()
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close()
-    return Response(content=buffer.read(), media_type="image/png")
+    return _respuesta_grafica(formato, dibujar_ventas_plataforma_region, especificar_ventas_plataforma_region,
+                              (max(12, len(top_platform_list)*1.5), 8), df, TOP)
+
+
+# DASHBOARD: todas las gráficas con una sola lectura de datos
+
+# Gráficas disponibles en el dashboard, con el mismo nombre que su endpoint
+GRAFICAS_DASHBOARD = (
+    "top-editoras",
+    "distribucion-ventas",
+    "lanzamientos-anio",
+    "top-juegos-ventas",
+    "top-generos-ventas",
+    "ventas-plataforma-region",
+)
+
+FORMATOS_DASHBOARD = ("png", "multipart", "vega", "data")
+
+# Especificación Vega-Lite de cada gráfica del dashboard
+_ESPECIFICACIONES_DASHBOARD = {
+    "top-editoras": especificar_top_editoras,
+    "distribucion-ventas": especificar_distribucion_ventas,
+    "lanzamientos-anio": especificar_lanzamientos_anio,
+    "top-juegos-ventas": especificar_top_juegos_ventas,
+    "top-generos-ventas": especificar_top_generos_ventas,
+    "ventas-plataforma-region": especificar_ventas_plataforma_region,
+}
+
+# Ventas al nivel de detalle de game_platform y región. Cada gráfica suelta
+# parte de una tabla distinta (region_sales, game_platform o game_publisher),
+# así que el detalle une tres partes para que estén todas sus filas, también
+# las que no llegan a las demás tablas: todas las ventas, los game_platform
+# sin ventas y los game_publisher sin game_platform.
+_COLUMNAS_DASHBOARD = """
+SELECT gp.id AS game_publisher_id,
+       pu.publisher_name AS publisher,
+       g.game_name AS game,
+       CASE WHEN g.id IS NULL THEN NULL ELSE COALESCE(gen.genre_name, 'Desconocido') END AS genre,
+       gpl.id AS game_platform_id,
+       gpl.release_year,
+       p.platform_name AS platform,
+       r.region_name AS region,
+       rs.num_sales
+"""
+_DIMENSIONES_DASHBOARD = """
+LEFT JOIN region r ON rs.region_id = r.id
+LEFT JOIN platform p ON gpl.platform_id = p.id
+LEFT JOIN publisher pu ON gp.publisher_id = pu.id
+LEFT JOIN game g ON gp.game_id = g.id
+LEFT JOIN genre gen ON g.genre_id = gen.id
+"""
+_QUERY_DASHBOARD = f"""
+{_COLUMNAS_DASHBOARD}
+FROM region_sales rs
+LEFT JOIN game_platform gpl ON rs.game_platform_id = gpl.id
+LEFT JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+{_DIMENSIONES_DASHBOARD}
+UNION ALL
+{_COLUMNAS_DASHBOARD}
+FROM game_platform gpl
+LEFT JOIN region_sales rs ON rs.game_platform_id = gpl.id
+LEFT JOIN game_publisher gp ON gpl.game_publisher_id = gp.id
+{_DIMENSIONES_DASHBOARD}
+WHERE rs.game_platform_id IS NULL
+UNION ALL
+{_COLUMNAS_DASHBOARD}
+FROM game_publisher gp
+LEFT JOIN game_platform gpl ON gpl.game_publisher_id = gp.id
+LEFT JOIN region_sales rs ON rs.game_platform_id = gpl.id
+{_DIMENSIONES_DASHBOARD}
+WHERE gpl.id IS NULL
+"""
+
+
+def _orden_nombre(columna):
+    """Las categorías se ordenan por su texto, como ORDER BY en SQL, no por el orden de aparición"""
+    return columna.astype(str) if isinstance(columna.dtype, pd.CategoricalDtype) else columna
+
+
+def _top(serie, TOP, nombre_valor):
+    """
+    Los TOP mayores valores de una serie agrupada, como DataFrame de dos
+    columnas. Los empates se ordenan por nombre, igual que en la consulta
+    del endpoint de cada gráfica.
+    """
+    df = serie.rename(nombre_valor).reset_index()
+    df = df.sort_values([nombre_valor, df.columns[0]], ascending=[False, True], kind="stable", key=_orden_nombre)
+    if TOP is not None:
+        df = df.head(TOP)
+    return df.reset_index(drop=True)
+
+
+def _suma(df, columnas):
+    # num_sales es DECIMAL(5,2): se redondea a céntimos para que las sumas
+    # iguales empaten como en SQL en lugar de diferir por el error de float32
+    return df.groupby(columnas, observed=True, sort=False)["num_sales"].sum().round(2)
+
+
+def agregados_dashboard(df, TOP):
+    """
+    Calcula a partir de las filas de detalle los DataFrames de las seis
+    gráficas, con las mismas columnas que las consultas de cada endpoint.
+    """
+    ventas = df[df["num_sales"].notna()]
+    con_juego = ventas[ventas["game"].notna()]
+    con_plataforma = ventas[ventas["platform"].notna()]
+    datos = {}
+
+    editoras = df[df["publisher"].notna()].drop_duplicates("game_publisher_id")
+    datos["top-editoras"] = _top(editoras.groupby("publisher", observed=True, sort=False).size(), TOP, "total_games")
+
+    datos["distribucion-ventas"] = _top(_suma(ventas[ventas["region"].notna()], "region"), None, "total_sales") \
+        .rename(columns={"region": "region_name"})
+
+    lanzamientos = df[df["game_platform_id"].notna() & df["release_year"].notna()].drop_duplicates("game_platform_id")
+    datos["lanzamientos-anio"] = _top(lanzamientos.groupby("release_year", sort=False).size(), TOP, "num_games") \
+        .sort_values("release_year")
+
+    datos["top-juegos-ventas"] = _top(_suma(con_juego, "game"), TOP, "total_sales")
+    datos["top-generos-ventas"] = _top(_suma(con_juego, "genre"), TOP, "total_sales")
+
+    plataformas = _top(_suma(con_plataforma, "platform"), TOP, "total_sales")["platform"].tolist()
+    por_region = _suma(
+        con_plataforma[con_plataforma["platform"].isin(plataformas) & con_plataforma["region"].notna()],
+        ["platform", "region"],
+    ).rename("total_sales").reset_index()
+    datos["ventas-plataforma-region"] = por_region.sort_values(
+        ["platform", "total_sales", "region"], ascending=[True, False, True], kind="stable", key=_orden_nombre
+    )
+    datos["_plataformas"] = plataformas
+    return datos
+
+
+def _tarea_dashboard(nombre, datos, TOP):
+    """(dibujar, figsize, df, *params) de una gráfica, con los mismos tamaños que su endpoint"""
+    df = datos[nombre]
+    # Seaborn ordena las barras según las categorías: se rehacen con el orden
+    # de las filas agregadas y sin las categorías que no tienen filas
+    df = df.apply(
+        lambda columna: columna.astype(pd.CategoricalDtype(columna.dropna().unique().tolist()))
+        if isinstance(columna.dtype, pd.CategoricalDtype) else columna
+    )
+    if nombre == "top-editoras":
+        return (dibujar_top_editoras, (max(10, len(df) * 0.8), 6), df, TOP)
+    if nombre == "distribucion-ventas":
+        return (dibujar_distribucion_ventas, (14, 10), df)
+    if nombre == "lanzamientos-anio":
+        return (dibujar_lanzamientos_anio, (12, 6), df, TOP)
+    if nombre == "top-juegos-ventas":
+        return (dibujar_top_juegos_ventas, (max(12, len(df) * 0.8), 6), df, TOP)
+    if nombre == "top-generos-ventas":
+        return (dibujar_top_generos_ventas, (max(10, len(df) * 0.8), 6), df, TOP)
+    return (dibujar_ventas_plataforma_region, (max(12, len(datos["_plataformas"]) * 1.5), 8), df, TOP)
+
+
+def _multipart(nombres, pngs):
+    """Cuerpo multipart/mixed con una parte image/png por gráfica"""
+    frontera = f"grafica-{uuid.uuid4().hex}".encode("ascii")
+    partes = []
+    for nombre, png in zip(nombres, pngs):
+        partes.append(
+            b"--" + frontera + b"\r\n"
+            + b"Content-Type: image/png\r\n"
+            + f'Content-Disposition: inline; name="{nombre}"; filename="{nombre}.png"\r\n'.encode("ascii")
+            + f"Content-Length: {len(png)}\r\n\r\n".encode("ascii")
+            + png + b"\r\n"
+        )
+    partes.append(b"--" + frontera + b"--\r\n")
+    return b"".join(partes)
+
+
+def _respuesta_dashboard(contenido, formato):
+    if formato in ("vega", "data"):
+        return respuesta_grafica(contenido)
+    if formato == "multipart":
+        # La frontera es la primera línea del cuerpo, también en las respuestas en caché
+        frontera = contenido[2:contenido.index(b"\r\n")].decode("ascii")
+        return Response(content=contenido, media_type=f"multipart/mixed; boundary={frontera}")
+    return _respuesta_png(contenido)
+
+
+def get_dashboard(graficas=None, TOP=10, formato="png", columnas=2):
+    """
+    Dashboard con varias gráficas: una sola consulta de detalle para todas,
+    agregados calculados en memoria y render en paralelo en el pool.
+
+    Args:
+        graficas: nombres de GRAFICAS_DASHBOARD (None = todas)
+        TOP: número de elementos de las gráficas con TOP
+        formato: png (una imagen compuesta), multipart (una parte PNG por
+                 gráfica), vega (especificación Vega-Lite con todas en
+                 cuadrícula) o data (título y datos de cada gráfica)
+        columnas: columnas de la imagen compuesta o de la cuadrícula Vega-Lite
+
+    Raises:
+        ValueError: si alguna gráfica o el formato no existen
+    """
+    graficas = list(dict.fromkeys(graficas or GRAFICAS_DASHBOARD))
+    desconocidas = [nombre for nombre in graficas if nombre not in GRAFICAS_DASHBOARD]
+    if desconocidas:
+        raise ValueError(f"Gráficas no disponibles: {', '.join(desconocidas)}. Opciones: {', '.join(GRAFICAS_DASHBOARD)}")
+    comprobar_formato(formato, FORMATOS_DASHBOARD)
+
+    clave = ("get_dashboard", tuple(graficas), TOP, formato, columnas, version_actual())
+    contenido = cache_graficas.obtener(clave)
+    if contenido is None:
+        df = leer_dataframe(_QUERY_DASHBOARD, nombre="get_dashboard")
+        with medir("agregacion"):
+            datos = agregados_dashboard(df, TOP)
+            tareas = [_tarea_dashboard(nombre, datos, TOP) for nombre in graficas]
+        if formato in ("vega", "data"):
+            # Se reutilizan los datos y parámetros de cada tarea de render
+            with medir("conversion"):
+                specs = [_ESPECIFICACIONES_DASHBOARD[nombre](*tarea[2:]) for nombre, tarea in zip(graficas, tareas)]
+                if formato == "vega":
+                    salida = vega_graficas.componer(specs, columnas)
+                else:
+                    salida = {nombre: datos_grafica(spec) for nombre, spec in zip(graficas, specs)}
+            with medir("serializacion"):
+                contenido = CuerpoPrecomprimido(dumps(salida))
+        else:
+            pngs = renderizar_varias(tareas)
+            if formato == "multipart":
+                contenido = _multipart(graficas, pngs)
+            elif len(pngs) == 1:
+                contenido = pngs[0]
+            else:
+                with medir("render"):
+                    contenido = componer_png(pngs, columnas)
+        cache_graficas.guardar(clave, contenido)
+    return _respuesta_dashboard(contenido, formato)
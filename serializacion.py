@@ -0,0 +1,70 @@
+import json
+import datetime
+from decimal import Decimal
+from fastapi import Response
+
+from metricas import medir
+
+# Serialización rápida de las respuestas JSON. Con orjson las filas pasan
+# directamente a bytes sin el jsonable_encoder genérico de FastAPI; si no
+# está instalado se usa el módulo json estándar con el mismo resultado.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson está en requirements.txt
+    orjson = None
+
+# Formatos de salida de los endpoints con ?format=
+FORMATO_FILAS = "json"
+FORMATO_COLUMNAS = "columnar"
+
+
+def _default(valor):
+    """Tipos que el codificador JSON no conoce (DECIMAL de MySQL, fechas, bytes, NumPy)"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", errors="replace")
+    if hasattr(valor, "item"):
+        # Escalares de NumPy
+        return valor.item()
+    raise TypeError(f"Tipo no serializable a JSON: {type(valor).__name__}")
+
+
+def dumps(contenido):
+    """Serializa a bytes JSON"""
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(contenido, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespuestaJSON(Response):
+    """Respuesta JSON serializada con orjson; registra la fase de serialización"""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        with medir("serializacion"):
+            return dumps(content)
+
+
+def formatear_filas(columnas, filas, formato=FORMATO_FILAS):
+    """
+    Convierte filas de una consulta al formato de salida:
+    una lista de objetos o, con formato columnar, {columna: [valores...]}.
+    """
+    with medir("conversion"):
+        if formato == FORMATO_COLUMNAS:
+            if not filas:
+                return {columna: [] for columna in columnas}
+            return {columna: list(valores) for columna, valores in zip(columnas, zip(*filas))}
+        return [dict(zip(columnas, fila)) for fila in filas]
+
+
+def filas_de_dicts(datos):
+    """Columnas y filas a partir de una lista de diccionarios con las mismas claves"""
+    if not datos:
+        return [], []
+    columnas = list(datos[0])
+    return columnas, [tuple(fila[columna] for columna in columnas) for fila in datos]
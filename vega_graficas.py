@@ -0,0 +1,150 @@
+import math
+
+# Especificaciones Vega-Lite de las gráficas de seaborn_graficas.py, para
+# que el navegador las dibuje (por ejemplo con vega-embed) en lugar de
+# recibir el PNG. Cada función recibe los mismos datos agregados que su
+# equivalente dibujar_* de render_graficas.py y reproduce el título, los
+# ejes, el orden de las categorías y la paleta. Los datos van incluidos en
+# la especificación (data.values), así que no hace falta otra petición.
+
+ESQUEMA_VEGA_LITE = "https://vega.github.io/schema/vega-lite/v5.json"
+
+
+def valores(df):
+    """
+    Filas del DataFrame como lista de diccionarios en el orden de la gráfica.
+    Las ventas (float32) se redondean a 2 decimales, igual que DECIMAL(5,2).
+    """
+    columnas = list(df.columns)
+    filas = []
+    for fila in df.itertuples(index=False, name=None):
+        registro = {}
+        for columna, valor in zip(columnas, fila):
+            if hasattr(valor, "item"):
+                # Escalares de NumPy
+                valor = valor.item()
+            if isinstance(valor, float):
+                valor = None if math.isnan(valor) else round(valor, 2)
+            registro[columna] = valor
+        filas.append(registro)
+    return filas
+
+
+def _orden(df, columna):
+    """Valores distintos de una columna en el orden de las filas"""
+    return list(dict.fromkeys(str(valor) for valor in df[columna] if valor is not None))
+
+
+def _especificacion(titulo, df, **spec):
+    return {
+        "$schema": ESQUEMA_VEGA_LITE,
+        "title": titulo,
+        "data": {"values": valores(df)},
+        **spec,
+    }
+
+
+def _barras(titulo, df, x, y, titulo_x, titulo_y, esquema, rotacion):
+    # Barras en el orden de las filas, cada una de un color de la paleta
+    orden = _orden(df, x)
+    return _especificacion(
+        titulo, df,
+        mark={"type": "bar", "tooltip": True},
+        width={"step": 60},
+        encoding={
+            "x": {"field": x, "type": "nominal", "sort": orden, "title": titulo_x, "axis": {"labelAngle": -rotacion}},
+            "y": {"field": y, "type": "quantitative", "title": titulo_y},
+            "color": {"field": x, "type": "nominal", "sort": orden, "scale": {"scheme": esquema}, "legend": None},
+        },
+    )
+
+
+def especificar_top_editoras(df, TOP):
+    # Gráfica de barras – Las editoras con más juegos publicados
+    return _barras(f"TOP {TOP} editoras con más juegos publicados", df, "publisher", "total_games",
+                   "Editora", "Cantidad de juegos", "blueorange", 10)
+
+
+def especificar_distribucion_ventas(df):
+    # Gráfica de pastel – Distribución global de ventas por región
+    orden = _orden(df, "region_name")
+    return _especificacion(
+        "Distribución global de ventas por región", df,
+        width=400,
+        height=400,
+        transform=[
+            {"joinaggregate": [{"op": "sum", "field": "total_sales", "as": "total"}]},
+            {"calculate": "datum.total_sales / datum.total", "as": "porcentaje"},
+        ],
+        encoding={
+            "theta": {"field": "total_sales", "type": "quantitative", "stack": True},
+            "order": {"field": "total_sales", "type": "quantitative", "sort": "descending"},
+            "color": {"field": "region_name", "type": "nominal", "sort": orden, "scale": {"scheme": "set3"}, "title": "Región"},
+        },
+        layer=[
+            {"mark": {"type": "arc", "tooltip": True}},
+            {"mark": {"type": "text", "radius": 120},
+             "encoding": {"text": {"field": "porcentaje", "type": "quantitative", "format": ".1%"},
+                          "color": {"value": "black"}}},
+        ],
+    )
+
+
+def especificar_lanzamientos_anio(df, TOP):
+    # Gráfica de líneas – Años con más lanzamientos de videojuegos
+    return _especificacion(
+        f"TOP {TOP} años con más lanzamientos de videojuegos", df,
+        mark={"type": "line", "point": True, "color": "orange", "tooltip": True},
+        width=600,
+        encoding={
+            "x": {"field": "release_year", "type": "quantitative", "title": "Año",
+                  "scale": {"zero": False}, "axis": {"format": "d", "labelAngle": -45, "grid": True}},
+            "y": {"field": "num_games", "type": "quantitative", "title": "Cantidad de juegos lanzados",
+                  "scale": {"zero": False}, "axis": {"grid": True}},
+        },
+    )
+
+
+def especificar_top_juegos_ventas(df, TOP):
+    # Gráfica de barras – Juegos con más ventas totales
+    return _barras(f"TOP {TOP} juegos con más ventas totales", df, "game", "total_sales",
+                   "Juego", "Ventas totales (millones)", "viridis", 45)
+
+
+def especificar_top_generos_ventas(df, TOP):
+    # Gráfica de barras – Géneros con más ventas totales
+    return _barras(f"TOP {TOP} géneros con más ventas totales", df, "genre", "total_sales",
+                   "Género", "Ventas totales (millones)", "plasma", 15)
+
+
+def especificar_ventas_plataforma_region(df, TOP):
+    # Gráfica de barras agrupadas – Ventas por plataforma y región
+    regiones = _orden(df, "region")
+    return _especificacion(
+        f"Ventas por región en las TOP {TOP} plataformas", df,
+        mark={"type": "bar", "tooltip": True},
+        width={"step": 100},
+        encoding={
+            "x": {"field": "platform", "type": "nominal", "sort": _orden(df, "platform"),
+                  "title": "Plataforma", "axis": {"labelAngle": -45}},
+            "xOffset": {"field": "region", "type": "nominal", "sort": regiones},
+            "y": {"field": "total_sales", "type": "quantitative", "title": "Ventas totales (millones)"},
+            "color": {"field": "region", "type": "nominal", "sort": regiones,
+                      "scale": {"scheme": "set2"}, "title": "Región"},
+        },
+    )
+
+
+def datos_grafica(spec):
+    """Versión format=data: solo el título y las filas agregadas"""
+    return {"title": spec["title"], "data": spec["data"]["values"]}
+
+
+def componer(specs, columnas=2):
+    """Une varias especificaciones en una cuadrícula de `columnas` columnas"""
+    return {
+        "$schema": ESQUEMA_VEGA_LITE,
+        "columns": columnas,
+        "concat": [{clave: valor for clave, valor in spec.items() if clave != "$schema"} for spec in specs],
+        "resolve": {"scale": {"color": "independent"}},
+    }
@@ -0,0 +1,32 @@
+import threading
+
+# Versión de los datos cargados en la base de datos. Las cachés la incluyen
+# en sus claves y se vacían cuando los datos se recargan.
+_version = 0
+_lock = threading.Lock()
+_callbacks = []
+
+
+def version_actual():
+    """Devuelve la versión actual de los datos"""
+    return _version
+
+
+def al_invalidar(callback):
+    """Registra una función que se ejecuta cada vez que se invalidan los datos"""
+    _callbacks.append(callback)
+    return callback
+
+
+def invalidar_datos():
+    """
+    Marca los datos como modificados: incrementa la versión y ejecuta
+    las funciones registradas con al_invalidar.
+    """
+    global _version
+    with _lock:
+        _version += 1
+        version = _version
+    for callback in list(_callbacks):
+        callback()
+    return version